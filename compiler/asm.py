@@ -0,0 +1,265 @@
+import compiler.loops as loops
+import compiler.runtime as runtimes
+
+REGISTERS = frozenset(['rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp',
+                       'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14', 'r15'])
+
+# The low byte of a register, written without affecting (or killing) the rest of it
+BYTE_REGISTERS = {'al': 'rax', 'cl': 'rcx', 'dl': 'rdx', 'bl': 'rbx'}
+
+_DIRECTIVES = ('global', 'extern', 'section')
+
+# The registers read and written by the routines the runtimes emit (see compiler/runtime.py), besides rsp. The print
+# routines take their argument in rax and, like printf, don't preserve rdx, rsi and rdi, and flush_output doesn't
+# preserve rax, rcx, r11 (clobbered by syscall) and rdi
+_ROUTINES = {
+    'print_rax': (frozenset(['rax']), frozenset(['rdx', 'rsi', 'rdi'])),
+    'print_rax_space': (frozenset(['rax']), frozenset(['rdx', 'rsi', 'rdi'])),
+    'flush_output': (frozenset(), frozenset(['rax', 'rcx', 'r11', 'rdi'])),
+}
+# Other routines (printf and dprintf of libc) follow the System V calling convention: they may read every argument
+# register (and al, the number of vector registers passed to variadic functions) and write every caller-saved register
+_SYSV_ARGUMENTS = frozenset(['rdi', 'rsi', 'rdx', 'rcx', 'r8', 'r9', 'rax'])
+_SYSV_CALLER_SAVED = frozenset(['rax', 'rcx', 'rdx', 'rsi', 'rdi', 'r8', 'r9', 'r10', 'r11'])
+
+
+def is_register(operand):
+    return operand in REGISTERS
+
+
+def is_immediate(operand):
+    try:
+        int(operand)
+    except ValueError:
+        return False
+    return True
+
+
+def _operand_registers(operand):
+    # Registers read in order to compute an operand, e.g. both registers of a `[rax + rbx*2]` address
+    if is_register(operand):
+        return {operand}
+    if operand in BYTE_REGISTERS:
+        return {BYTE_REGISTERS[operand]}
+    if '[' in operand:
+        address = operand[operand.index('[') + 1:operand.index(']')]
+        for separator in '+-*':
+            address = address.replace(separator, ' ')
+        return {part for part in address.split() if is_register(part)}
+    return set()
+
+
+class Instruction:
+    def __init__(self, opcode, operands=(), comment=None):
+        self.opcode = opcode
+        self.operands = tuple(operands)
+        self.comment = comment
+        # Instructions aren't modified once created (rewrites replace them), so what they read and write is cached
+        self._reads = None
+        self._writes = None
+
+    def reads(self):
+        if self._reads is None:
+            self._reads = frozenset(self._compute_reads())
+        return self._reads
+
+    def writes(self):
+        if self._writes is None:
+            self._writes = frozenset(self._compute_writes())
+        return self._writes
+
+    def _compute_reads(self):
+        operands = self.operands
+        opcode = self.opcode
+        if opcode == 'mov' or opcode == 'lea':
+            reads = _operand_registers(operands[1])
+            if '[' in operands[0] or operands[0] in BYTE_REGISTERS:
+                reads |= _operand_registers(operands[0])
+            return reads
+        if opcode == 'pop':
+            return {'rsp'}
+        if opcode == 'push':
+            return {'rsp'} | _operand_registers(operands[0])
+        if opcode == 'mul' or opcode == 'div':
+            return {'rax', 'rdx'} | _operand_registers(operands[0])
+        if opcode == 'loop':
+            return {'rcx'}
+        if opcode == 'call':
+            reads, _ = _ROUTINES.get(operands[0], (_SYSV_ARGUMENTS, None))
+            return {'rsp'} | reads
+        if opcode == 'syscall':
+            return {'rax', 'rdi', 'rsi', 'rdx'}
+        reads = set()
+        for operand in operands:
+            reads |= _operand_registers(operand)
+        return reads
+
+    def _compute_writes(self):
+        operands = self.operands
+        opcode = self.opcode
+        if opcode in ('push', 'pop'):
+            writes = {'rsp'}
+            if opcode == 'pop' and is_register(operands[0]):
+                writes.add(operands[0])
+            return writes
+        if opcode in ('mul', 'div', 'rdtsc'):
+            return {'rax', 'rdx'}
+        if opcode == 'loop':
+            return {'rcx'}
+        if opcode == 'syscall':
+            return {'rax', 'rcx', 'r11'}
+        if opcode == 'call':
+            _, writes = _ROUTINES.get(operands[0], (None, _SYSV_CALLER_SAVED))
+            return set(writes)
+        if opcode in ('ret', 'jmp', 'cmp', 'test') or opcode.startswith('j'):
+            return set()
+        if operands and (is_register(operands[0]) or operands[0] in BYTE_REGISTERS):
+            return _operand_registers(operands[0])
+        return set()
+
+    def is_control_flow(self):
+        # Every jump (jmp and the conditional ones) starts with a j
+        opcode = self.opcode
+        return opcode[0] == 'j' or opcode in ('loop', 'ret', 'syscall')
+
+    def __eq__(self, other):
+        return isinstance(other, Instruction) and \
+            self.opcode == other.opcode and \
+            self.operands == other.operands
+
+    def __hash__(self):
+        return hash((self.opcode, self.operands))
+
+    def __str__(self):
+        if self.operands:
+            code = f'{self.opcode} {", ".join(self.operands)}'
+        else:
+            code = self.opcode
+        if self.comment is not None:
+            code = f'{code} ; {self.comment}'
+        return code
+
+    def __repr__(self):
+        return f'Instruction(opcode={self.opcode}, operands={self.operands})'
+
+
+class Label:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f'{self.name}:'
+
+    def __repr__(self):
+        return f'Label(name={self.name})'
+
+
+class Comment:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return f'; {self.text}'
+
+    def __repr__(self):
+        return f'Comment(text={self.text})'
+
+
+class Directive:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f'Directive(text={self.text})'
+
+
+class Assembly:
+    # Collects the instructions emitted by codegen. Comments describing AST nodes are only rendered (through the node's
+    # recursive __str__) when enabled. The runtime emits the program's entry, exit and print routine, loop bodies are
+    # unrolled `unroll_factor` times, and top-level statements are instrumented when given a profile.Profile
+
+    def __init__(self, comments=False, runtime=None, unroll_factor=loops.UNROLL_FACTOR, profile=None):
+        self.instructions = []
+        self.comments = comments
+        self.runtime = runtime if runtime is not None else runtimes.LIBC
+        self.unroll_factor = unroll_factor
+        self.profile = profile
+        self._label_counts = {}
+
+    def new_label(self, prefix):
+        # Labels are numbered per prefix, in the order they're created
+        count = self._label_counts.get(prefix, 0)
+        self._label_counts[prefix] = count + 1
+        return f'{prefix}_{count}'
+
+    def emit(self, opcode, *operands):
+        self.instructions.append(Instruction(opcode, operands))
+
+    def label(self, name):
+        self.instructions.append(Label(name))
+
+    def directive(self, text):
+        self.instructions.append(Directive(text))
+
+    def comment(self, node, text):
+        if not self.comments:
+            return
+        if node is not None:
+            text = f'{node}: {text}'
+        self.instructions.append(Comment(text))
+
+
+def _split_operands(operands):
+    # Commas only separate operands outside of quoted strings
+    parts = []
+    current = ''
+    quoted = False
+    for c in operands:
+        if c == '"':
+            quoted = not quoted
+        if c == ',' and not quoted:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += c
+    parts.append(current.strip())
+    return parts
+
+
+def parse_line(line):
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith(';'):
+        return Comment(line[1:].strip())
+    if line.endswith(':'):
+        return Label(line[:-1])
+    if line.split()[0] in _DIRECTIVES or ':' in line:
+        return Directive(line)
+
+    comment = None
+    if ';' in line:
+        line, comment = line.split(';', 1)
+        line = line.strip()
+        comment = comment.strip()
+
+    parts = line.split(None, 1)
+    operands = _split_operands(parts[1]) if len(parts) > 1 else []
+    return Instruction(parts[0], operands, comment)
+
+
+def parse(code):
+    instructions = []
+    for line in code.splitlines():
+        instruction = parse_line(line)
+        if instruction is not None:
+            instructions.append(instruction)
+
+    return instructions
+
+
+def serialize(instructions):
+    return '\n'.join(str(instruction) for instruction in instructions) + '\n'
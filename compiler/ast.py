@@ -1,6 +1,10 @@
 import enum
 import abc
 
+import compiler.csource as csource
+import compiler.loops as loops
+import compiler.strength as strength
+
 
 class NodeType(enum.Enum):
     Num = 'num'
@@ -9,6 +13,7 @@ class NodeType(enum.Enum):
     SubExpr = 'sub_expr'
     MulExpr = 'mul_expr'
     DivExpr = 'div_expr'
+    TempExpr = 'temp_expr'
     Assign = 'assignment'
     LoopAssignment = 'loop_assignment'
     Program = 'program'
@@ -25,7 +30,13 @@ class AstNode:
         raise NotImplementedError
 
     @abc.abstractmethod
-    def codegen(self):
+    def codegen(self, assembly):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def c_codegen(self, source):
+        # Emits the C statements computing the node into `source` (a csource.CSource), and returns the C expression of
+        # its value
         raise NotImplementedError
 
 
@@ -41,12 +52,24 @@ class Num(AstNode):
     def type(self):
         return NodeType.Num
 
-    def codegen(self):
+    def check_range(self):
         if self._value >= (2 ** 64) - 1:
             raise ValueError(f'Cannot store {self._value} in a 64bit register')
-        code = f'''; {self}: Codegen
-mov rax, {self._value}'''
-        return code
+
+    def codegen(self, assembly):
+        self.check_range()
+        assembly.comment(self, 'Codegen')
+        assembly.emit('mov', 'rax', f'{self._value}')
+
+    def c_codegen(self, source):
+        self.check_range()
+        return csource.literal(self._value)
+
+    def __eq__(self, other):
+        return isinstance(other, Num) and self._value == other._value
+
+    def __hash__(self):
+        return hash((NodeType.Num, self._value))
 
     def __str__(self):
         return f'{self._value}'
@@ -68,10 +91,22 @@ class Var(AstNode):
     def type(self):
         return NodeType.Num
 
-    def codegen(self):
-        code = f'''; {self}: Codegen 
-mov rax, {self._name}'''
-        return code
+    def codegen(self, assembly):
+        assembly.comment(self, 'Codegen')
+        assembly.emit('mov', 'rax', self._name)
+
+    def c_codegen(self, source):
+        source.variables.add(self._name)
+        if self._name in csource.REGISTERS:
+            return self._name
+        # A temporary may be written again by an operand evaluated later, so its current value is read right away
+        return source.local(self._name)
+
+    def __eq__(self, other):
+        return isinstance(other, Var) and self._name == other._name
+
+    def __hash__(self):
+        return hash((NodeType.Var, self._name))
 
     def __str__(self):
         return self._name
@@ -85,6 +120,8 @@ class ArithExpr(AstNode):
         self._type = node_type
         self._left_operand = left_operand
         self._right_operand = right_operand
+        # Children hashes are cached as well, so hashing a subtree is O(1)
+        self._hash = hash((node_type, left_operand, right_operand))
 
     @property
     def left_operand(self):
@@ -98,35 +135,75 @@ class ArithExpr(AstNode):
     def type(self):
         return self._type
 
-    def _addsub_op(self, op):
-        code = f'''{op} rax, rbx'''
-        return code
-
-    def _muldiv_op(self, op):
-        code = f'''{op} rbx'''
-        return code
-
     def _op(self):
-        node_types_to_ops = {NodeType.AddExpr: self._addsub_op('add'),
-                             NodeType.SubExpr: self._addsub_op('sub'),
-                             NodeType.MulExpr: self._muldiv_op('mul'),
-                             NodeType.DivExpr: self._muldiv_op('div')}
+        node_types_to_ops = {NodeType.AddExpr: ('add', 'rax', 'rbx'),
+                             NodeType.SubExpr: ('sub', 'rax', 'rbx'),
+                             NodeType.MulExpr: ('mul', 'rbx'),
+                             NodeType.DivExpr: ('div', 'rbx')}
         return node_types_to_ops[self.type]
 
-    def codegen(self):
-        left_operand_code = self._left_operand.codegen()
-        right_operand_code = self._right_operand.codegen()
-        op = self._op()
-        code = f'''; {self}: Codegen for right operand
-{right_operand_code}
-; {self}: Pushing result of right operand evaluation
-push rax
-; {self}: Codegen for left operand
-{left_operand_code}
-; {self}: Applying op
-pop rbx
-{op}'''
-        return code
+    def _constant_operand(self):
+        # Returns the operand to evaluate and the constant to multiply or divide it by, if the op can be lowered into
+        # cheaper instructions than mul/div
+        if self.type == NodeType.MulExpr:
+            if isinstance(self._right_operand, Num):
+                return self._left_operand, self._right_operand
+            if isinstance(self._left_operand, Num):
+                return self._right_operand, self._left_operand
+        if self.type == NodeType.DivExpr and isinstance(self._right_operand, Num):
+            if self._right_operand.value % 2 ** 64 != 0:
+                return self._left_operand, self._right_operand
+        return None
+
+    def codegen(self, assembly):
+        constant_operand = self._constant_operand()
+        if constant_operand is not None:
+            operand, constant = constant_operand
+            constant.check_range()
+            assembly.comment(self, 'Codegen for non-constant operand')
+            operand.codegen(assembly)
+            assembly.comment(self, 'Applying op with constant operand')
+            if self.type == NodeType.MulExpr:
+                strength.emit_mul(assembly, constant.value)
+            else:
+                strength.emit_div(assembly, constant.value)
+            return
+
+        assembly.comment(self, 'Codegen for right operand')
+        self._right_operand.codegen(assembly)
+        assembly.comment(self, 'Pushing result of right operand evaluation')
+        assembly.emit('push', 'rax')
+        assembly.comment(self, 'Codegen for left operand')
+        self._left_operand.codegen(assembly)
+        assembly.comment(self, 'Applying op')
+        assembly.emit('pop', 'rbx')
+        if self.type == NodeType.DivExpr:
+            # div divides rdx:rax, and rdx holds leftovers of earlier muls and of printf
+            assembly.emit('xor', 'rdx', 'rdx')
+            assembly.runtime.emit_division_check(assembly, 'rbx')
+        assembly.emit(*self._op())
+
+    def c_codegen(self, source):
+        right = self._right_operand.c_codegen(source)
+        left = self._left_operand.c_codegen(source)
+        if self.type == NodeType.DivExpr:
+            if isinstance(self._right_operand, Num) and self._right_operand.value % 2 ** 64 != 0:
+                return source.local(f'{left} / {right}')
+            return source.local(f'divide({left}, {right})')
+        op = {NodeType.AddExpr: '+', NodeType.SubExpr: '-', NodeType.MulExpr: '*'}[self.type]
+        return source.local(f'{left} {op} {right}')
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return isinstance(other, ArithExpr) and \
+            self._hash == other._hash and \
+            self._type == other._type and \
+            self._right_operand == other._right_operand and \
+            self._left_operand == other._left_operand
+
+    def __hash__(self):
+        return self._hash
 
     def __str__(self):
         op_str = {NodeType.AddExpr: '+',
@@ -141,22 +218,69 @@ pop rbx
                f'right_operand={self._right_operand})'
 
 
+class TempExpr(AstNode):
+    def __init__(self, expr, temp):
+        self._expr = expr
+        self._temp = temp
+
+    @property
+    def expr(self):
+        return self._expr
+
+    @property
+    def temp(self):
+        return self._temp
+
+    @property
+    def type(self):
+        return NodeType.TempExpr
+
+    def codegen(self, assembly):
+        assembly.comment(self, 'Codegen')
+        self._expr.codegen(assembly)
+        assembly.comment(self, f'Keeping expression value in {self._temp}')
+        assembly.emit('mov', self._temp, 'rax')
+
+    def c_codegen(self, source):
+        value = self._expr.c_codegen(source)
+        source.variables.add(self._temp)
+        source.line(f'{self._temp} = {value};')
+        return value
+
+    def __str__(self):
+        return f'[{self._temp} := {self._expr}]'
+
+    def __repr__(self):
+        return f'TempExpr(expr={self._expr}, temp={self._temp})'
+
+
 class Assignment(AstNode):
     def __init__(self, var, expr):
         self._var = var
         self._expr = expr
 
+    @property
+    def var(self):
+        return self._var
+
+    @property
+    def expr(self):
+        return self._expr
+
     @property
     def type(self):
         return NodeType.Assign
 
-    def codegen(self):
-        expr_code = self._expr.codegen()
-        code = f'''; {self}: Codegen
-{expr_code}
-; {self}: Writing expression value to var 
-mov {self._var.name}, rax'''
-        return code
+    def codegen(self, assembly):
+        assembly.comment(self, 'Codegen')
+        self._expr.codegen(assembly)
+        assembly.comment(self, 'Writing expression value to var')
+        assembly.emit('mov', self._var.name, 'rax')
+
+    def c_codegen(self, source):
+        source.variables.add(self._var.name)
+        source.line(f'{self._var.name} = {self._expr.c_codegen(source)};')
+        return self._var.name
 
     def __str__(self):
         return f'{self._var} <- {self._expr}'
@@ -166,35 +290,37 @@ mov {self._var.name}, rax'''
 
 
 class LoopAssignment(AstNode):
-    _label_counter = 0
-
     def __init__(self, counter, assignments):
-        self._label = f'loop_{self._label_counter}'
-        self._label_counter += 1
-
         self._counter = counter
         self._assignments = assignments
 
+    @property
+    def counter(self):
+        return self._counter
+
+    @property
+    def assignments(self):
+        return self._assignments
+
     @property
     def type(self):
         return NodeType.LoopAssignment
 
-    def _assignments_code(self):
-        return [assignment.codegen() for assignment in self._assignments]
-
-    def codegen(self):
-        assignments_code = "\n".join(self._assignments_code())
-        counter_code = self._counter.codegen()
-        code = f'''
-; {self}: Evaluating counter
-{counter_code}
-; {self}: Storing counter in rcx
-mov rcx, rax
-{self._label}:
-; {self}: Assignments code
-{assignments_code}
-loop {self._label}'''
-        return code
+    def codegen(self, assembly):
+        count = self._counter.value if isinstance(self._counter, Num) else None
+        loops.emit_loop(assembly, self, count)
+
+    def c_codegen(self, source):
+        # Like the generated assembly, a count of 0 doesn't run the body, and leaves the count as the loop's value
+        count = source.local(self._counter.c_codegen(source))
+        if not self._assignments:
+            return count
+        iteration = source.new_name('i')
+        source.begin(f'for (uint64_t {iteration} = {count}; {iteration} != 0; {iteration}--)')
+        for assignment in self._assignments:
+            assignment.c_codegen(source)
+        source.end()
+        return source.local(f'{count} != 0 ? {self._assignments[-1].var.name} : {count}')
 
     def __str__(self):
         return f"loop {self._counter}"
@@ -207,6 +333,10 @@ class Program(AstNode):
     def __init__(self, statements):
         self._statements = statements
 
+    @property
+    def statements(self):
+        return self._statements
+
     @property
     def type(self):
         return NodeType.Program
@@ -216,45 +346,30 @@ class Program(AstNode):
         statements = "\n".join(statements)
         return f'Program({statements})'
 
-    def codegen(self):
-        statements_code = [statement.codegen() for statement in self._statements]
-        printed_statements = [f'{statement}\ncall print_rax\n' for statement in statements_code]
-        statements = "".join(printed_statements)
-        code = f'''
-global main
-main:
-; Resetting r10, r11, r12, r13
-mov r10, 0
-mov r11, 0
-mov r12, 0
-mov r13, 0
-{statements}
-
-mov rax, 60
-mov rdi, 0
-syscall
-
-section .data
-format: db "%lld", 10
-
-section .text
-extern printf
-print_rax:
-    push rax
-    push rcx
-    push r10
-    push r11
-    push r12
-    push r13
-    mov rdi, format
-    mov rsi, rax
-    mov rax, 0
-    call printf
-    pop r13
-    pop r12
-    pop r11
-    pop r10
-    pop rcx
-    pop rax
-    ret'''
-        return code
+    def codegen(self, assembly):
+        runtime = assembly.runtime
+        runtime.emit_entry(assembly)
+        assembly.comment(None, 'Resetting r10, r11, r12, r13')
+        for register in ('r10', 'r11', 'r12', 'r13'):
+            assembly.emit('mov', register, '0')
+
+        profile = assembly.profile
+        for index, statement in enumerate(self._statements):
+            if profile is not None:
+                profile.emit_statement_start(assembly, index)
+            statement.codegen(assembly)
+            if profile is not None:
+                profile.emit_statement_end(assembly)
+            assembly.emit('call', 'print_rax')
+
+        if profile is not None:
+            runtime.emit_profile_dump(assembly, profile)
+        runtime.emit_exit(assembly)
+        runtime.emit_routines(assembly)
+        if profile is not None:
+            profile.emit_counters(assembly)
+
+    def c_codegen(self, source):
+        for statement in self._statements:
+            source.line(f'print({statement.c_codegen(source)});')
+        return None
@@ -0,0 +1,123 @@
+import base64
+import json
+import os
+import socket
+import struct
+
+import compiler.elf as elf
+
+SOCKET_ENV = 'ARITH_COMPILER_SOCKET'
+# Seconds to wait for the server to accept a request and then to respond, before compiling in-process instead
+TIMEOUT = 60
+
+
+class ServerUnavailable(Exception):
+    pass
+
+
+class UntrustedServer(ServerUnavailable):
+    # The socket is served by another user, whose responses would be written to the output as they are
+    pass
+
+
+def private_socket_directory():
+    # A directory only the current user can access, which the server creates (and checks) in the shared temporary
+    # directory
+    return os.path.join(os.environ.get('TMPDIR', '/tmp'), f'arith-compiler-{os.getuid()}')
+
+
+def default_socket_path():
+    # In a directory other users can't write to, so that no one else can listen on the socket first
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime_directory = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_directory:
+        return os.path.join(runtime_directory, 'arith-compiler.sock')
+    return os.path.join(private_socket_directory(), 'compiler.sock')
+
+
+def _check_server_owner(connection, path):
+    if hasattr(socket, 'SO_PEERCRED'):
+        # The user of the process listening, rather than of the socket file (which may be replaced in the meantime)
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+    else:
+        uid = os.stat(path).st_uid
+    if uid != os.getuid():
+        raise UntrustedServer(f'The compile server on {path} is run by another user ({uid})')
+
+
+def is_running(path=None):
+    if path is None:
+        path = default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(TIMEOUT)
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError, socket.timeout):
+            return False
+    return True
+
+
+def request(payload, path=None, timeout=TIMEOUT):
+    # Sends a single JSON line to the compile server and returns its JSON line response. Doesn't import the compiler,
+    # so a client doesn't pay for building it. A server that doesn't respond within `timeout` seconds is unavailable
+    if path is None:
+        path = default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+            raise ServerUnavailable(f'No compile server is listening on {path}') from e
+        _check_server_owner(connection, path)
+        try:
+            connection.sendall(json.dumps(payload).encode() + b'\n')
+            with connection.makefile('rb') as response_file:
+                response = response_file.readline()
+        except socket.timeout as e:
+            raise ServerUnavailable(f'The compile server on {path} didn\'t respond within {timeout} seconds') from e
+
+    if not response:
+        raise ServerUnavailable(f'The compile server on {path} closed the connection')
+    return json.loads(response)
+
+
+def compile_code(code, comments=False, jobs=None, path=None, profile=False):
+    response = request({'code': code, 'comments': comments, 'jobs': jobs, 'profile': profile}, path)
+    if 'error' in response:
+        raise Exception(response['error'])
+    return response['assembly']
+
+
+def compile_c_code(code, jobs=None, path=None):
+    response = request({'code': code, 'jobs': jobs, 'c_source': True}, path)
+    if 'error' in response:
+        raise Exception(response['error'])
+    return response['c_source']
+
+
+def compile_report(code, jobs=None, path=None):
+    response = request({'code': code, 'jobs': jobs, 'report': True}, path)
+    if 'error' in response:
+        raise Exception(response['error'])
+    return response['report']
+
+
+def compile_file(_input, output, comments=False, jobs=None, executable=False, path=None, profile=False,
+                 c_source=False, report=False):
+    # The server reads the input itself, so only its path goes through the socket
+    response = request({'path': os.path.abspath(_input), 'comments': comments, 'jobs': jobs, 'executable': executable,
+                        'profile': profile, 'c_source': c_source, 'report': report}, path)
+    if 'error' in response:
+        raise Exception(response['error'])
+
+    if executable:
+        elf.write(output, base64.b64decode(response['executable']))
+        return
+    with open(output, 'wt') as output_file:
+        if report:
+            output_file.write(response['report'])
+        else:
+            output_file.write(response['c_source'] if c_source else response['assembly'])
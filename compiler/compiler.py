@@ -1,17 +1,103 @@
-import compiler.parser as parser
+import compiler.generated_parser as generated_parser
+import compiler.parallel as parallel
+import compiler.partial as partial
+import compiler.liveness as liveness
+import compiler.cse as cse
+import compiler.asm as asm
+import compiler.cost as cost
+import compiler.csource as csource
+import compiler.peephole as peephole
+import compiler.loops as loops
+import compiler.profile as profiling
+import compiler.runtime as runtime
+import compiler.encoder as encoder
+import compiler.elf as elf
 
 
-def compile_file(_input, output):
+def compile_file(_input, output, comments=False, jobs=None, executable=False, profile=False, c_source=False,
+                 report=False):
     with open(_input, 'rt') as input_file:
         input_code = input_file.read()
-    compile(input_code, output)
+    compile(input_code, output, comments, jobs, executable, profile, c_source, report)
 
 
-def compile(code, output):
-    ast = parser.nt_statements(code)
+def optimize(program, partial_evaluation=True):
+    if partial_evaluation:
+        program = partial.partially_evaluate(program)
+    program = liveness.eliminate_dead_stores(program)
+    return cse.eliminate_common_subexpressions(program)
+
+
+def generate(program, comments=False, target_runtime=None, unroll_factor=loops.UNROLL_FACTOR, profile=None):
+    assembly = asm.Assembly(comments, target_runtime, unroll_factor, profile)
+    program.codegen(assembly)
+    return assembly.instructions
+
+
+def parse(code, jobs=None):
+    # Large inputs are split into chunks parsed in parallel, by `jobs` processes (defaults to the number of CPUs)
+    if len(code) < parallel.PARALLEL_THRESHOLD:
+        return generated_parser.parse_statements(code)
+    return parallel.parse(code, jobs)
+
+
+def generate_c(program):
+    source = csource.CSource()
+    program.c_codegen(source)
+    return source.serialize()
+
+
+def parse_program(code, jobs=None):
+    ast = parse(code, jobs)
     if ast.next_token_index < len(code):
         raise Exception(f'Failed to parse code at {ast.next_token_index}')
-    output_code = ast.match.codegen()
+    return ast.match
+
+
+def compile_instructions(code, comments=False, jobs=None, target_runtime=None, profile=False):
+    # With `profile`, the program measures the cycles each top-level statement takes, see compiler/profile.py. Partial
+    # evaluation would fold statements into constants, so profiled programs run the statements as written instead
+    program = optimize(parse_program(code, jobs), partial_evaluation=not profile)
+    statements_profile = profiling.Profile(profiling.statement_lines(code)) if profile else None
+    return peephole.optimize(generate(program, comments, target_runtime, profile=statements_profile))
+
+
+def compile_code(code, comments=False, jobs=None, profile=False):
+    return asm.serialize(compile_instructions(code, comments, jobs, runtime.LIBC, profile))
+
+
+def compile_c_code(code, jobs=None):
+    # The same program as compile_code's, as C source for a C compiler to optimize further (e.g. gcc -O2)
+    return generate_c(optimize(parse_program(code, jobs)))
+
+
+def compile_report(code, jobs=None):
+    # What each top-level statement of the compiled program is estimated to cost, see compiler/cost.py. Like profiled
+    # programs, it's compiled without partial evaluation, so that the costs are those of the statements as written
+    program = optimize(parse_program(code, jobs), partial_evaluation=False)
+    return cost.report(cost.estimate(program, profiling.statement_lines(code)))
+
+
+def link(instructions):
+    # Encodes instructions generated for the static runtime into the bytes of an executable
+    return elf.executable(encoder.encode(instructions), runtime.STATIC.entry)
+
+
+def compile_executable(code, jobs=None, profile=False):
+    return link(compile_instructions(code, False, jobs, runtime.STATIC, profile))
+
+
+def compile(code, output, comments=False, jobs=None, executable=False, profile=False, c_source=False, report=False):
+    if executable:
+        elf.write(output, compile_executable(code, jobs, profile))
+        return
+
+    if report:
+        output_code = compile_report(code, jobs)
+    elif c_source:
+        output_code = compile_c_code(code, jobs)
+    else:
+        output_code = compile_code(code, comments, jobs, profile)
 
     with open(output, 'wt') as output_file:
         output_file.write(output_code)
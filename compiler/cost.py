@@ -0,0 +1,172 @@
+import compiler.asm as asm
+import compiler.ast as arith_ast
+import compiler.loops as loops
+import compiler.peephole as peephole
+
+_WORD = 2 ** 64
+
+# Estimated cycles per instruction, roughly their latencies on recent x86_64 cores. Reading back a pushed value waits
+# for the store to be forwarded, and 64 bit division is the slowest instruction by far. Other instructions take 1
+_CYCLES = {
+    'mul': 3,
+    'imul': 3,
+    'div': 40,
+    'pop': 4,
+}
+
+
+class Cost:
+    # What running some code costs: how many instructions it executes, the cycles they take, and how many values
+    # ArithExpr pushes to the stack (and pops back) that the peephole optimizer couldn't keep in registers
+
+    def __init__(self, instructions=0, cycles=0, stack_pairs=0):
+        self.instructions = instructions
+        self.cycles = cycles
+        self.stack_pairs = stack_pairs
+
+    def __add__(self, other):
+        return Cost(self.instructions + other.instructions, self.cycles + other.cycles,
+                    self.stack_pairs + other.stack_pairs)
+
+    def __mul__(self, times):
+        return Cost(self.instructions * times, self.cycles * times, self.stack_pairs * times)
+
+    def __eq__(self, other):
+        return isinstance(other, Cost) and \
+            (self.instructions, self.cycles, self.stack_pairs) == \
+            (other.instructions, other.cycles, other.stack_pairs)
+
+    def __repr__(self):
+        return f'Cost(instructions={self.instructions}, cycles={self.cycles}, stack_pairs={self.stack_pairs})'
+
+
+class StatementCost:
+    # The estimate of a top-level statement. `size` counts every instruction of its code once, and `executed` is what
+    # running it costs, or None when it loops for a number of iterations only known at run time. Like the counters of
+    # compiler/profile.py, `iterations` is how many times a loop's body runs (None when unknown) and 0 for
+    # assignments, and `per_iteration` is the cost of one run of a loop's body (None for assignments)
+
+    def __init__(self, line, size, executed, iterations, per_iteration):
+        self.line = line
+        self.size = size
+        self.executed = executed
+        self.iterations = iterations
+        self.per_iteration = per_iteration
+
+
+def instruction_cost(instruction):
+    return Cost(1, _CYCLES.get(instruction.opcode, 1), 1 if instruction.opcode == 'push' else 0)
+
+
+def _code(instructions):
+    return [instruction for instruction in instructions if isinstance(instruction, (asm.Instruction, asm.Label))]
+
+
+def _statements_code(program, unroll_factor):
+    # The code of every top-level statement, as Program.codegen generates it and the peephole optimizer rewrites it
+    # (depending on the code around it). Comments don't change what the optimizer does, so they mark where each
+    # statement starts, and it ends with the call printing its value (which isn't part of its cost)
+    assembly = asm.Assembly(unroll_factor=unroll_factor)
+    for register in ('r10', 'r11', 'r12', 'r13'):
+        assembly.emit('mov', register, '0')
+    markers = []
+    for statement in program.statements:
+        markers.append(asm.Comment('statement'))
+        assembly.instructions.append(markers[-1])
+        statement.codegen(assembly)
+        assembly.emit('call', 'print_rax')
+    assembly.runtime.emit_exit(assembly)
+
+    instructions = peephole.optimize(assembly.instructions)
+    starts = [index for index, instruction in enumerate(instructions)
+              if any(instruction is marker for marker in markers)]
+    codes = []
+    for start in starts:
+        end = next(index for index in range(start, len(instructions))
+                   if isinstance(instructions[index], asm.Instruction) and instructions[index].opcode == 'call')
+        codes.append(_code(instructions[start:end]))
+    return codes
+
+
+def _body_code(loop):
+    # The code of one run of the body of `loop`
+    assembly = asm.Assembly()
+    for assignment in loop.assignments:
+        assignment.codegen(assembly)
+    assembly.emit('call', 'print_rax')
+    return _code(peephole.optimize(assembly.instructions)[:-1])
+
+
+def _trips(code, labels, index):
+    # How many times the loop ending with the jump at `index` runs, when it's one of the counted loops emit_loop
+    # generates for constant counts: `mov rcx, <trips>`, the loop's label, its body, then `dec rcx` and `jnz <label>`
+    jump = code[index]
+    start = labels.get(jump.operands[0])
+    if jump.opcode != 'jnz' or start is None or start > index or code[index - 1].opcode != 'dec':
+        return None
+    counter = code[index - 1].operands[0]
+    for instruction in reversed(code[:start]):
+        if isinstance(instruction, asm.Instruction) and counter in instruction.writes():
+            if instruction.opcode == 'mov' and asm.is_immediate(instruction.operands[1]):
+                return int(instruction.operands[1]) % _WORD
+            return None
+    return None
+
+
+def _executed(code):
+    # The cost of running `code`, or None when one of its branches depends on values only known at run time
+    weights = [1] * len(code)
+    labels = {instruction.name: index for index, instruction in enumerate(code) if isinstance(instruction, asm.Label)}
+    for index, instruction in enumerate(code):
+        if isinstance(instruction, asm.Label) or not instruction.is_control_flow():
+            continue
+        trips = _trips(code, labels, index)
+        if trips is None:
+            return None
+        for body_index in range(labels[instruction.operands[0]] + 1, index + 1):
+            weights[body_index] = trips
+
+    return sum((instruction_cost(instruction) * weight for instruction, weight in zip(code, weights)
+                if isinstance(instruction, asm.Instruction)), Cost())
+
+
+def _estimate_statement(statement, line, code):
+    size = sum((instruction_cost(instruction) for instruction in code if isinstance(instruction, asm.Instruction)),
+               Cost())
+    executed = _executed(code)
+    if statement.type != arith_ast.NodeType.LoopAssignment:
+        return StatementCost(line, size, executed, 0, None)
+
+    counter = statement.counter
+    iterations = counter.value % _WORD if isinstance(counter, arith_ast.Num) else None
+    return StatementCost(line, size, executed, iterations, _executed(_body_code(statement)))
+
+
+def estimate(program, lines, unroll_factor=loops.UNROLL_FACTOR):
+    # Estimates what each top-level statement of `program` (as optimized for compiling) costs, given the line each
+    # starts on (see profile.statement_lines), without running anything
+    return [_estimate_statement(statement, line, code)
+            for statement, line, code in zip(program.statements, lines, _statements_code(program, unroll_factor))]
+
+
+def _field(value):
+    return '?' if value is None else str(value)
+
+
+def report(costs):
+    # A line per statement, then the totals. Unknown values (of loops running for as long as a register says) are `?`,
+    # and so are the totals they're part of
+    lines = ['# line instructions executed cycles stack_pairs iterations cycles_per_iteration']
+    for cost in costs:
+        executed = cost.executed if cost.executed is not None else Cost(None, None, None)
+        per_iteration = cost.per_iteration.cycles if cost.per_iteration is not None else 0
+        lines.append(' '.join(_field(value) for value in (
+            cost.line, cost.size.instructions, executed.instructions, executed.cycles, executed.stack_pairs,
+            cost.iterations, per_iteration)))
+
+    size = sum((cost.size for cost in costs), Cost())
+    known = all(cost.executed is not None for cost in costs)
+    executed = sum((cost.executed for cost in costs), Cost()) if known else Cost(None, None, None)
+    lines.append(' '.join(_field(value) for value in (
+        '# total', size.instructions, executed.instructions, executed.cycles, executed.stack_pairs)))
+    return '\n'.join(lines) + '\n'
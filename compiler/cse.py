@@ -0,0 +1,129 @@
+import collections
+
+import compiler.ast as arith_ast
+
+# Registers that are never written by the code of any other node, and that survive `print_rax`
+SCRATCH_REGISTERS = ('r8', 'r9', 'r14', 'r15')
+
+
+def hash_cons(expr, table):
+    if isinstance(expr, arith_ast.ArithExpr):
+        left_operand = hash_cons(expr.left_operand, table)
+        right_operand = hash_cons(expr.right_operand, table)
+        if left_operand is not expr.left_operand or right_operand is not expr.right_operand:
+            expr = arith_ast.ArithExpr(expr.type, left_operand, right_operand)
+
+    return table.setdefault(expr, expr)
+
+
+class _Region:
+    # A sequence of assignments that executes straight-line, with no loop boundary in the middle of it.
+    # Every arithmetic subtree is keyed by the subtree itself along with the current version of each register it reads,
+    # so an assignment to a register implicitly invalidates every value computed from it
+
+    def __init__(self, assignments, registers):
+        self._assignments = assignments
+        self._registers = registers
+        self._uses = {}
+        self._counts = collections.Counter()
+
+    def _expr_uses(self, expr):
+        uses = self._uses.get(expr)
+        if uses is None:
+            if isinstance(expr, arith_ast.Var):
+                uses = frozenset((expr.name,))
+            elif isinstance(expr, arith_ast.ArithExpr):
+                uses = self._expr_uses(expr.left_operand) | self._expr_uses(expr.right_operand)
+            else:
+                uses = frozenset()
+            self._uses[expr] = uses
+
+        return uses
+
+    def _key(self, expr, versions):
+        return expr, tuple(sorted((var, versions[var]) for var in self._expr_uses(expr)))
+
+    def _count(self, expr, versions):
+        if not isinstance(expr, arith_ast.ArithExpr):
+            return
+
+        key = self._key(expr, versions)
+        self._counts[key] += 1
+        # Subtrees of a repeated occurrence are not counted, since that occurrence will not be evaluated at all
+        if self._counts[key] == 1:
+            self._count(expr.right_operand, versions)
+            self._count(expr.left_operand, versions)
+
+    def _rewrite(self, expr, versions, remaining, available, free_registers):
+        if not isinstance(expr, arith_ast.ArithExpr):
+            return expr
+
+        key = self._key(expr, versions)
+        remaining[key] -= 1
+        if key in available:
+            temp = available[key]
+            if remaining[key] <= 0:
+                del available[key]
+                free_registers.append(temp)
+            return arith_ast.Var(temp)
+
+        # Operands are rewritten in evaluation order (right operand first), so the first evaluated occurrence of a
+        # subtree is the one keeping its value
+        right_operand = self._rewrite(expr.right_operand, versions, remaining, available, free_registers)
+        left_operand = self._rewrite(expr.left_operand, versions, remaining, available, free_registers)
+        if left_operand is not expr.left_operand or right_operand is not expr.right_operand:
+            expr = arith_ast.ArithExpr(expr.type, left_operand, right_operand)
+
+        if self._counts[key] > 1 and remaining[key] > 0 and free_registers:
+            temp = free_registers.pop()
+            available[key] = temp
+            return arith_ast.TempExpr(expr, temp)
+
+        return expr
+
+    def eliminate(self):
+        versions = collections.Counter()
+        for assignment in self._assignments:
+            self._count(assignment.expr, versions)
+            versions[assignment.var.name] += 1
+
+        versions = collections.Counter()
+        remaining = collections.Counter(self._counts)
+        available = {}
+        free_registers = list(reversed(self._registers))
+        assignments = []
+        for assignment in self._assignments:
+            expr = self._rewrite(assignment.expr, versions, remaining, available, free_registers)
+            assignments.append(arith_ast.Assignment(assignment.var, expr))
+
+            target = assignment.var.name
+            versions[target] += 1
+            for key in [key for key in available if target in self._expr_uses(key[0])]:
+                free_registers.append(available.pop(key))
+
+        return assignments
+
+
+def eliminate_common_subexpressions(program, registers=SCRATCH_REGISTERS):
+    table = {}
+    statements = []
+    region = []
+
+    def flush_region():
+        statements.extend(_Region(region, registers).eliminate())
+        region.clear()
+
+    for statement in program.statements:
+        if statement.type == arith_ast.NodeType.LoopAssignment:
+            flush_region()
+            assignments = [arith_ast.Assignment(assignment.var, hash_cons(assignment.expr, table))
+                           for assignment in statement.assignments]
+            # Each iteration of the body starts with no available values, since the previous iteration may have changed
+            # any register
+            assignments = _Region(assignments, registers).eliminate()
+            statements.append(arith_ast.LoopAssignment(statement.counter, assignments))
+        else:
+            region.append(arith_ast.Assignment(statement.var, hash_cons(statement.expr, table)))
+
+    flush_region()
+    return arith_ast.Program(statements)
@@ -0,0 +1,81 @@
+_WORD = 2 ** 64
+
+# The registers of the language, which only top-level statements and loop bodies write. Any other register is a
+# temporary written within expressions (see cse.SCRATCH_REGISTERS)
+REGISTERS = ('r10', 'r11', 'r12', 'r13')
+
+_PRELUDE = '''#include <inttypes.h>
+#include <signal.h>
+#include <stdint.h>
+#include <stdio.h>
+
+/* Dividing by 0 faults, like the div instruction does (after printing what the program printed so far) */
+static inline uint64_t divide(uint64_t left, uint64_t right) {
+    if (right == 0) {
+        fflush(stdout);
+        raise(SIGFPE);
+    }
+    return left / right;
+}
+
+/* Values are printed as signed, without relying on the (implementation defined) conversion to int64_t */
+static void print(uint64_t value) {
+    if (value >> 63) {
+        printf("-%" PRIu64 "\\n", -value);
+    } else {
+        printf("%" PRIu64 "\\n", value);
+    }
+}
+'''
+
+
+def literal(value):
+    return f'UINT64_C({value % _WORD})'
+
+
+class CSource:
+    # Collects the statements of the main function of a C program, emitted by c_codegen. Every register is a uint64_t
+    # variable, so arithmetic wraps around like the generated assembly's. Expressions are broken down into one local
+    # per operation, in the order the generated assembly evaluates them (right operand first), which is what a
+    # temporary written in the middle of an expression requires
+
+    def __init__(self):
+        self.lines = []
+        # The registers (and temporaries) the program uses, which are the only ones declared
+        self.variables = set()
+        self._depth = 1
+        self._name_counts = {}
+
+    def new_name(self, prefix):
+        # Names are numbered per prefix, in the order they're created
+        count = self._name_counts.get(prefix, 0)
+        self._name_counts[prefix] = count + 1
+        return f'{prefix}{count}'
+
+    def line(self, text):
+        self.lines.append('    ' * self._depth + text)
+
+    def begin(self, header):
+        self.line(f'{header} {{')
+        self._depth += 1
+
+    def end(self):
+        self._depth -= 1
+        self.line('}')
+
+    def local(self, value):
+        # Returns a new local holding `value`
+        name = self.new_name('t')
+        self.line(f'const uint64_t {name} = {value};')
+        return name
+
+    def serialize(self):
+        variables = sorted(self.variables, key=lambda name: (name not in REGISTERS, name))
+        declarations = [f'    uint64_t {", ".join(f"{name} = 0" for name in variables)};'] if variables else []
+        return '\n'.join([_PRELUDE,
+                          'int main(void) {',
+                          *declarations,
+                          *self.lines,
+                          '    return 0;',
+                          '}',
+                          ''])
@@ -0,0 +1,42 @@
+import os
+import struct
+
+BASE_ADDRESS = 0x400000
+PAGE_SIZE = 0x1000
+
+_HEADER_SIZE = 64
+_PROGRAM_HEADER_SIZE = 56
+
+_PT_LOAD = 1
+_PF_X = 1
+_PF_W = 2
+_PF_R = 4
+
+
+def _program_header(flags, offset, address, file_size, memory_size):
+    return struct.pack('<IIQQQQQQ', _PT_LOAD, flags, offset, address, address, file_size, memory_size, PAGE_SIZE)
+
+
+def executable(object_code, entry):
+    # A static executable with no section headers: the ELF header and the code are loaded together as a read-only and
+    # executable segment, and .bss (when used) is zero-filled memory on the following page
+    segments = 2 if object_code.bss_size else 1
+    text_offset = _HEADER_SIZE + _PROGRAM_HEADER_SIZE * segments
+    text_address = BASE_ADDRESS + text_offset
+    file_size = text_offset + len(object_code.text)
+    bss_address = -(-(BASE_ADDRESS + file_size) // PAGE_SIZE) * PAGE_SIZE
+
+    header = b'\x7fELF' + bytes([2, 1, 1, 0]) + bytes(8)
+    header += struct.pack('<HHIQQQIHHHHHH', 2, 0x3e, 1, text_address + object_code.labels[entry], _HEADER_SIZE, 0, 0,
+                          _HEADER_SIZE, _PROGRAM_HEADER_SIZE, segments, 0, 0, 0)
+    header += _program_header(_PF_R | _PF_X, 0, BASE_ADDRESS, file_size, file_size)
+    if object_code.bss_size:
+        header += _program_header(_PF_R | _PF_W, 0, bss_address, 0, object_code.bss_size)
+
+    return header + object_code.link(text_address, bss_address)
+
+
+def write(path, data):
+    with open(path, 'wb') as output_file:
+        output_file.write(data)
+    os.chmod(path, os.stat(path).st_mode | 0o111)
@@ -0,0 +1,371 @@
+import struct
+
+import compiler.asm as asm
+
+_WORD = 2 ** 64
+
+_REGISTER_NUMBERS = {'rax': 0, 'rcx': 1, 'rdx': 2, 'rbx': 3, 'rsp': 4, 'rbp': 5, 'rsi': 6, 'rdi': 7,
+                     'r8': 8, 'r9': 9, 'r10': 10, 'r11': 11, 'r12': 12, 'r13': 13, 'r14': 14, 'r15': 15}
+_BYTE_REGISTER_NUMBERS = {'al': 0, 'cl': 1, 'dl': 2, 'bl': 3}
+
+# The first opcode byte of `op r/m64, r64`, and the /digit of `op r/m64, imm`
+_ARITHMETIC = {'add': (0x01, 0), 'or': (0x09, 1), 'and': (0x21, 4), 'sub': (0x29, 5), 'xor': (0x31, 6),
+               'cmp': (0x39, 7)}
+# The /digit of `op r/m64` (0xf7) and of `op r/m64, imm8` (0xc1)
+_UNARY = {'not': 2, 'neg': 3, 'mul': 4, 'div': 6}
+_SHIFTS = {'shl': 4, 'shr': 5, 'sar': 7}
+_CONDITIONS = {'jo': 0x0, 'jno': 0x1, 'jb': 0x2, 'jae': 0x3, 'je': 0x4, 'jz': 0x4, 'jne': 0x5, 'jnz': 0x5,
+               'jbe': 0x6, 'ja': 0x7, 'js': 0x8, 'jns': 0x9, 'jl': 0xc, 'jge': 0xd, 'jle': 0xe, 'jg': 0xf}
+_NO_OPERANDS = {'syscall': b'\x0f\x05', 'ret': b'\xc3', 'rdtsc': b'\x0f\x31', 'nop': b'\x90'}
+_BSS_SIZES = {'resb': 1, 'resq': 8}
+
+
+class EncodingError(Exception):
+    pass
+
+
+class Memory:
+    # A `[base + index*scale + displacement]` operand
+    def __init__(self, base, index=None, scale=1, displacement=0):
+        self.base = base
+        self.index = index
+        self.scale = scale
+        self.displacement = displacement
+
+
+class ObjectCode:
+    # Machine code of the .text section, the .bss section's layout, and the absolute addresses to patch in the code
+    # once the sections are placed: (offset in text, symbol) pairs for 8 bytes holding the symbol's address
+    def __init__(self, text, labels, bss_labels, bss_size, relocations):
+        self.text = text
+        self.labels = labels
+        self.bss_labels = bss_labels
+        self.bss_size = bss_size
+        self.relocations = relocations
+
+    def symbol_address(self, symbol, text_address, bss_address):
+        if symbol in self.labels:
+            return text_address + self.labels[symbol]
+        return bss_address + self.bss_labels[symbol]
+
+    def link(self, text_address, bss_address):
+        text = bytearray(self.text)
+        for offset, symbol in self.relocations:
+            text[offset:offset + 8] = struct.pack('<Q', self.symbol_address(symbol, text_address, bss_address))
+        return bytes(text)
+
+
+def _immediate(operand):
+    try:
+        return int(operand) % _WORD
+    except ValueError:
+        return None
+
+
+def _signed(value):
+    return value - _WORD if value >= 2 ** 63 else value
+
+
+def _fits(value, bits):
+    return -2 ** (bits - 1) <= _signed(value) < 2 ** (bits - 1)
+
+
+def _memory(operand):
+    size = None
+    for prefix in ('byte', 'qword'):
+        if operand.startswith(prefix + ' '):
+            size = prefix
+            operand = operand[len(prefix):].strip()
+    if not (operand.startswith('[') and operand.endswith(']')):
+        return None, None
+
+    memory = Memory(None)
+    for term in operand[1:-1].replace('-', '+-').split('+'):
+        term = term.replace(' ', '')
+        if not term:
+            continue
+        if '*' in term:
+            register, scale = term.split('*')
+            if register not in _REGISTER_NUMBERS or memory.index is not None or int(scale) not in (1, 2, 4, 8):
+                raise EncodingError(f'Unsupported address {operand}')
+            memory.index, memory.scale = register, int(scale)
+        elif term in _REGISTER_NUMBERS:
+            if memory.base is None:
+                memory.base = term
+            elif memory.index is None:
+                memory.index = term
+            else:
+                raise EncodingError(f'Unsupported address {operand}')
+        else:
+            memory.displacement += int(term)
+    if memory.base is None:
+        raise EncodingError(f'Unsupported address {operand} (an address needs a base register)')
+    if memory.index == 'rsp':
+        raise EncodingError(f'Unsupported address {operand} (rsp cannot be an index)')
+    return memory, size
+
+
+def _rex(w, reg, index, rm, force=False):
+    rex = 0x40 | (w << 3) | ((reg >> 3) << 2) | ((index >> 3) << 1) | (rm >> 3)
+    return bytes([rex]) if rex != 0x40 or force else b''
+
+
+def _modrm(w, opcode, reg, rm):
+    # `rm` is either a register number or a Memory
+    if not isinstance(rm, Memory):
+        return _rex(w, reg, 0, rm) + opcode + bytes([0xc0 | ((reg & 7) << 3) | (rm & 7)])
+
+    base = _REGISTER_NUMBERS[rm.base]
+    index = _REGISTER_NUMBERS[rm.index] if rm.index is not None else None
+    displacement = rm.displacement
+    if displacement == 0 and base & 7 != 5:
+        mod, displacement_bytes = 0, b''
+    elif -128 <= displacement < 128:
+        mod, displacement_bytes = 1, struct.pack('<b', displacement)
+    else:
+        mod, displacement_bytes = 2, struct.pack('<i', displacement)
+
+    if index is None and base & 7 != 4:
+        encoded = bytes([(mod << 6) | ((reg & 7) << 3) | (base & 7)])
+        return _rex(w, reg, 0, base) + opcode + encoded + displacement_bytes
+
+    # A SIB byte, where index 4 (rsp) means no index
+    scale = {1: 0, 2: 1, 4: 2, 8: 3}[rm.scale]
+    sib_index = index if index is not None else 4
+    encoded = bytes([(mod << 6) | ((reg & 7) << 3) | 4, (scale << 6) | ((sib_index & 7) << 3) | (base & 7)])
+    return _rex(w, reg, sib_index, base) + opcode + encoded + displacement_bytes
+
+
+class _Encoder:
+    # `long_loops` are the positions of the loop instructions whose target is too far for a short jump
+    def __init__(self, long_loops=frozenset()):
+        self.long_loops = long_loops
+        self.text = bytearray()
+        self.labels = {}
+        self.bss_labels = {}
+        self.bss_size = 0
+        self.relocations = []
+        self.externs = set()
+        # (offset of the relative displacement, its size, target label, position of the instruction)
+        self._jumps = []
+        self._position = None
+
+    def _emit(self, code):
+        self.text += code
+
+    def _jump(self, code, label, size):
+        self._emit(code)
+        self._jumps.append((len(self.text), size, label, self._position))
+        self._emit(bytes(size))
+
+    def far_loops(self):
+        far_loops = set()
+        for offset, size, label, position in self._jumps:
+            if size == 1 and label in self.labels and not -128 <= self.labels[label] - (offset + size) < 128:
+                far_loops.add(position)
+        return far_loops
+
+    def finish(self):
+        for offset, size, label, _ in self._jumps:
+            if label not in self.labels:
+                raise EncodingError(f'Undefined label {label}')
+            relative = self.labels[label] - (offset + size)
+            if size == 1 and not -128 <= relative < 128:
+                raise EncodingError(f'{label} is too far for a short jump')
+            self.text[offset:offset + size] = struct.pack('<b' if size == 1 else '<i', relative)
+
+        for _, symbol in self.relocations:
+            if symbol not in self.labels and symbol not in self.bss_labels:
+                raise EncodingError(f'Undefined symbol {symbol}')
+        return ObjectCode(bytes(self.text), self.labels, self.bss_labels, self.bss_size, self.relocations)
+
+    def directive(self, text, section):
+        parts = text.split()
+        if parts[0] == 'section':
+            return parts[1]
+        if parts[0] == 'global':
+            return section
+        if parts[0] == 'extern':
+            self.externs.update(name.strip() for name in ' '.join(parts[1:]).split(','))
+            return section
+        if section == '.bss' and len(parts) == 3 and parts[0].endswith(':') and parts[1] in _BSS_SIZES:
+            size = _BSS_SIZES[parts[1]]
+            # Keeping every reservation aligned to its unit
+            self.bss_size = -(-self.bss_size // size) * size
+            self.bss_labels[parts[0][:-1]] = self.bss_size
+            self.bss_size += size * int(parts[2])
+            return section
+        raise EncodingError(f'Unsupported directive {text} in section {section}')
+
+    def instruction(self, instruction, position):
+        self._position = position
+        opcode = instruction.opcode
+        operands = instruction.operands
+        if opcode in _NO_OPERANDS and not operands:
+            self._emit(_NO_OPERANDS[opcode])
+        elif opcode == 'mov':
+            self._mov(*operands)
+        elif opcode == 'lea':
+            memory, _ = _memory(operands[1])
+            self._emit(_modrm(1, b'\x8d', self._register(operands[0]), memory))
+        elif opcode in _ARITHMETIC or opcode == 'test':
+            self._arithmetic(opcode, *operands)
+        elif opcode == 'imul':
+            self._imul(*operands)
+        elif opcode in _SHIFTS:
+            register, count = self._register(operands[0]), _immediate(operands[1])
+            if count is None or count >= 64:
+                raise EncodingError(f'Unsupported shift {instruction}')
+            if count == 1:
+                self._emit(_modrm(1, b'\xd1', _SHIFTS[opcode], register))
+            else:
+                self._emit(_modrm(1, b'\xc1', _SHIFTS[opcode], register) + bytes([count]))
+        elif opcode in _UNARY:
+            self._emit(_modrm(1, b'\xf7', _UNARY[opcode], self._register(operands[0])))
+        elif opcode in ('inc', 'dec'):
+            self._emit(_modrm(1, b'\xff', 0 if opcode == 'inc' else 1, self._register(operands[0])))
+        elif opcode in ('push', 'pop'):
+            register = self._register(operands[0])
+            base = 0x50 if opcode == 'push' else 0x58
+            self._emit(_rex(0, 0, 0, register) + bytes([base + (register & 7)]))
+        elif opcode == 'call':
+            self._jump(b'\xe8', self._label(operands[0]), 4)
+        elif opcode == 'jmp':
+            self._jump(b'\xe9', self._label(operands[0]), 4)
+        elif opcode in _CONDITIONS:
+            self._jump(bytes([0x0f, 0x80 | _CONDITIONS[opcode]]), self._label(operands[0]), 4)
+        elif opcode == 'loop' and position in self.long_loops:
+            # loop has no near form, so it jumps to a near jmp, that the short jmp following it otherwise skips
+            self._emit(b'\xe2\x02\xeb\x05')
+            self._jump(b'\xe9', self._label(operands[0]), 4)
+        elif opcode == 'loop':
+            self._jump(b'\xe2', self._label(operands[0]), 1)
+        else:
+            raise EncodingError(f'Unsupported instruction {instruction}')
+
+    def _register(self, operand):
+        if operand not in _REGISTER_NUMBERS:
+            raise EncodingError(f'Expected a 64-bit register, got {operand}')
+        return _REGISTER_NUMBERS[operand]
+
+    def _label(self, operand):
+        if operand in self.externs:
+            raise EncodingError(f'{operand} is external, which requires linking')
+        return operand
+
+    def _mov(self, destination, source):
+        destination_memory, destination_size = _memory(destination)
+        source_memory, source_size = _memory(source)
+        immediate = _immediate(source)
+        if destination in _REGISTER_NUMBERS:
+            register = _REGISTER_NUMBERS[destination]
+            if source in _REGISTER_NUMBERS:
+                self._emit(_modrm(1, b'\x89', _REGISTER_NUMBERS[source], register))
+            elif source_memory is not None and source_size in (None, 'qword'):
+                self._emit(_modrm(1, b'\x8b', register, source_memory))
+            elif immediate is not None and immediate < 2 ** 32:
+                # Writing the lower 32 bits zeroes the upper ones
+                self._emit(_rex(0, 0, 0, register) + bytes([0xb8 + (register & 7)]) + struct.pack('<I', immediate))
+            elif immediate is not None and _fits(immediate, 32):
+                self._emit(_modrm(1, b'\xc7', 0, register) + struct.pack('<i', _signed(immediate)))
+            elif immediate is not None:
+                self._emit(_rex(1, 0, 0, register) + bytes([0xb8 + (register & 7)]) + struct.pack('<Q', immediate))
+            elif source_memory is None and source_size is None and source.isidentifier():
+                # The address of a symbol, patched in when linking
+                self._emit(_rex(1, 0, 0, register) + bytes([0xb8 + (register & 7)]))
+                self.relocations.append((len(self.text), self._label(source)))
+                self._emit(bytes(8))
+            else:
+                raise EncodingError(f'Unsupported mov {destination}, {source}')
+        elif destination in _BYTE_REGISTER_NUMBERS and source_memory is not None and source_size in (None, 'byte'):
+            self._emit(_modrm(0, b'\x8a', _BYTE_REGISTER_NUMBERS[destination], source_memory))
+        elif destination_memory is not None and destination_size in (None, 'qword') and source in _REGISTER_NUMBERS:
+            self._emit(_modrm(1, b'\x89', _REGISTER_NUMBERS[source], destination_memory))
+        elif destination_memory is not None and destination_size in (None, 'byte') and \
+                source in _BYTE_REGISTER_NUMBERS:
+            self._emit(_modrm(0, b'\x88', _BYTE_REGISTER_NUMBERS[source], destination_memory))
+        elif destination_memory is not None and destination_size == 'qword' and immediate is not None and \
+                _fits(immediate, 32):
+            self._emit(_modrm(1, b'\xc7', 0, destination_memory) + struct.pack('<i', _signed(immediate)))
+        elif destination_memory is not None and destination_size == 'byte' and immediate is not None and \
+                (_fits(immediate, 8) or immediate < 256):
+            self._emit(_modrm(0, b'\xc6', 0, destination_memory) + bytes([immediate & 0xff]))
+        else:
+            raise EncodingError(f'Unsupported mov {destination}, {source}')
+
+    def _arithmetic(self, opcode, destination, source):
+        destination_memory, destination_size = _memory(destination)
+        immediate = _immediate(source)
+        if destination_memory is not None and destination_size in (None, 'qword'):
+            self._memory_arithmetic(opcode, destination, destination_memory, source, immediate)
+            return
+        register = self._register(destination)
+        if source in _REGISTER_NUMBERS:
+            code = b'\x85' if opcode == 'test' else bytes([_ARITHMETIC[opcode][0]])
+            self._emit(_modrm(1, code, _REGISTER_NUMBERS[source], register))
+        elif immediate is not None and opcode != 'test' and _fits(immediate, 8):
+            self._emit(_modrm(1, b'\x83', _ARITHMETIC[opcode][1], register) + struct.pack('<b', _signed(immediate)))
+        elif immediate is not None and opcode != 'test' and _fits(immediate, 32) and register == 0:
+            # rax has a shorter encoding, without a ModRM byte
+            self._emit(_rex(1, 0, 0, 0) + bytes([_ARITHMETIC[opcode][0] + 4]) + struct.pack('<i', _signed(immediate)))
+        elif immediate is not None and opcode != 'test' and _fits(immediate, 32):
+            self._emit(_modrm(1, b'\x81', _ARITHMETIC[opcode][1], register) + struct.pack('<i', _signed(immediate)))
+        else:
+            raise EncodingError(f'Unsupported {opcode} {destination}, {source}')
+
+    def _memory_arithmetic(self, opcode, destination, memory, source, immediate):
+        if source in _REGISTER_NUMBERS:
+            code = b'\x85' if opcode == 'test' else bytes([_ARITHMETIC[opcode][0]])
+            self._emit(_modrm(1, code, _REGISTER_NUMBERS[source], memory))
+        elif immediate is not None and opcode != 'test' and _fits(immediate, 8):
+            self._emit(_modrm(1, b'\x83', _ARITHMETIC[opcode][1], memory) + struct.pack('<b', _signed(immediate)))
+        elif immediate is not None and opcode != 'test' and _fits(immediate, 32):
+            self._emit(_modrm(1, b'\x81', _ARITHMETIC[opcode][1], memory) + struct.pack('<i', _signed(immediate)))
+        else:
+            raise EncodingError(f'Unsupported {opcode} {destination}, {source}')
+
+    def _imul(self, destination, source, multiplier=None):
+        register, source_register = self._register(destination), self._register(source)
+        if multiplier is None:
+            self._emit(_modrm(1, b'\x0f\xaf', register, source_register))
+            return
+        immediate = _immediate(multiplier)
+        if immediate is not None and _fits(immediate, 8):
+            self._emit(_modrm(1, b'\x6b', register, source_register) + struct.pack('<b', _signed(immediate)))
+        elif immediate is not None and _fits(immediate, 32):
+            self._emit(_modrm(1, b'\x69', register, source_register) + struct.pack('<i', _signed(immediate)))
+        else:
+            raise EncodingError(f'Unsupported imul {destination}, {source}, {multiplier}')
+
+
+def _encode(instructions, long_loops):
+    encoder = _Encoder(long_loops)
+    section = '.text'
+    for position, instruction in enumerate(instructions):
+        if isinstance(instruction, asm.Comment):
+            continue
+        if isinstance(instruction, asm.Directive):
+            section = encoder.directive(instruction.text, section)
+            continue
+        if section != '.text':
+            raise EncodingError(f'{instruction} is outside of the .text section')
+        if isinstance(instruction, asm.Label):
+            if instruction.name in encoder.labels:
+                raise EncodingError(f'Duplicate label {instruction.name}')
+            encoder.labels[instruction.name] = len(encoder.text)
+        else:
+            encoder.instruction(instruction, position)
+
+    return encoder
+
+
+def encode(instructions):
+    # Loops are encoded short until their targets turn out to be too far. Since encodings only ever grow, this ends
+    instructions = list(instructions)
+    long_loops = frozenset()
+    while True:
+        encoder = _encode(instructions, long_loops)
+        far_loops = encoder.far_loops()
+        if not far_loops:
+            return encoder.finish()
+        long_loops |= far_loops
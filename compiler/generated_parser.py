@@ -0,0 +1,341 @@
+# Generated by compiler/parsergen.py from compiler/syntax.bnf. Do not edit, run `python -m compiler.parsergen` instead
+
+import infra.pc as pc
+import compiler.ast as arith_ast
+
+_OPERATION_TO_NODE_TYPE = {'+': arith_ast.NodeType.AddExpr,
+                           '-': arith_ast.NodeType.SubExpr,
+                           '*': arith_ast.NodeType.MulExpr,
+                           '/': arith_ast.NodeType.DivExpr}
+
+
+def _skip_whitespaces(text, pos):
+    # A whitespace is a line-comment or any char whose ASCII value is <= 32
+    length = len(text)
+    while pos < length:
+        c = text[pos]
+        if c <= ' ':
+            pos += 1
+        elif c == '#':
+            end = text.find('\n', pos)
+            pos = length if end < 0 else end
+        else:
+            break
+    return pos
+
+
+def _make_statements(value):
+    return arith_ast.Program([statement for statement, _ in value])
+
+
+def _make_assignment(value):
+    return arith_ast.Assignment(value[0], value[2])
+
+
+def _make_loop_assignment(value):
+    return arith_ast.LoopAssignment(value[1], value[2])
+
+
+def _make_add_expr(value):
+    left_operand, tail = value
+    for operation, right_operand in tail:
+        left_operand = arith_ast.ArithExpr(_OPERATION_TO_NODE_TYPE[operation], left_operand, right_operand)
+    return left_operand
+
+
+def _make_mul_expr(value):
+    left_operand, tail = value
+    for operation, right_operand in tail:
+        left_operand = arith_ast.ArithExpr(_OPERATION_TO_NODE_TYPE[operation], left_operand, right_operand)
+    return left_operand
+
+
+def _make_int(value):
+    sign, num = value
+    return arith_ast.Num(-num if sign == '-' else num)
+
+
+def _make_var(value):
+    return arith_ast.Var(value)
+
+
+def _make_num(value):
+    return int(value)
+
+
+def _parse_statements(text, pos):
+    value = []
+    while True:
+        result = _parse_expr_1(text, pos)
+        if result is None:
+            break
+        item, pos = result
+        value.append(item)
+    return _make_statements(value), pos
+
+
+def _parse_expr_1(text, pos):
+    result = _parse_expr_2(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_end_of_statement(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return value, pos
+
+
+def _parse_expr_2(text, pos):
+    result = _parse_assignment(text, pos)
+    if result is not None:
+        return result
+    result = _parse_loop_assignment(text, pos)
+    if result is not None:
+        return result
+    return None
+
+
+def _parse_assignment(text, pos):
+    result = _parse_var(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_assign(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    result = _parse_expr(text, pos)
+    if result is None:
+        return None
+    value_2, pos = result
+    value = (value_0, value_1, value_2)
+    return _make_assignment(value), pos
+
+
+def _parse_loop_assignment(text, pos):
+    result = _parse_loop(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_operand(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    result = _parse_expr_3(text, pos)
+    if result is None:
+        return None
+    value_2, pos = result
+    value = (value_0, value_1, value_2)
+    return _make_loop_assignment(value), pos
+
+
+def _parse_expr_3(text, pos):
+    value = []
+    while True:
+        result = _parse_assignment(text, pos)
+        if result is None:
+            break
+        item, pos = result
+        value.append(item)
+    return value, pos
+
+
+def _parse_expr(text, pos):
+    result = _parse_add_expr(text, pos)
+    if result is None:
+        return None
+    value, pos = result
+    return value, pos
+
+
+def _parse_add_expr(text, pos):
+    result = _parse_mul_expr(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_expr_4(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return _make_add_expr(value), pos
+
+
+def _parse_expr_4(text, pos):
+    value = []
+    while True:
+        result = _parse_expr_5(text, pos)
+        if result is None:
+            break
+        item, pos = result
+        value.append(item)
+    return value, pos
+
+
+def _parse_expr_5(text, pos):
+    result = _parse_add_or_sub(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_mul_expr(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return value, pos
+
+
+def _parse_mul_expr(text, pos):
+    result = _parse_operand(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_expr_6(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return _make_mul_expr(value), pos
+
+
+def _parse_expr_6(text, pos):
+    value = []
+    while True:
+        result = _parse_expr_7(text, pos)
+        if result is None:
+            break
+        item, pos = result
+        value.append(item)
+    return value, pos
+
+
+def _parse_expr_7(text, pos):
+    result = _parse_mul_or_div(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_operand(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return value, pos
+
+
+def _parse_operand(text, pos):
+    result = _parse_int(text, pos)
+    if result is not None:
+        return result
+    result = _parse_var(text, pos)
+    if result is not None:
+        return result
+    return None
+
+
+def _parse_int(text, pos):
+    result = _parse_expr_8(text, pos)
+    if result is None:
+        return None
+    value_0, pos = result
+    result = _parse_num(text, pos)
+    if result is None:
+        return None
+    value_1, pos = result
+    value = (value_0, value_1)
+    return _make_int(value), pos
+
+
+def _parse_expr_8(text, pos):
+    value = None
+    if pos < len(text) and text[pos] in '+-':
+        value = text[pos]
+        pos += 1
+    return value, pos
+
+
+def _parse_var(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if text.startswith('r10', pos):
+        pos += 3
+    elif text.startswith('r11', pos):
+        pos += 3
+    elif text.startswith('r12', pos):
+        pos += 3
+    elif text.startswith('r13', pos):
+        pos += 3
+    else:
+        return None
+    return _make_var(text[start:pos]), _skip_whitespaces(text, pos)
+
+
+def _parse_num(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if pos < len(text) and text[pos] in '0123456789':
+        pos += 1
+    else:
+        return None
+    while pos < len(text) and text[pos] in '0123456789':
+        pos += 1
+    return _make_num(text[start:pos]), _skip_whitespaces(text, pos)
+
+
+def _parse_add_or_sub(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if pos < len(text) and text[pos] in '+-':
+        pos += 1
+    else:
+        return None
+    return text[start:pos], _skip_whitespaces(text, pos)
+
+
+def _parse_mul_or_div(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if pos < len(text) and text[pos] in '*/':
+        pos += 1
+    else:
+        return None
+    return text[start:pos], _skip_whitespaces(text, pos)
+
+
+def _parse_loop(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if text.startswith('loop', pos):
+        pos += 4
+    else:
+        return None
+    return text[start:pos], _skip_whitespaces(text, pos)
+
+
+def _parse_end_of_statement(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if pos < len(text) and text[pos] == ';':
+        pos += 1
+    else:
+        return None
+    return text[start:pos], _skip_whitespaces(text, pos)
+
+
+def _parse_assign(text, pos):
+    pos = _skip_whitespaces(text, pos)
+    start = pos
+    if pos < len(text) and text[pos] == '=':
+        pos += 1
+    else:
+        return None
+    return text[start:pos], _skip_whitespaces(text, pos)
+
+
+def parse_statements(text, index=0):
+    result = _parse_statements(text, index)
+    if result is None:
+        raise pc.NoMatchException(text, index)
+    value, pos = result
+    return pc.ParserOutput(value, pos)
@@ -0,0 +1,110 @@
+import ctypes
+import mmap
+
+import compiler.compiler as compiler
+import compiler.encoder as encoder
+import compiler.peephole as peephole
+import compiler.profile as profiling
+import compiler.runtime as runtime
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.mmap.restype = ctypes.c_void_p
+_libc.mmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long)
+_libc.mprotect.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int)
+_libc.munmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+
+_MAP_FAILED = ctypes.c_void_p(-1).value
+
+# Room for this many printed values is allocated up front, a program printing more is run again with enough room
+INITIAL_CAPACITY = 64
+
+
+def _output_type(capacity):
+    class Output(ctypes.Structure):
+        _fields_ = [('count', ctypes.c_int64), ('capacity', ctypes.c_int64), ('stack_pointer', ctypes.c_uint64),
+                    ('values', ctypes.c_int64 * capacity)]
+
+    return Output
+
+
+class JitProgram:
+    # A compiled program mapped into executable memory. The code is written while the mapping is writable, then made
+    # executable (and read-only) before it is ever called. A profiled program is given the line each of its statements
+    # starts on
+
+    def __init__(self, object_code, lines=None):
+        self._address = None
+        self._lines = lines
+        self._size = max(len(object_code.text), 1)
+        address = _libc.mmap(None, self._size, mmap.PROT_READ | mmap.PROT_WRITE,
+                             mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS, -1, 0)
+        if address is None or address == _MAP_FAILED:
+            raise OSError(ctypes.get_errno(), 'Failed to map memory for the compiled program')
+        self._address = address
+
+        # The .bss section (when used) lives in Python-owned memory, for as long as the program does
+        self._bss = (ctypes.c_char * object_code.bss_size)() if object_code.bss_size else None
+        bss_address = ctypes.addressof(self._bss) if self._bss is not None else 0
+        self._counters = None
+        if lines is not None:
+            counters_address = bss_address + object_code.bss_labels[profiling.COUNTERS]
+            self._counters = (ctypes.c_int64 * (len(lines) * 2)).from_address(counters_address)
+        ctypes.memmove(address, object_code.link(address, bss_address), len(object_code.text))
+        if _libc.mprotect(address, self._size, mmap.PROT_READ | mmap.PROT_EXEC) != 0:
+            self.close()
+            raise OSError(ctypes.get_errno(), 'Failed to make the compiled program executable')
+
+        entry = address + object_code.labels[runtime.JIT.entry]
+        self._entry = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_void_p)(entry)
+
+    def run(self):
+        # Returns the printed values, or raises ZeroDivisionError when the program divides by 0
+        if self._address is None:
+            raise ValueError('The program was closed')
+        capacity = INITIAL_CAPACITY
+        while True:
+            output = _output_type(capacity)(0, capacity)
+            count = self._entry(ctypes.addressof(output))
+            if count == runtime.JitRuntime.DIVISION_FAULT:
+                raise ZeroDivisionError('The program divided by 0')
+            if count <= capacity:
+                return output.values[:count]
+            capacity = count
+
+    def profile(self):
+        # (line, cycles, iterations) of every statement, accumulated over every run so far
+        if self._counters is None:
+            raise ValueError('The program is not profiled')
+        counters = self._counters[:]
+        return [(line, counters[2 * index], counters[2 * index + 1]) for index, line in enumerate(self._lines)]
+
+    def close(self):
+        if self._address is not None:
+            _libc.munmap(self._address, self._size)
+            self._address = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def compile_program(program, partial_evaluation=True):
+    # `program` is a parsed (unoptimized) Program
+    optimized = compiler.optimize(program, partial_evaluation)
+    instructions = peephole.optimize(compiler.generate(optimized, target_runtime=runtime.JIT))
+    return JitProgram(encoder.encode(instructions))
+
+
+def compile_code(code, jobs=None, profile=False):
+    instructions = compiler.compile_instructions(code, jobs=jobs, target_runtime=runtime.JIT, profile=profile)
+    return JitProgram(encoder.encode(instructions), profiling.statement_lines(code) if profile else None)
+
+
+def run(code):
+    with compile_code(code) as program:
+        return program.run()
@@ -0,0 +1,142 @@
+import compiler.ast as arith_ast
+
+
+def expr_uses(expr):
+    uses = set()
+    pending = [expr]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, arith_ast.Var):
+            uses.add(node.name)
+        elif isinstance(node, arith_ast.ArithExpr):
+            pending.append(node.left_operand)
+            pending.append(node.right_operand)
+        elif isinstance(node, arith_ast.TempExpr):
+            pending.append(node.expr)
+
+    return uses
+
+
+def may_fault(expr):
+    # Dividing faults when the divisor is 0, which only a non-zero constant divisor rules out
+    pending = [expr]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, arith_ast.ArithExpr):
+            divisor = node.right_operand
+            if node.type == arith_ast.NodeType.DivExpr and \
+                    not (isinstance(divisor, arith_ast.Num) and divisor.value % 2 ** 64 != 0):
+                return True
+            pending.append(node.left_operand)
+            pending.append(divisor)
+        elif isinstance(node, arith_ast.TempExpr):
+            pending.append(node.expr)
+
+    return False
+
+
+def _assignments_live_in(assignments, live_out):
+    live = set(live_out)
+    for assignment in reversed(assignments):
+        live.discard(assignment.var.name)
+        live |= expr_uses(assignment.expr)
+
+    return live
+
+
+def _runs_once(counter):
+    return isinstance(counter, arith_ast.Num) and counter.value % 2 ** 64 == 1
+
+
+def _may_skip(counter):
+    # A loop whose count is 0 doesn't run its body
+    return not isinstance(counter, arith_ast.Num) or counter.value % 2 ** 64 == 0
+
+
+def _is_invariant_body(assignments):
+    # A body whose assignments never read a register written by themselves or by a later assignment in the body
+    # computes the exact same values on every iteration
+    written_later = set()
+    for assignment in reversed(assignments):
+        written_later.add(assignment.var.name)
+        if expr_uses(assignment.expr) & written_later:
+            return False
+
+    return True
+
+
+def _collapse_invariant_loop(loop):
+    counter = loop.counter
+    if not isinstance(counter, arith_ast.Num) or counter.value % 2 ** 64 in (0, 1):
+        return loop
+    if not loop.assignments or not _is_invariant_body(loop.assignments):
+        return loop
+
+    return arith_ast.LoopAssignment(arith_ast.Num(1), loop.assignments)
+
+
+def _body_live_out(counter, assignments, live_out):
+    if _runs_once(counter):
+        return set(live_out)
+
+    # Registers live at the start of the body are also live at its end, through the loop's back-edge
+    body_live_in = set()
+    while True:
+        new_body_live_in = _assignments_live_in(assignments, live_out | body_live_in)
+        if new_body_live_in == body_live_in:
+            return live_out | body_live_in
+        body_live_in = new_body_live_in
+
+
+def _prune_loop(loop, live_out):
+    assignments = loop.assignments
+    if not assignments:
+        # Nothing is written, so whatever is live after the loop is live before it too
+        return loop, live_out | expr_uses(loop.counter)
+
+    # Optimistically assume only the last assignment is needed (its value is the printed value of the loop), and keep
+    # any other assignment whose target is read by a needed assignment. Unlike plain liveness, this also drops
+    # assignments that only feed themselves through the back-edge (e.g. an unused `r10 = r10 + 1`). Assignments that may
+    # fault are needed too, so that dropping them doesn't keep the program from faulting
+    kept = [may_fault(assignment.expr) for assignment in assignments]
+    kept[-1] = True
+    changed = True
+    while changed:
+        changed = False
+        kept_assignments = [assignment for assignment, is_kept in zip(assignments, kept) if is_kept]
+        live = _body_live_out(loop.counter, kept_assignments, live_out)
+        for i in reversed(range(len(assignments))):
+            assignment = assignments[i]
+            if not kept[i] and assignment.var.name in live:
+                kept[i] = True
+                changed = True
+            if kept[i]:
+                live.discard(assignment.var.name)
+                live |= expr_uses(assignment.expr)
+
+    if len(kept_assignments) != len(assignments):
+        loop = arith_ast.LoopAssignment(loop.counter, kept_assignments)
+
+    # Unless its count is a non-zero constant, the body may not run at all, leaving whatever is live after the loop
+    # live before it
+    body_live_out = _body_live_out(loop.counter, kept_assignments, live_out)
+    live_in = _assignments_live_in(kept_assignments, body_live_out) | expr_uses(loop.counter)
+    if _may_skip(loop.counter):
+        live_in |= live_out
+    return loop, live_in
+
+
+def eliminate_dead_stores(program):
+    live = set()
+    statements = []
+    for statement in reversed(program.statements):
+        if statement.type == arith_ast.NodeType.LoopAssignment:
+            statement = _collapse_invariant_loop(statement)
+            statement, live = _prune_loop(statement, live)
+        else:
+            live.discard(statement.var.name)
+            live |= expr_uses(statement.expr)
+        statements.append(statement)
+
+    statements.reverse()
+    return arith_ast.Program(statements)
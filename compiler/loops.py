@@ -0,0 +1,89 @@
+_WORD = 2 ** 64
+
+UNROLL_FACTOR = 4
+# Unrolling stops doubling a body once it would repeat more assignments than this
+MAX_UNROLLED_ASSIGNMENTS = 32
+# Constant counts are unrolled entirely when the body repeated that many times has at most this many assignments
+FULL_UNROLL_ASSIGNMENTS = 16
+
+
+def _unroll_factor(assignments, factor):
+    if factor < 1 or factor & (factor - 1):
+        raise ValueError(f'The unroll factor must be a power of 2, got {factor}')
+    while factor > 1 and len(assignments) * factor > MAX_UNROLLED_ASSIGNMENTS:
+        factor //= 2
+    return factor
+
+
+def _emit_body(assembly, loop, times):
+    for _ in range(times):
+        for assignment in loop.assignments:
+            assignment.codegen(assembly)
+
+
+def _emit_counted_loop(assembly, loop, counter, times, label):
+    # Runs the body `times` times per iteration, while dec-ing `counter` (which must not be 0) down to 0
+    assembly.label(label)
+    _emit_body(assembly, loop, times)
+    assembly.emit('dec', counter)
+    assembly.emit('jnz', label)
+
+
+def _emit_constant_loop(assembly, loop, count, factor):
+    # The value of a loop is its last assignment's, or the counter's when it has none (or never runs its body)
+    if count == 0 or not loop.assignments:
+        loop.counter.codegen(assembly)
+        return
+    if count * len(loop.assignments) <= FULL_UNROLL_ASSIGNMENTS:
+        _emit_body(assembly, loop, count)
+        return
+
+    factor = _unroll_factor(loop.assignments, factor)
+    iterations = count // factor
+    _emit_body(assembly, loop, count % factor)
+    if iterations == 1:
+        _emit_body(assembly, loop, factor)
+    elif iterations > 1:
+        assembly.emit('mov', 'rcx', f'{iterations}')
+        _emit_counted_loop(assembly, loop, 'rcx', factor, assembly.new_label('loop'))
+
+
+def emit_loop(assembly, loop, count=None):
+    # rax <- the value of `loop`, after running its body `count` times (when known at compile time) or as many times as
+    # its counter evaluates to. The body is unrolled assembly.unroll_factor times, with the count % factor remaining
+    # iterations in a loop of their own (counted in rsi, which the generated code never uses otherwise). Unlike the
+    # `loop` instruction, a count of 0 doesn't run the body at all
+    factor = assembly.unroll_factor
+    profile = assembly.profile
+    if count is not None:
+        if profile is not None and count % _WORD:
+            assembly.emit('mov', 'rax', f'{count % _WORD}')
+            profile.emit_iterations(assembly)
+        _emit_constant_loop(assembly, loop, count % _WORD, factor)
+        return
+
+    assembly.comment(loop, 'Evaluating counter')
+    loop.counter.codegen(assembly)
+    if profile is not None:
+        profile.emit_iterations(assembly)
+    if not loop.assignments:
+        return
+
+    end = assembly.new_label('loop_end')
+    factor = _unroll_factor(loop.assignments, factor)
+    assembly.emit('mov', 'rcx', 'rax')
+    assembly.emit('test', 'rcx', 'rcx')
+    assembly.emit('jz', end)
+    if factor > 1:
+        unrolled = assembly.new_label('loop_unrolled')
+        assembly.emit('mov', 'rsi', 'rcx')
+        assembly.emit('and', 'rsi', f'{factor - 1}')
+        assembly.emit('shr', 'rcx', f'{factor.bit_length() - 1}')
+        assembly.emit('test', 'rsi', 'rsi')
+        assembly.emit('jz', unrolled)
+        _emit_counted_loop(assembly, loop, 'rsi', 1, assembly.new_label('loop_remainder'))
+        assembly.label(unrolled)
+        assembly.emit('test', 'rcx', 'rcx')
+        assembly.emit('jz', end)
+    _emit_counted_loop(assembly, loop, 'rcx', factor, assembly.new_label('loop'))
+    assembly.label(end)
@@ -0,0 +1,75 @@
+import concurrent.futures
+import os
+import re
+
+import infra.pc as pc
+import compiler.ast as arith_ast
+import compiler.generated_parser as generated_parser
+import compiler.serialization as serialization
+
+# Inputs smaller than this are parsed serially, since starting the worker processes would take longer
+PARALLEL_THRESHOLD = 64 * 1024
+
+# Every `;` outside of a comment ends a top-level statement (assignments within a loop aren't terminated by one)
+_STATEMENT_END = re.compile(r'#[^\n]*|;')
+# The whitespaces consumed by the end of statement token, see parser.nt_whitespaces
+_WHITESPACES = re.compile(r'(?:[\x00-\x20]|#[^\n]*)*')
+
+
+def statement_ends(code):
+    ends = []
+    for token in _STATEMENT_END.finditer(code):
+        if token.group() == ';':
+            ends.append(_WHITESPACES.match(code, token.end()).end())
+    return ends
+
+
+def statement_starts(code):
+    # Where the parser starts parsing each top-level statement (past the whitespaces before it), followed by where it
+    # would start parsing one more
+    return [_WHITESPACES.match(code).end()] + statement_ends(code)
+
+
+def split_points(code, chunks):
+    # Splits right after an end of statement and the whitespaces following it, where the serial parser would also start
+    # parsing the next statement. This way a chunk fails to parse at the exact same index the serial parser would
+    points = [0]
+    ends = statement_ends(code)
+    i = 0
+    for chunk in range(1, chunks):
+        target = len(code) * chunk // chunks
+        while i < len(ends) and (ends[i] < target or ends[i] <= points[-1]):
+            i += 1
+        if i == len(ends) or ends[i] >= len(code):
+            break
+        points.append(ends[i])
+    points.append(len(code))
+    return points
+
+
+def _parse_chunk(chunk):
+    # Statements are sent back serialized, which is much faster (and more compact) than pickling nodes, and works for
+    # any depth of expressions
+    output = generated_parser.parse_statements(chunk)
+    return serialization.encode(output.match), output.next_token_index
+
+
+def parse(code, jobs=None, chunks_per_job=4):
+    # Parses `code` like generated_parser.parse_statements, parsing its chunks in a pool of `jobs` processes. Like the
+    # serial parser, the output stops at the first statement that fails to parse, at an index relative to `code`
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1:
+        return generated_parser.parse_statements(code)
+
+    points = split_points(code, jobs * chunks_per_job)
+    chunks = [code[start:end] for start, end in zip(points, points[1:])]
+    statements = []
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        for start, (chunk_program, next_token_index), chunk in zip(points, pool.map(_parse_chunk, chunks), chunks):
+            statements.extend(serialization.decode(chunk_program).statements)
+            if next_token_index < len(chunk):
+                pool.shutdown(wait=False, cancel_futures=True)
+                return pc.ParserOutput(arith_ast.Program(statements), start + next_token_index)
+
+    return pc.ParserOutput(arith_ast.Program(statements), len(code))
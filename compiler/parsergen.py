@@ -0,0 +1,364 @@
+import os
+import sys
+
+GRAMMAR_PATH = os.path.join(os.path.dirname(__file__), 'syntax.bnf')
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), 'generated_parser.py')
+
+# Code building the AST node of a rule from the value of its body. A sequence evaluates to a tuple (or to its only
+# item), a repetition to a list, an optional to its value or None, and a token rule to the text it matched
+_ACTIONS = {
+    'STATEMENTS': '''return arith_ast.Program([statement for statement, _ in value])''',
+    'ASSIGNMENT': '''return arith_ast.Assignment(value[0], value[2])''',
+    'LOOP_ASSIGNMENT': '''return arith_ast.LoopAssignment(value[1], value[2])''',
+    'ADD_EXPR': '''left_operand, tail = value
+for operation, right_operand in tail:
+    left_operand = arith_ast.ArithExpr(_OPERATION_TO_NODE_TYPE[operation], left_operand, right_operand)
+return left_operand''',
+    'MUL_EXPR': '''left_operand, tail = value
+for operation, right_operand in tail:
+    left_operand = arith_ast.ArithExpr(_OPERATION_TO_NODE_TYPE[operation], left_operand, right_operand)
+return left_operand''',
+    'INT': '''sign, num = value
+return arith_ast.Num(-num if sign == '-' else num)''',
+    'VAR': '''return arith_ast.Var(value)''',
+    'NUM': '''return int(value)''',
+}
+
+_PREAMBLE = '''# Generated by compiler/parsergen.py from compiler/syntax.bnf. Do not edit, run `python -m compiler.parsergen` instead
+
+import infra.pc as pc
+import compiler.ast as arith_ast
+
+_OPERATION_TO_NODE_TYPE = {'+': arith_ast.NodeType.AddExpr,
+                           '-': arith_ast.NodeType.SubExpr,
+                           '*': arith_ast.NodeType.MulExpr,
+                           '/': arith_ast.NodeType.DivExpr}
+
+
+def _skip_whitespaces(text, pos):
+    # A whitespace is a line-comment or any char whose ASCII value is <= 32
+    length = len(text)
+    while pos < length:
+        c = text[pos]
+        if c <= ' ':
+            pos += 1
+        elif c == '#':
+            end = text.find('\\n', pos)
+            pos = length if end < 0 else end
+        else:
+            break
+    return pos
+'''
+
+
+class GrammarError(Exception):
+    pass
+
+
+def _tokenize_bnf(text):
+    tokens = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c == "'":
+            end = text.index("'", i + 1)
+            tokens.append(('lit', text[i + 1:end]))
+            i = end + 1
+        elif text.startswith('::=', i):
+            tokens.append(('::=', None))
+            i += 3
+        elif c in '|()*+?':
+            tokens.append((c, None))
+            i += 1
+        elif c.isalnum() or c == '_':
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+                end += 1
+            tokens.append(('name', text[i:end]))
+            i = end
+        else:
+            raise GrammarError(f'Unexpected {c!r} in grammar')
+
+    return tokens
+
+
+class _BnfParser:
+    # BNF expressions are parsed into tuples: ('seq', [items]), ('alt', [exprs]), ('star', expr), ('plus', expr),
+    # ('opt', expr), ('ref', name) and ('lit', text)
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._index = 0
+
+    def _peek(self, offset=0):
+        index = self._index + offset
+        return self._tokens[index] if index < len(self._tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self._index += 1
+        return token
+
+    def rules(self):
+        rules = {}
+        while self._peek()[0] is not None:
+            kind, name = self._next()
+            if kind != 'name' or self._next()[0] != '::=':
+                raise GrammarError(f'Expected a rule definition at {name}')
+            rules[name] = self._alternatives()
+        return rules
+
+    def _alternatives(self):
+        alternatives = [self._sequence()]
+        while self._peek()[0] == '|':
+            self._next()
+            alternatives.append(self._sequence())
+        return alternatives[0] if len(alternatives) == 1 else ('alt', alternatives)
+
+    def _at_sequence_end(self):
+        kind, _ = self._peek()
+        # A name followed by ::= starts the next rule
+        return kind in (None, '|', ')') or (kind == 'name' and self._peek(1)[0] == '::=')
+
+    def _sequence(self):
+        items = []
+        while not self._at_sequence_end():
+            items.append(self._postfix())
+        if not items:
+            raise GrammarError('Empty sequence in grammar')
+        return items[0] if len(items) == 1 else ('seq', items)
+
+    def _postfix(self):
+        expr = self._atom()
+        postfixes = {'*': 'star', '+': 'plus', '?': 'opt'}
+        while self._peek()[0] in postfixes:
+            expr = (postfixes[self._next()[0]], expr)
+        return expr
+
+    def _atom(self):
+        kind, value = self._next()
+        if kind == 'lit':
+            return 'lit', value
+        if kind == 'name':
+            return 'ref', value
+        if kind == '(':
+            expr = self._alternatives()
+            if self._next()[0] != ')':
+                raise GrammarError('Unbalanced parentheses in grammar')
+            return expr
+        raise GrammarError(f'Unexpected {kind} in grammar')
+
+
+def parse_bnf(text):
+    return _BnfParser(_tokenize_bnf(text)).rules()
+
+
+def _is_lexical(expr):
+    kind = expr[0]
+    if kind == 'lit':
+        return True
+    if kind in ('seq', 'alt'):
+        return all(_is_lexical(item) for item in expr[1])
+    if kind in ('star', 'plus', 'opt'):
+        return _is_lexical(expr[1])
+    return False
+
+
+def _char_test(chars):
+    if len(chars) == 1:
+        return f'pos < len(text) and text[pos] == {chars!r}'
+    return f'pos < len(text) and text[pos] in {chars!r}'
+
+
+def _char_set(expr):
+    # The chars of an alternative between single char literals, or None
+    if expr[0] == 'lit' and len(expr[1]) == 1:
+        return expr[1]
+    if expr[0] == 'alt' and all(item[0] == 'lit' and len(item[1]) == 1 for item in expr[1]):
+        return ''.join(item[1] for item in expr[1])
+    return None
+
+
+def _function_name(rule):
+    return f'_parse_{rule.lower()}'
+
+
+class _Generator:
+    def __init__(self, rules):
+        self._rules = rules
+        self._functions = []
+        self._helper_count = 0
+
+    def _helper(self, expr):
+        self._helper_count += 1
+        name = f'_parse_expr_{self._helper_count}'
+        self._expr_function(name, expr)
+        return name
+
+    def _call(self, expr):
+        # Name of a function parsing the expr into (value, pos), or returning None
+        if expr[0] == 'ref':
+            if expr[1] not in self._rules:
+                raise GrammarError(f'Undefined rule {expr[1]}')
+            return _function_name(expr[1])
+        return self._helper(expr)
+
+    def _lexical_match(self, expr, lines, indent):
+        # Lines advancing `pos` over the raw text matched by a lexical expr, returning None on a mismatch
+        pad = '    ' * indent
+        chars = _char_set(expr)
+        kind = expr[0]
+        if chars is not None:
+            lines.append(f'{pad}if {_char_test(chars)}:')
+            lines.append(f'{pad}    pos += 1')
+            lines.append(f'{pad}else:')
+            lines.append(f'{pad}    return None')
+        elif kind == 'lit':
+            lines.append(f'{pad}if text.startswith({expr[1]!r}, pos):')
+            lines.append(f'{pad}    pos += {len(expr[1])}')
+            lines.append(f'{pad}else:')
+            lines.append(f'{pad}    return None')
+        elif kind == 'alt' and all(item[0] == 'lit' for item in expr[1]):
+            keyword = 'if'
+            for item in expr[1]:
+                lines.append(f'{pad}{keyword} text.startswith({item[1]!r}, pos):')
+                lines.append(f'{pad}    pos += {len(item[1])}')
+                keyword = 'elif'
+            lines.append(f'{pad}else:')
+            lines.append(f'{pad}    return None')
+        elif kind == 'seq':
+            for item in expr[1]:
+                self._lexical_match(item, lines, indent)
+        elif kind in ('star', 'plus', 'opt') and _char_set(expr[1]) is not None:
+            chars = _char_set(expr[1])
+            if kind == 'plus':
+                self._lexical_match(expr[1], lines, indent)
+            if kind == 'opt':
+                lines.append(f'{pad}if {_char_test(chars)}:')
+            else:
+                lines.append(f'{pad}while {_char_test(chars)}:')
+            lines.append(f'{pad}    pos += 1')
+        else:
+            raise GrammarError(f'Unsupported lexical expression {expr}')
+
+    def _token_function(self, rule, expr):
+        lines = [f'def {_function_name(rule)}(text, pos):',
+                 f'    pos = _skip_whitespaces(text, pos)',
+                 f'    start = pos']
+        self._lexical_match(expr, lines, 1)
+        value = 'text[start:pos]'
+        if rule in _ACTIONS:
+            value = f'_make_{rule.lower()}({value})'
+        lines.append(f'    return {value}, _skip_whitespaces(text, pos)')
+        self._functions.append('\n'.join(lines))
+
+    def _match_item(self, expr, value, lines, on_failure):
+        # Lines setting `value` and advancing `pos` over the expr, running `on_failure` (if any) if it doesn't match
+        chars = _char_set(expr)
+        if chars is not None:
+            lines.append(f'    if {_char_test(chars)}:')
+            lines.append(f'        {value} = text[pos]')
+            lines.append(f'        pos += 1')
+        elif expr[0] == 'lit':
+            lines.append(f'    if text.startswith({expr[1]!r}, pos):')
+            lines.append(f'        {value} = {expr[1]!r}')
+            lines.append(f'        pos += {len(expr[1])}')
+        elif on_failure is None:
+            lines.append(f'    result = {self._call(expr)}(text, pos)')
+            lines.append(f'    if result is not None:')
+            lines.append(f'        {value}, pos = result')
+            return
+        else:
+            lines.append(f'    result = {self._call(expr)}(text, pos)')
+            lines.append(f'    if result is None:')
+            lines.append(f'        {on_failure}')
+            lines.append(f'    {value}, pos = result')
+            return
+
+        if on_failure is not None:
+            lines.append(f'    else:')
+            lines.append(f'        {on_failure}')
+
+    def _body(self, expr, lines):
+        # Lines computing `value` for the expr into the body of a function returning (value, pos) or None
+        kind = expr[0]
+        if kind == 'alt':
+            for alternative in expr[1]:
+                lines.append(f'    result = {self._call(alternative)}(text, pos)')
+                lines.append(f'    if result is not None:')
+                lines.append(f'        return result')
+            lines.append(f'    return None')
+            return False
+        if kind == 'seq':
+            names = []
+            for i, item in enumerate(expr[1]):
+                names.append(f'value_{i}')
+                self._match_item(item, names[-1], lines, 'return None')
+            lines.append(f'    value = ({", ".join(names)})')
+        elif kind in ('star', 'plus'):
+            lines.append(f'    value = []')
+            if kind == 'plus':
+                self._match_item(expr[1], 'item', lines, 'return None')
+                lines.append(f'    value.append(item)')
+            lines.append(f'    while True:')
+            loop_lines = []
+            self._match_item(expr[1], 'item', loop_lines, 'break')
+            lines.extend(f'    {line}' for line in loop_lines)
+            lines.append(f'        value.append(item)')
+        elif kind == 'opt':
+            lines.append(f'    value = None')
+            self._match_item(expr[1], 'value', lines, None)
+        else:
+            self._match_item(expr, 'value', lines, 'return None')
+        return True
+
+    def _expr_function(self, name, expr, action=None):
+        lines = [f'def {name}(text, pos):']
+        self._functions.append(lines)
+        if self._body(expr, lines):
+            value = 'value' if action is None else f'{action}(value)'
+            lines.append(f'    return {value}, pos')
+
+    def generate(self):
+        functions = []
+        for rule, action in _ACTIONS.items():
+            body = '\n'.join(f'    {line}' for line in action.splitlines())
+            functions.append(f'def _make_{rule.lower()}(value):\n{body}')
+
+        for rule, expr in self._rules.items():
+            if _is_lexical(expr):
+                self._token_function(rule, expr)
+            else:
+                action = f'_make_{rule.lower()}' if rule in _ACTIONS else None
+                self._expr_function(_function_name(rule), expr, action)
+
+        for function in self._functions:
+            functions.append(function if isinstance(function, str) else '\n'.join(function))
+
+        start_rule = next(iter(self._rules))
+        functions.append(f'''def parse_{start_rule.lower()}(text, index=0):
+    result = {_function_name(start_rule)}(text, index)
+    if result is None:
+        raise pc.NoMatchException(text, index)
+    value, pos = result
+    return pc.ParserOutput(value, pos)''')
+
+        return _PREAMBLE + '\n\n' + '\n\n\n'.join(functions) + '\n'
+
+
+def generate(grammar):
+    return _Generator(parse_bnf(grammar)).generate()
+
+
+def main(grammar_path=GRAMMAR_PATH, output_path=OUTPUT_PATH):
+    with open(grammar_path, 'rt') as grammar_file:
+        grammar = grammar_file.read()
+
+    with open(output_path, 'wt') as output_file:
+        output_file.write(generate(grammar))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,128 @@
+import compiler.ast as arith_ast
+
+_WORD = 2 ** 64
+
+# Loops are evaluated at compile time for up to this many iterations (each), longer ones are left to run
+ITERATION_BUDGET = 4096
+
+
+class _Unknown(Exception):
+    # Raised when evaluating reads a register whose value isn't known, or divides by 0 (which is left to fault at run
+    # time)
+    pass
+
+
+def _num(value):
+    # Values are kept unsigned, and written back as the (signed) value printing them would show
+    return arith_ast.Num(value - _WORD if value >= 2 ** 63 else value)
+
+
+def _apply(node_type, left, right):
+    if node_type == arith_ast.NodeType.AddExpr:
+        return (left + right) % _WORD
+    if node_type == arith_ast.NodeType.SubExpr:
+        return (left - right) % _WORD
+    if node_type == arith_ast.NodeType.MulExpr:
+        return (left * right) % _WORD
+    if right == 0:
+        raise _Unknown()
+    return left // right
+
+
+def _evaluate(expr, known):
+    if isinstance(expr, arith_ast.Num):
+        expr.check_range()
+        return expr.value % _WORD
+    if isinstance(expr, arith_ast.Var):
+        if expr.name not in known:
+            raise _Unknown()
+        return known[expr.name]
+    return _apply(expr.type, _evaluate(expr.left_operand, known), _evaluate(expr.right_operand, known))
+
+
+def _fold(expr, known):
+    # `expr` with every known register replaced by its value, and every subtree of constants by its value
+    if isinstance(expr, arith_ast.Var):
+        return _num(known[expr.name]) if expr.name in known else expr
+    if not isinstance(expr, arith_ast.ArithExpr):
+        return expr
+
+    right = _fold(expr.right_operand, known)
+    left = _fold(expr.left_operand, known)
+    if isinstance(left, arith_ast.Num) and isinstance(right, arith_ast.Num):
+        try:
+            return _num(_evaluate(arith_ast.ArithExpr(expr.type, left, right), {}))
+        except _Unknown:
+            pass
+    if left is expr.left_operand and right is expr.right_operand:
+        return expr
+    return arith_ast.ArithExpr(expr.type, left, right)
+
+
+def _run_loop(count, assignments, known, iteration_budget):
+    # Returns the registers after running the body `count` times, and the value of its last assignment. A body that
+    # leaves the registers as they were will keep doing so, so it's only run until then
+    registers = dict(known)
+    value = None
+    for _ in range(min(count, iteration_budget)):
+        before = dict(registers)
+        for assignment in assignments:
+            value = _evaluate(assignment.expr, registers)
+            registers[assignment.var.name] = value
+        if registers == before:
+            return registers, value
+    if count > iteration_budget:
+        raise _Unknown()
+    return registers, value
+
+
+def _evaluate_loop(loop, known, iteration_budget):
+    counter = _fold(loop.counter, known)
+    if isinstance(counter, arith_ast.Num):
+        count = counter.value % _WORD
+        if count == 0 or not loop.assignments:
+            return arith_ast.LoopAssignment(counter, [])
+        try:
+            registers, value = _run_loop(count, loop.assignments, known, iteration_budget)
+        except _Unknown:
+            pass
+        else:
+            # The registers the body changed are written once, with their final values. The value of the loop is its
+            # last assignment's, so the register that assignment writes goes last
+            last = loop.assignments[-1].var.name
+            changed = [name for name in sorted(registers) if registers[name] != known.get(name) and name != last]
+            known.update(registers)
+            assignments = [arith_ast.Assignment(arith_ast.Var(name), _num(registers[name])) for name in changed]
+            assignments.append(arith_ast.Assignment(arith_ast.Var(last), _num(value)))
+            return arith_ast.LoopAssignment(arith_ast.Num(1), assignments)
+
+    # Only the registers the body never writes keep their value throughout the loop
+    written = {assignment.var.name for assignment in loop.assignments}
+    invariant = {name: value for name, value in known.items() if name not in written}
+    assignments = [arith_ast.Assignment(assignment.var, _fold(assignment.expr, invariant))
+                   for assignment in loop.assignments]
+    for name in written:
+        known.pop(name, None)
+    return arith_ast.LoopAssignment(counter, assignments)
+
+
+def partially_evaluate(program, iteration_budget=ITERATION_BUDGET):
+    # Program.codegen zeroes r10..r13, so whatever a statement computes from known registers is known at compile time
+    # too. Known values are folded into the program, leaving code only for what can't be evaluated (e.g. loops running
+    # for longer than the budget, and whatever depends on them). The generated code still writes every register it
+    # did, so the registers always hold their known values
+    known = {'r10': 0, 'r11': 0, 'r12': 0, 'r13': 0}
+    statements = []
+    for statement in program.statements:
+        if statement.type == arith_ast.NodeType.LoopAssignment:
+            statements.append(_evaluate_loop(statement, known, iteration_budget))
+            continue
+
+        expr = _fold(statement.expr, known)
+        if isinstance(expr, arith_ast.Num):
+            known[statement.var.name] = expr.value % _WORD
+        else:
+            known.pop(statement.var.name, None)
+        statements.append(arith_ast.Assignment(statement.var, expr))
+
+    return arith_ast.Program(statements)
@@ -0,0 +1,224 @@
+import compiler.asm as asm
+
+
+def _is_mov(instruction, destination=None):
+    return instruction.opcode == 'mov' and (destination is None or instruction.operands[0] == destination)
+
+
+def _is_simple_source(operand):
+    return asm.is_register(operand) or asm.is_immediate(operand)
+
+
+def _fits_imm32(operand):
+    return asm.is_immediate(operand) and -2 ** 31 <= int(operand) < 2 ** 31
+
+
+def _is_dead_after(register, code, index):
+    # Conservatively, a register is live unless it is overwritten before being read on the straight-line path
+    # following the instruction at `index`
+    for position in range(index + 1, len(code)):
+        instruction = code[position]
+        if not isinstance(instruction, asm.Instruction):
+            if isinstance(instruction, asm.Comment):
+                continue
+            return False
+        if register in instruction.reads():
+            return False
+        if register in instruction.writes():
+            return True
+        if instruction.is_control_flow():
+            return False
+
+    return False
+
+
+def _self_mov(window, code, index):
+    # mov rax, rax
+    mov, = window
+    if _is_mov(mov) and mov.operands[0] == mov.operands[1]:
+        return []
+    return None
+
+
+def _push_pop(window, code, index):
+    # push rax / pop rbx => mov rbx, rax
+    push, pop = window
+    if push.opcode != 'push' or pop.opcode != 'pop':
+        return None
+    source, destination = push.operands[0], pop.operands[0]
+    if source == destination:
+        return []
+    if asm.is_register(source) and asm.is_register(destination):
+        return [asm.Instruction('mov', (destination, source))]
+    return None
+
+
+def _push_load_pop(window, code, index):
+    # push rax / mov rax, r10 / pop rbx => mov rbx, rax / mov rax, r10
+    push, load, pop = window
+    if push.opcode != 'push' or pop.opcode != 'pop' or not _is_mov(load):
+        return None
+    source, destination = push.operands[0], pop.operands[0]
+    load_destination, load_source = load.operands
+    if not asm.is_register(source) or not asm.is_register(destination) or not _is_simple_source(load_source):
+        return None
+    if load_destination == destination or load_source == destination:
+        return None
+    return [asm.Instruction('mov', (destination, source)), load]
+
+
+def _mov_back(window, code, index):
+    # mov r10, rax / mov rax, r10 => mov r10, rax
+    first, second = window
+    if not _is_mov(first) or not _is_mov(second):
+        return None
+    if not asm.is_register(first.operands[0]) or not asm.is_register(first.operands[1]):
+        return None
+    if first.operands == (second.operands[1], second.operands[0]):
+        return [first]
+    return None
+
+
+def _overwritten_mov(window, code, index):
+    # mov rax, 1 / mov rax, r10 => mov rax, r10
+    first, second = window
+    if not _is_mov(first) or not _is_mov(second):
+        return None
+    destination = first.operands[0]
+    if not asm.is_register(destination) or second.operands[0] != destination:
+        return None
+    if destination in second.reads():
+        return None
+    return [second]
+
+
+def _forward_copy(window, code, index):
+    # mov rax, 5 / mov rbx, rax / mov rax, r10 => mov rbx, 5 / mov rax, r10
+    load, copy, reload = window
+    if not _is_mov(load) or not _is_mov(copy) or not _is_mov(reload):
+        return None
+    temp = load.operands[0]
+    if not asm.is_register(temp) or copy.operands[1] != temp or reload.operands[0] != temp:
+        return None
+    if temp in reload.reads() or not _is_simple_source(load.operands[1]):
+        return None
+    if copy.operands[0] in reload.reads() or not asm.is_register(copy.operands[0]):
+        return None
+    return [asm.Instruction('mov', (copy.operands[0], load.operands[1])), reload]
+
+
+def _fold_operand(operand_mov, op, code, op_index):
+    temp, source = operand_mov.operands
+    if not asm.is_register(temp) or not _is_dead_after(temp, code, op_index):
+        return None
+    if op.opcode in ('add', 'sub') and op.operands[1] == temp and op.operands[0] != temp:
+        if asm.is_register(source) or _fits_imm32(source):
+            return asm.Instruction(op.opcode, (op.operands[0], source))
+    if op.opcode in ('mul', 'div') and op.operands[0] == temp and asm.is_register(source):
+        if source not in ('rax', 'rdx'):
+            return asm.Instruction(op.opcode, (source,))
+    return None
+
+
+def _fold_into_op(window, code, index):
+    # mov rbx, r10 / add rax, rbx => add rax, r10 (when rbx isn't used afterwards)
+    operand_mov, op = window
+    if not _is_mov(operand_mov):
+        return None
+    folded = _fold_operand(operand_mov, op, code, index)
+    return None if folded is None else [folded]
+
+
+def _fold_into_op_over(window, code, index):
+    # mov rbx, 5 / mov rax, r10 / add rax, rbx => mov rax, r10 / add rax, 5 (when rbx isn't used afterwards)
+    operand_mov, middle, op = window[0], window[1:-1], window[-1]
+    if not _is_mov(operand_mov):
+        return None
+    temp, source = operand_mov.operands
+    for instruction in middle:
+        if instruction.is_control_flow() or temp in instruction.reads() | instruction.writes():
+            return None
+        if source in instruction.writes():
+            return None
+    folded = _fold_operand(operand_mov, op, code, index)
+    return None if folded is None else middle + [folded]
+
+
+# Rules are tried in order at every position. Each rule gets a window of consecutive instructions (comments aside, and
+# never across labels or directives) and returns the instructions replacing it, or None if it doesn't apply
+RULES = [(1, _self_mov),
+         (2, _push_pop),
+         (3, _push_load_pop),
+         (2, _mov_back),
+         (2, _overwritten_mov),
+         (3, _forward_copy),
+         (2, _fold_into_op),
+         (3, _fold_into_op_over),
+         (4, _fold_into_op_over)]
+
+
+def _window(code, index, size):
+    # Up to `size` instructions, so the window of every smaller size is a prefix of it
+    window = []
+    positions = []
+    for position in range(index, len(code)):
+        instruction = code[position]
+        if isinstance(instruction, asm.Comment):
+            continue
+        if not isinstance(instruction, asm.Instruction):
+            break
+        window.append(instruction)
+        positions.append(position)
+        if len(window) == size:
+            break
+
+    return window, positions
+
+
+def _apply_rules(code, rules):
+    # One pass over `code`, returning the rewritten code (as a new list, rather than splicing every replacement into
+    # `code`) and whether any rule applied. Rules only look at the code following their window, which the pass hasn't
+    # rewritten yet
+    optimized = []
+    changed = False
+    max_size = max(size for size, _ in rules)
+    index = 0
+    while index < len(code):
+        instruction = code[index]
+        if not isinstance(instruction, asm.Instruction):
+            optimized.append(instruction)
+            index += 1
+            continue
+
+        longest_window, longest_positions = _window(code, index, max_size)
+        for size, rule in rules:
+            if size > len(longest_window):
+                continue
+            window, positions = longest_window[:size], longest_positions[:size]
+            # Rules also get the position of the window's last instruction, for looking at the code following it
+            replacement = rule(window, code, positions[-1])
+            if replacement is None:
+                continue
+
+            optimized.extend(replacement)
+            # Comments within the window follow its replacement
+            optimized.extend(code[position] for position in range(index, positions[-1] + 1)
+                             if isinstance(code[position], asm.Comment))
+            index = positions[-1] + 1
+            changed = True
+            break
+        else:
+            optimized.append(instruction)
+            index += 1
+
+    return optimized, changed
+
+
+def optimize(code, rules=RULES):
+    # Passes are repeated until none applies a rule, which also lets replacements combine with the instructions
+    # around them
+    changed = True
+    while changed:
+        code, changed = _apply_rules(code, rules)
+
+    return list(code)
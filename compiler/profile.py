@@ -0,0 +1,67 @@
+import bisect
+import re
+
+import compiler.parallel as parallel
+
+COUNTERS = 'profile_counters'
+# Every top-level statement has a pair of counters: the cycles it ran for (as measured by rdtsc), and how many times
+# its body ran when it's a loop. The LIBC and STATIC runtimes print `<line> <cycles> <iterations>` to stderr at exit
+CYCLES = 0
+ITERATIONS = 8
+_COUNTERS_SIZE = 16
+
+
+def statement_lines(code):
+    # The line (counting from 1) each top-level statement of `code` (which parses entirely) starts on
+    newlines = [newline.start() for newline in re.finditer('\n', code)]
+    return [bisect.bisect_right(newlines, start) + 1 for start in parallel.statement_starts(code)[:-1]]
+
+
+def counter(register, statement_index, offset):
+    # The counter of a statement, when `register` holds the address of the counters
+    return f'qword [{register}+{statement_index * _COUNTERS_SIZE + offset}]'
+
+
+def _emit_timestamp(assembly):
+    # rax <- the time stamp counter, clobbering rdx
+    assembly.emit('rdtsc')
+    assembly.emit('shl', 'rdx', '32')
+    assembly.emit('or', 'rax', 'rdx')
+
+
+class Profile:
+    # Instruments a program's top-level statements, given the line each starts on. Only rdx and rdi (which the
+    # generated code never uses) are clobbered, and rax is preserved. Loops add their counter to the iterations once,
+    # rather than counting every iteration
+
+    def __init__(self, lines):
+        self.lines = lines
+        self._statement_index = None
+
+    def emit_statement_start(self, assembly, statement_index):
+        # The start time is kept on the stack while the statement runs
+        self._statement_index = statement_index
+        assembly.comment(None, f'Profiling the statement on line {self.lines[statement_index]}')
+        _emit_timestamp(assembly)
+        assembly.emit('push', 'rax')
+
+    def emit_statement_end(self, assembly):
+        assembly.comment(None, 'Adding the cycles the statement ran for')
+        assembly.emit('mov', 'rdi', 'rax')
+        _emit_timestamp(assembly)
+        assembly.emit('pop', 'rdx')
+        assembly.emit('sub', 'rax', 'rdx')
+        assembly.emit('mov', 'rdx', COUNTERS)
+        assembly.emit('add', counter('rdx', self._statement_index, CYCLES), 'rax')
+        assembly.emit('mov', 'rax', 'rdi')
+        self._statement_index = None
+
+    def emit_iterations(self, assembly):
+        # Adds rax to the iterations of the statement being profiled
+        assembly.emit('mov', 'rdi', COUNTERS)
+        assembly.emit('add', counter('rdi', self._statement_index, ITERATIONS), 'rax')
+
+    def emit_counters(self, assembly):
+        assembly.directive('section .bss')
+        assembly.directive(f'{COUNTERS}: resq {len(self.lines) * _COUNTERS_SIZE // 8}')
+        assembly.directive('section .text')
@@ -0,0 +1,256 @@
+import compiler.profile as profiling
+
+OUTPUT_BUFFER_SIZE = 4096
+# The longest printed value, `-9223372036854775808\n`, rounded up to keep the stack aligned
+_DIGITS_SIZE = 32
+
+
+class LibcRuntime:
+    # Prints with printf, for an object file linked by gcc against libc (e.g. assembled by nasm)
+
+    entry = 'main'
+
+    def emit_entry(self, assembly):
+        assembly.directive(f'global {self.entry}')
+        assembly.label(self.entry)
+
+    def emit_exit(self, assembly):
+        assembly.emit('mov', 'rax', '60')
+        assembly.emit('mov', 'rdi', '0')
+        assembly.emit('syscall')
+
+    def emit_division_check(self, assembly, divisor):
+        # Dividing by 0 faults (SIGFPE), which ends the program
+        pass
+
+    def emit_profile_dump(self, assembly, profile):
+        # dprintf(2, profile_format, line, cycles, iterations) for every statement, with the stack aligned for the calls
+        assembly.emit('sub', 'rsp', '8')
+        for index, line in enumerate(profile.lines):
+            assembly.emit('mov', 'rdi', '2')
+            assembly.emit('mov', 'rsi', 'profile_format')
+            assembly.emit('mov', 'rdx', f'{line}')
+            assembly.emit('mov', 'rax', profiling.COUNTERS)
+            assembly.emit('mov', 'rcx', profiling.counter('rax', index, profiling.CYCLES))
+            assembly.emit('mov', 'r8', profiling.counter('rax', index, profiling.ITERATIONS))
+            assembly.emit('mov', 'rax', '0')
+            assembly.emit('call', 'dprintf')
+        assembly.emit('add', 'rsp', '8')
+
+    def emit_routines(self, assembly):
+        assembly.directive('section .data')
+        if assembly.profile is not None:
+            assembly.directive('profile_format: db "%lld %lld %lld", 10, 0')
+        assembly.directive('format: db "%lld", 10')
+
+        assembly.directive('section .text')
+        assembly.directive('extern printf')
+        if assembly.profile is not None:
+            assembly.directive('extern dprintf')
+        assembly.label('print_rax')
+        saved_registers = ('rax', 'rcx', 'r8', 'r9', 'r10', 'r11', 'r12', 'r13')
+        for register in saved_registers:
+            assembly.emit('push', register)
+        assembly.emit('mov', 'rdi', 'format')
+        assembly.emit('mov', 'rsi', 'rax')
+        assembly.emit('mov', 'rax', '0')
+        assembly.emit('call', 'printf')
+        for register in reversed(saved_registers):
+            assembly.emit('pop', register)
+        assembly.emit('ret')
+
+
+class StaticRuntime:
+    # Prints with the write syscall, for a static executable that doesn't depend on anything. Printed values are
+    # buffered in .bss and written (to stdout, and to stderr once the profile is being printed) when the buffer is full
+    # and at exit
+
+    entry = '_start'
+
+    def emit_entry(self, assembly):
+        assembly.directive(f'global {self.entry}')
+        assembly.label(self.entry)
+        assembly.emit('mov', 'rdi', 'output_descriptor')
+        assembly.emit('mov', 'qword [rdi]', '1')
+
+    def emit_exit(self, assembly):
+        assembly.emit('call', 'flush_output')
+        assembly.emit('mov', 'rax', '60')
+        assembly.emit('mov', 'rdi', '0')
+        assembly.emit('syscall')
+
+    def emit_division_check(self, assembly, divisor):
+        # Like the libc runtime's, dividing by 0 faults
+        pass
+
+    def emit_profile_dump(self, assembly, profile):
+        # The program's output is written first, then the profile is printed like it, as `<line> <cycles> <iterations>`
+        assembly.emit('call', 'flush_output')
+        assembly.emit('mov', 'rdi', 'output_descriptor')
+        assembly.emit('mov', 'qword [rdi]', '2')
+        for index, line in enumerate(profile.lines):
+            assembly.emit('mov', 'rax', f'{line}')
+            assembly.emit('call', 'print_rax_space')
+            for offset, routine in ((profiling.CYCLES, 'print_rax_space'), (profiling.ITERATIONS, 'print_rax')):
+                assembly.emit('mov', 'rdi', profiling.COUNTERS)
+                assembly.emit('mov', 'rax', profiling.counter('rdi', index, offset))
+                assembly.emit('call', routine)
+
+    def emit_routines(self, assembly):
+        assembly.directive('section .bss')
+        assembly.directive('output_descriptor: resq 1')
+        assembly.directive('output_length: resq 1')
+        assembly.directive(f'output_buffer: resb {OUTPUT_BUFFER_SIZE}')
+        assembly.directive('section .text')
+
+        self._emit_print(assembly, 'print_rax', 10)
+        if assembly.profile is not None:
+            self._emit_print(assembly, 'print_rax_space', 32)
+        self._emit_flush(assembly)
+
+    @staticmethod
+    def _emit_print(assembly, label, terminator):
+        # Prints rax followed by the `terminator` character. Like printf, only rdx, rsi and rdi aren't preserved
+        assembly.label(label)
+        saved_registers = ('rax', 'rcx', 'r8', 'r11')
+        for register in saved_registers:
+            assembly.emit('push', register)
+        # The digits are written backwards, from the end of a stack buffer
+        assembly.emit('mov', 'rsi', 'rsp')
+        assembly.emit('sub', 'rsp', f'{_DIGITS_SIZE}')
+        assembly.emit('dec', 'rsi')
+        assembly.emit('mov', 'byte [rsi]', f'{terminator}')
+        assembly.emit('mov', 'r8', 'rax')
+        assembly.emit('test', 'rax', 'rax')
+        assembly.emit('jns', f'{label}_digits')
+        assembly.emit('neg', 'rax')
+        assembly.label(f'{label}_digits')
+        assembly.emit('mov', 'rcx', '10')
+        assembly.label(f'{label}_digit')
+        assembly.emit('xor', 'rdx', 'rdx')
+        assembly.emit('div', 'rcx')
+        assembly.emit('add', 'rdx', '48')
+        assembly.emit('dec', 'rsi')
+        assembly.emit('mov', 'byte [rsi]', 'dl')
+        assembly.emit('test', 'rax', 'rax')
+        assembly.emit('jnz', f'{label}_digit')
+        assembly.emit('test', 'r8', 'r8')
+        assembly.emit('jns', f'{label}_append')
+        assembly.emit('dec', 'rsi')
+        assembly.emit('mov', 'byte [rsi]', '45')
+        assembly.label(f'{label}_append')
+        # Flushing first when the digits might not fit in the output buffer
+        assembly.emit('mov', 'rdi', 'output_length')
+        assembly.emit('mov', 'rcx', 'qword [rdi]')
+        assembly.emit('cmp', 'rcx', f'{OUTPUT_BUFFER_SIZE - _DIGITS_SIZE}')
+        assembly.emit('jb', f'{label}_copy')
+        assembly.emit('call', 'flush_output')
+        assembly.emit('mov', 'rcx', '0')
+        assembly.label(f'{label}_copy')
+        assembly.emit('mov', 'rdi', 'output_buffer')
+        assembly.emit('add', 'rdi', 'rcx')
+        assembly.emit('lea', 'rdx', f'[rsp+{_DIGITS_SIZE}]')
+        assembly.label(f'{label}_copy_byte')
+        assembly.emit('mov', 'al', 'byte [rsi]')
+        assembly.emit('mov', 'byte [rdi]', 'al')
+        assembly.emit('inc', 'rsi')
+        assembly.emit('inc', 'rdi')
+        assembly.emit('inc', 'rcx')
+        assembly.emit('cmp', 'rsi', 'rdx')
+        assembly.emit('jne', f'{label}_copy_byte')
+        assembly.emit('mov', 'rdi', 'output_length')
+        assembly.emit('mov', 'qword [rdi]', 'rcx')
+        assembly.emit('add', 'rsp', f'{_DIGITS_SIZE}')
+        for register in reversed(saved_registers):
+            assembly.emit('pop', register)
+        assembly.emit('ret')
+
+    @staticmethod
+    def _emit_flush(assembly):
+        # Writes the output buffer to the output descriptor and empties it. Only rax, rcx, r11 (clobbered by syscall)
+        # and rdi aren't preserved
+        assembly.label('flush_output')
+        assembly.emit('push', 'rsi')
+        assembly.emit('push', 'rdx')
+        assembly.emit('mov', 'rdi', 'output_length')
+        assembly.emit('mov', 'rdx', 'qword [rdi]')
+        assembly.emit('mov', 'rsi', 'output_buffer')
+        assembly.label('flush_output_write')
+        assembly.emit('test', 'rdx', 'rdx')
+        assembly.emit('jz', 'flush_output_done')
+        assembly.emit('mov', 'rdi', 'output_descriptor')
+        assembly.emit('mov', 'rdi', 'qword [rdi]')
+        assembly.emit('mov', 'rax', '1')
+        assembly.emit('syscall')
+        # A partial write leaves the rest of the buffer to write (errors are ignored, like printf's)
+        assembly.emit('test', 'rax', 'rax')
+        assembly.emit('jle', 'flush_output_done')
+        assembly.emit('add', 'rsi', 'rax')
+        assembly.emit('sub', 'rdx', 'rax')
+        assembly.emit('jmp', 'flush_output_write')
+        assembly.label('flush_output_done')
+        assembly.emit('mov', 'rdi', 'output_length')
+        assembly.emit('mov', 'qword [rdi]', '0')
+        assembly.emit('pop', 'rdx')
+        assembly.emit('pop', 'rsi')
+        assembly.emit('ret')
+
+
+class JitRuntime:
+    # Runs as a function called from Python, `jit_entry(output)` where output points to {count, capacity,
+    # stack_pointer, values[capacity]}. Printing appends rax to the values (while there's room) and counts it, which
+    # rbp points to throughout, since the generated code never uses it. A fault would kill the Python process running
+    # the program, so dividing by 0 returns DIVISION_FAULT instead of the count, from the stack pointer saved on entry
+
+    entry = 'jit_entry'
+    DIVISION_FAULT = -1
+    _callee_saved_registers = ('rbp', 'rbx', 'r12', 'r13', 'r14', 'r15')
+
+    def emit_entry(self, assembly):
+        assembly.directive(f'global {self.entry}')
+        assembly.label(self.entry)
+        for register in self._callee_saved_registers:
+            assembly.emit('push', register)
+        assembly.emit('mov', 'rbp', 'rdi')
+        assembly.emit('mov', 'qword [rbp+16]', 'rsp')
+
+    def emit_exit(self, assembly):
+        assembly.emit('mov', 'rax', 'qword [rbp]')
+        self._emit_return(assembly)
+
+    def _emit_return(self, assembly):
+        for register in reversed(self._callee_saved_registers):
+            assembly.emit('pop', register)
+        assembly.emit('ret')
+
+    def emit_division_check(self, assembly, divisor):
+        assembly.emit('test', divisor, divisor)
+        assembly.emit('jz', 'division_fault')
+
+    def emit_profile_dump(self, assembly, profile):
+        # The counters are read from Python instead, see jit.JitProgram.profile
+        pass
+
+    def emit_routines(self, assembly):
+        assembly.label('division_fault')
+        assembly.emit('mov', 'rsp', 'qword [rbp+16]')
+        assembly.emit('mov', 'rax', f'{self.DIVISION_FAULT}')
+        self._emit_return(assembly)
+
+        assembly.label('print_rax')
+        assembly.emit('push', 'rcx')
+        assembly.emit('mov', 'rcx', 'qword [rbp]')
+        assembly.emit('mov', 'rdx', 'qword [rbp+8]')
+        assembly.emit('cmp', 'rcx', 'rdx')
+        assembly.emit('jae', 'print_rax_count')
+        assembly.emit('mov', 'qword [rbp+rcx*8+24]', 'rax')
+        assembly.label('print_rax_count')
+        assembly.emit('inc', 'rcx')
+        assembly.emit('mov', 'qword [rbp]', 'rcx')
+        assembly.emit('pop', 'rcx')
+        assembly.emit('ret')
+
+
+LIBC = LibcRuntime()
+STATIC = StaticRuntime()
+JIT = JitRuntime()
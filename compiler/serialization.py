@@ -0,0 +1,215 @@
+import array
+import struct
+import sys
+
+import compiler.ast as arith_ast
+
+# A program is stored as its nodes in post-order: one opcode byte per node, the values of its numbers, and the operands
+# of the other nodes that have one (indices into a table of strings for register names and out of range numbers, and
+# the size of loop bodies). Numbers and operands are each stored as wide as the largest of them needs. Decoding is a
+# single pass with a stack, so neither direction recurses however deep the expressions are
+MAGIC = b'ARTH'
+VERSION = 1
+# Magic, version, then the size of the opcodes, the count and width of numbers and of operands, and the size of the
+# strings
+_HEADER = struct.Struct('<4sBIIBIBI')
+_TYPECODES = {array.array(typecode).itemsize: typecode for typecode in 'QLIHB'}
+_WIDTHS = (1, 2, 4, 8)
+
+_ADD, _SUB, _MUL, _DIV, _NUM, _NEGATIVE_NUM, _BIG_NUM, _VAR, _TEMP, _ASSIGN, _LOOP = range(11)
+
+_ARITHMETIC = {arith_ast.NodeType.AddExpr: _ADD,
+               arith_ast.NodeType.SubExpr: _SUB,
+               arith_ast.NodeType.MulExpr: _MUL,
+               arith_ast.NodeType.DivExpr: _DIV}
+_NODE_TYPES = {opcode: node_type for node_type, opcode in _ARITHMETIC.items()}
+_EXPRESSIONS = (arith_ast.ArithExpr, arith_ast.Num, arith_ast.Var, arith_ast.TempExpr)
+
+
+class SerializationError(ValueError):
+    pass
+
+
+def _malformed():
+    return SerializationError('Malformed program')
+
+
+class _Encoder:
+    def __init__(self):
+        self.opcodes = bytearray()
+        self.numbers = []
+        self.operands = []
+        self.strings = {}
+
+    def _string(self, string):
+        return self.strings.setdefault(string, len(self.strings))
+
+    def _num(self, value):
+        if 0 <= value < 2 ** 64:
+            self.opcodes.append(_NUM)
+            self.numbers.append(value)
+        elif -2 ** 64 < value < 0:
+            self.opcodes.append(_NEGATIVE_NUM)
+            self.numbers.append(-value)
+        else:
+            # Parsed, but too large to compile, which is only reported when generating code
+            self.opcodes.append(_BIG_NUM)
+            self.operands.append(self._string(str(value)))
+
+    def expr(self, expr):
+        # Nodes are visited root, right subtree, left subtree, which reversed is their post-order
+        pending = [expr]
+        nodes = []
+        while pending:
+            node = pending.pop()
+            nodes.append(node)
+            if isinstance(node, arith_ast.ArithExpr):
+                pending.append(node.left_operand)
+                pending.append(node.right_operand)
+            elif isinstance(node, arith_ast.TempExpr):
+                pending.append(node.expr)
+
+        for node in reversed(nodes):
+            if isinstance(node, arith_ast.ArithExpr):
+                self.opcodes.append(_ARITHMETIC[node.type])
+            elif isinstance(node, arith_ast.Num):
+                self._num(node.value)
+            elif isinstance(node, arith_ast.Var):
+                self.opcodes.append(_VAR)
+                self.operands.append(self._string(node.name))
+            elif isinstance(node, arith_ast.TempExpr):
+                self.opcodes.append(_TEMP)
+                self.operands.append(self._string(node.temp))
+            else:
+                raise SerializationError(f'Cannot serialize {node!r}')
+
+    def assignment(self, assignment):
+        self.expr(assignment.expr)
+        self.opcodes.append(_ASSIGN)
+        self.operands.append(self._string(assignment.var.name))
+
+    def statement(self, statement):
+        if statement.type == arith_ast.NodeType.LoopAssignment:
+            self.expr(statement.counter)
+            for assignment in statement.assignments:
+                self.assignment(assignment)
+            self.opcodes.append(_LOOP)
+            self.operands.append(len(statement.assignments))
+        else:
+            self.assignment(statement)
+
+
+def _pack(values):
+    # Returns the width of the values and their little-endian bytes
+    largest = max(values, default=0)
+    width = next(width for width in _WIDTHS if largest < 2 ** (8 * width))
+    packed = array.array(_TYPECODES[width], values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return width, packed.tobytes()
+
+
+def _unpack(data, width):
+    if width not in _WIDTHS:
+        raise SerializationError(f'Unsupported width {width}')
+    values = array.array(_TYPECODES[width])
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def encode(program):
+    encoder = _Encoder()
+    for statement in program.statements:
+        encoder.statement(statement)
+
+    numbers_width, numbers = _pack(encoder.numbers)
+    operands_width, operands = _pack(encoder.operands)
+    strings = '\0'.join(encoder.strings).encode()
+    header = _HEADER.pack(MAGIC, VERSION, len(encoder.opcodes), len(encoder.numbers), numbers_width,
+                          len(encoder.operands), operands_width, len(strings))
+    return b''.join([header, encoder.opcodes, numbers, operands, strings])
+
+
+def decode(data):
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise SerializationError('Truncated program')
+    magic, version, opcodes_size, numbers_count, numbers_width, operands_count, operands_width, strings_size = \
+        _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise SerializationError(f'Not a serialized program (or of an unsupported version {version})')
+    numbers_start = _HEADER.size + opcodes_size
+    operands_start = numbers_start + numbers_count * numbers_width
+    strings_start = operands_start + operands_count * operands_width
+    if len(data) != strings_start + strings_size:
+        raise SerializationError('Truncated program')
+
+    opcodes = data[_HEADER.size:numbers_start]
+    numbers = iter(_unpack(data[numbers_start:operands_start], numbers_width))
+    operands = iter(_unpack(data[operands_start:strings_start], operands_width))
+    strings = bytes(data[strings_start:]).decode().split('\0') if strings_size else []
+    # Var nodes are immutable, so every use of a register shares one
+    variables = [arith_ast.Var(string) for string in strings]
+
+    # Every node is checked to have operands of the right kind as it's rebuilt, so that malformed data is reported
+    # here rather than when generating code for whatever it decoded to
+    stack = []
+    push, pop = stack.append, stack.pop
+    try:
+        for opcode in opcodes:
+            if opcode <= _DIV:
+                right = pop()
+                left = pop()
+                if not isinstance(left, _EXPRESSIONS) or not isinstance(right, _EXPRESSIONS):
+                    raise _malformed()
+                push(arith_ast.ArithExpr(_NODE_TYPES[opcode], left, right))
+            elif opcode == _NUM:
+                push(arith_ast.Num(next(numbers)))
+            elif opcode == _VAR:
+                push(variables[next(operands)])
+            elif opcode == _ASSIGN:
+                expr = pop()
+                if not isinstance(expr, _EXPRESSIONS):
+                    raise _malformed()
+                push(arith_ast.Assignment(variables[next(operands)], expr))
+            elif opcode == _LOOP:
+                size = next(operands)
+                if size >= len(stack):
+                    raise _malformed()
+                assignments = stack[len(stack) - size:]
+                del stack[len(stack) - size:]
+                counter = pop()
+                if not isinstance(counter, _EXPRESSIONS) or \
+                        not all(isinstance(assignment, arith_ast.Assignment) for assignment in assignments):
+                    raise _malformed()
+                push(arith_ast.LoopAssignment(counter, assignments))
+            elif opcode == _NEGATIVE_NUM:
+                push(arith_ast.Num(-next(numbers)))
+            elif opcode == _BIG_NUM:
+                push(arith_ast.Num(int(strings[next(operands)])))
+            elif opcode == _TEMP:
+                expr = pop()
+                if not isinstance(expr, _EXPRESSIONS):
+                    raise _malformed()
+                push(arith_ast.TempExpr(expr, strings[next(operands)]))
+            else:
+                raise SerializationError(f'Unknown opcode {opcode}')
+    except (IndexError, StopIteration):
+        raise _malformed() from None
+
+    if next(numbers, None) is not None or next(operands, None) is not None or \
+            not all(isinstance(statement, (arith_ast.Assignment, arith_ast.LoopAssignment)) for statement in stack):
+        raise _malformed()
+    return arith_ast.Program(stack)
+
+
+def dump(program, path):
+    with open(path, 'wb') as output_file:
+        output_file.write(encode(program))
+
+
+def load(path):
+    with open(path, 'rb') as input_file:
+        return decode(input_file.read())
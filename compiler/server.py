@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import json
+import os
+import signal
+import stat
+
+import compiler.client as client
+import compiler.compiler as compiler
+
+
+def _warm_up():
+    # Every worker compiles a program once, when it starts, so that its first request doesn't pay for anything done
+    # lazily
+    compiler.compile_code('r10 = 1;')
+
+
+def compile_request(request):
+    # Requests are {"code": ..., "comments": ..., "jobs": ..., "executable": ..., "profile": ..., "c_source": ...,
+    # "report": ...} or {"path": ..., ...}, and responses are {"assembly": ...}, {"executable": <base64>},
+    # {"c_source": ...}, {"report": ...} or {"error": ...}
+    try:
+        if 'path' in request:
+            with open(request['path'], 'rt') as input_file:
+                code = input_file.read()
+        else:
+            code = request['code']
+        profile = request.get('profile', False)
+        if request.get('executable'):
+            executable = compiler.compile_executable(code, request.get('jobs'), profile)
+            return {'executable': base64.b64encode(executable).decode()}
+        if request.get('report'):
+            return {'report': compiler.compile_report(code, request.get('jobs'))}
+        if request.get('c_source'):
+            return {'c_source': compiler.compile_c_code(code, request.get('jobs'))}
+        return {'assembly': compiler.compile_code(code, request.get('comments', False), request.get('jobs'), profile)}
+    except Exception as e:
+        return {'error': str(e)}
+
+
+class CompileServer:
+    def __init__(self, path=None, workers=None):
+        self.path = path if path is not None else client.default_socket_path()
+        self.workers = workers
+        self._pool = None
+        self._server = None
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            # A client may send several requests over the same connection, one per line
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    response = {'error': f'Malformed request: {e}'}
+                else:
+                    response = await loop.run_in_executor(self._pool, compile_request, request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _prepare_directory(self):
+        # The default directory in the shared temporary directory must be the current user's alone, or whoever created
+        # it could replace the socket
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if directory != os.path.abspath(client.private_socket_directory()):
+            return
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        status = os.lstat(directory)
+        if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+            raise RuntimeError(f'{directory} must be a directory only the current user can access')
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        if client.is_running(self.path):
+            raise RuntimeError(f'A compile server is already listening on {self.path}')
+        os.unlink(self.path)
+
+    async def serve(self):
+        self._prepare_directory()
+        self._remove_stale_socket()
+        # Workers are forked from an already warm server, and started before the first request rather than on it
+        _warm_up()
+        self._pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_warm_up)
+        await asyncio.get_running_loop().run_in_executor(self._pool, _warm_up)
+        # Stopping the server with SIGTERM still removes its socket
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, self.path)
+            # Only the current user may send requests, which read files as that user
+            os.chmod(self.path, 0o600)
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Serves compile requests over a Unix domain socket, for '
+                                                     '`main.py` (and other clients) to skip the startup cost')
+    arg_parser.add_argument('--socket', default=None,
+                            help=f'socket path (defaults to ${client.SOCKET_ENV}, or a path in $XDG_RUNTIME_DIR '
+                                 'or in a per-user directory in /tmp)')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='number of compiling processes (defaults to the number of CPUs)')
+    args = arg_parser.parse_args(argv)
+
+    try:
+        asyncio.run(CompileServer(args.socket, args.workers).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
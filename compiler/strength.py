@@ -0,0 +1,162 @@
+_WORD_BITS = 64
+_WORD = 2 ** _WORD_BITS
+
+# Multipliers a single `lea` can apply, mapped to the scale of its index register
+_LEA_MULTIPLIERS = {3: 2, 5: 4, 9: 8}
+
+
+def _is_power_of_two(value):
+    return value > 0 and value & (value - 1) == 0
+
+
+def _log2(value):
+    return value.bit_length() - 1
+
+
+class Magic:
+    # Dividing an unsigned `bits` wide n by the divisor equals:
+    #   q = mulhi(n >> pre_shift, multiplier) >> post_shift
+    # or, with `add` set (when the multiplier needs bits + 1 bits):
+    #   t = mulhi(n, multiplier)
+    #   q = (((n - t) >> 1) + t) >> post_shift
+    # where mulhi is the upper `bits` bits of the double-width product
+
+    def __init__(self, multiplier, pre_shift, post_shift, add):
+        self.multiplier = multiplier
+        self.pre_shift = pre_shift
+        self.post_shift = post_shift
+        self.add = add
+
+    def __repr__(self):
+        return f'Magic(multiplier={self.multiplier}, pre_shift={self.pre_shift}, ' \
+               f'post_shift={self.post_shift}, add={self.add})'
+
+
+def _round_up_multiplier(divisor, dividend_bits, bits):
+    # Smallest total shift with a multiplier that fits in a `bits` wide register and is precise enough for every
+    # `dividend_bits` wide dividend (Granlund & Montgomery, "Division by Invariant Integers using Multiplication",
+    # theorem 4.2). The product is shifted right by at least `bits`, so only its upper half is needed
+    for shift in range(divisor.bit_length() + 1):
+        total_shift = dividend_bits + shift
+        if total_shift < bits:
+            continue
+        multiplier = -(-2 ** total_shift // divisor)
+        if multiplier >= 2 ** bits:
+            return None
+        if multiplier * divisor - 2 ** total_shift <= 2 ** shift:
+            return multiplier, total_shift - bits
+    return None
+
+
+def unsigned_magic(divisor, bits=_WORD_BITS):
+    if divisor < 2 or _is_power_of_two(divisor) or divisor >= 2 ** bits:
+        raise ValueError(f'{divisor} has no magic number, divide by shifting instead')
+
+    found = _round_up_multiplier(divisor, bits, bits)
+    if found is not None:
+        return Magic(found[0], 0, found[1], False)
+
+    # Dividing out the factors of 2 first leaves a narrower dividend, for which the multiplier may fit
+    pre_shift = 0
+    while divisor % 2 ** (pre_shift + 1) == 0:
+        pre_shift += 1
+    if pre_shift > 0:
+        found = _round_up_multiplier(divisor >> pre_shift, bits - pre_shift, bits)
+        if found is not None:
+            return Magic(found[0], pre_shift, found[1], False)
+
+    shift = divisor.bit_length()
+    multiplier = 2 ** bits * (2 ** shift - divisor) // divisor + 1
+    return Magic(multiplier, 0, shift - 1, True)
+
+
+def divide(dividend, magic, bits=_WORD_BITS):
+    # Evaluates the sequence described by `magic` the way the generated code does
+    dividend >>= magic.pre_shift
+    high = (dividend * magic.multiplier) >> bits
+    if magic.add:
+        return (((dividend - high) >> 1) + high) >> magic.post_shift
+    return high >> magic.post_shift
+
+
+def emit_div(assembly, divisor):
+    # rax <- rax / divisor (unsigned), for a non-zero divisor
+    divisor %= _WORD
+    if divisor == 0:
+        raise ValueError('Cannot lower a division by 0')
+    if divisor == 1:
+        return
+    if _is_power_of_two(divisor):
+        assembly.emit('shr', 'rax', f'{_log2(divisor)}')
+        return
+
+    magic = unsigned_magic(divisor)
+    if magic.pre_shift:
+        assembly.emit('shr', 'rax', f'{magic.pre_shift}')
+    if magic.add:
+        assembly.emit('mov', 'rbx', 'rax')
+    assembly.emit('mov', 'rdx', f'{magic.multiplier}')
+    assembly.emit('mul', 'rdx')
+    if magic.add:
+        assembly.emit('sub', 'rbx', 'rdx')
+        assembly.emit('shr', 'rbx', '1')
+        assembly.emit('add', 'rbx', 'rdx')
+        assembly.emit('mov', 'rax', 'rbx')
+    else:
+        assembly.emit('mov', 'rax', 'rdx')
+    if magic.post_shift:
+        assembly.emit('shr', 'rax', f'{magic.post_shift}')
+
+
+def _emit_positive_mul(assembly, multiplier):
+    # Emits the shift/lea/add sequence for a multiplier accepted by _has_short_mul
+    shift = 0
+    while multiplier % 2 == 0:
+        multiplier //= 2
+        shift += 1
+
+    if multiplier in _LEA_MULTIPLIERS:
+        assembly.emit('lea', 'rax', f'[rax+rax*{_LEA_MULTIPLIERS[multiplier]}]')
+    elif _is_power_of_two(multiplier - 1):
+        assembly.emit('mov', 'rbx', 'rax')
+        assembly.emit('shl', 'rax', f'{_log2(multiplier - 1)}')
+        assembly.emit('add', 'rax', 'rbx')
+    elif multiplier + 1 < _WORD and _is_power_of_two(multiplier + 1):
+        assembly.emit('mov', 'rbx', 'rax')
+        assembly.emit('shl', 'rax', f'{_log2(multiplier + 1)}')
+        assembly.emit('sub', 'rax', 'rbx')
+
+    if shift:
+        assembly.emit('shl', 'rax', f'{shift}')
+
+
+def _has_short_mul(multiplier):
+    while multiplier % 2 == 0:
+        multiplier //= 2
+    return multiplier in (1, *_LEA_MULTIPLIERS) or \
+        _is_power_of_two(multiplier - 1) or (multiplier + 1 < _WORD and _is_power_of_two(multiplier + 1))
+
+
+def emit_mul(assembly, multiplier):
+    # rax <- rax * multiplier (mod 2^64)
+    multiplier %= _WORD
+    if multiplier == 0:
+        assembly.emit('mov', 'rax', '0')
+        return
+    if _has_short_mul(multiplier):
+        _emit_positive_mul(assembly, multiplier)
+        return
+
+    negated = _WORD - multiplier
+    if _has_short_mul(negated):
+        _emit_positive_mul(assembly, negated)
+        assembly.emit('neg', 'rax')
+        return
+
+    if multiplier < 2 ** 31 or negated <= 2 ** 31:
+        signed_multiplier = multiplier if multiplier < 2 ** 31 else -negated
+        assembly.emit('imul', 'rax', 'rax', f'{signed_multiplier}')
+        return
+
+    assembly.emit('mov', 'rbx', f'{multiplier}')
+    assembly.emit('imul', 'rax', 'rbx')
@@ -0,0 +1,82 @@
+import compiler.ast as arith_ast
+import compiler.parser as parser
+
+_WORD = 2 ** 64
+
+
+class IterationLimitExceeded(Exception):
+    pass
+
+
+def parse(code):
+    # The program of `code`, which must parse entirely, as parsed by the parser combinators
+    output = parser.nt_statements(code)
+    assert output.next_token_index == len(code)
+    return output.match
+
+
+def to_signed(value):
+    return value - _WORD if value >= 2 ** 63 else value
+
+
+REGISTERS = ('r10', 'r11', 'r12', 'r13')
+
+
+def random_expr(rng, depth, registers=REGISTERS, constants=((0, 2 ** 40),), operators='+-*/', right_constants=None):
+    # Code of a random expression with up to `depth` levels of operators, over `registers` and constants drawn from
+    # one of the (inclusive) ranges of `constants`. Divisions are by a constant from 1 to 1000, so that they never
+    # fault. With `right_constants`, 7 in 10 multiplications and divisions are by one of those instead, and the others
+    # are by any expression
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(list(registers) + [str(rng.randint(low, high)) for low, high in constants])
+    op = rng.choice(operators)
+    if right_constants is not None and op in '*/' and rng.random() < 0.7:
+        right = str(rng.choice(right_constants))
+    elif right_constants is None and op == '/':
+        right = str(rng.randint(1, 1000))
+    else:
+        right = random_expr(rng, depth - 1, registers, constants, operators, right_constants)
+    return f'{random_expr(rng, depth - 1, registers, constants, operators, right_constants)} {op} {right}'
+
+
+def evaluate_expr(expr, registers):
+    if isinstance(expr, arith_ast.Num):
+        return expr.value % _WORD
+    if isinstance(expr, arith_ast.Var):
+        return registers[expr.name]
+    if isinstance(expr, arith_ast.TempExpr):
+        value = evaluate_expr(expr.expr, registers)
+        registers[expr.temp] = value
+        return value
+
+    # Same evaluation order as the generated code
+    right = evaluate_expr(expr.right_operand, registers)
+    left = evaluate_expr(expr.left_operand, registers)
+    if expr.type == arith_ast.NodeType.AddExpr:
+        return (left + right) % _WORD
+    if expr.type == arith_ast.NodeType.SubExpr:
+        return (left - right) % _WORD
+    if expr.type == arith_ast.NodeType.MulExpr:
+        return (left * right) % _WORD
+    return left // right
+
+
+def evaluate(program, max_iterations=10 ** 6):
+    registers = {'r10': 0, 'r11': 0, 'r12': 0, 'r13': 0}
+    printed = []
+    for statement in program.statements:
+        if statement.type == arith_ast.NodeType.LoopAssignment:
+            value = evaluate_expr(statement.counter, registers)
+            iterations = value
+            if iterations > max_iterations:
+                raise IterationLimitExceeded(statement)
+            for _ in range(iterations):
+                for assignment in statement.assignments:
+                    value = evaluate_expr(assignment.expr, registers)
+                    registers[assignment.var.name] = value
+        else:
+            value = evaluate_expr(statement.expr, registers)
+            registers[statement.var.name] = value
+        printed.append(to_signed(value))
+
+    return printed
@@ -0,0 +1,34 @@
+import compiler.asm as asm
+import compiler.ast as arith_ast
+import compiler.compiler as compiler
+from compiler.tests import x86
+from compiler.tests.reference import parse
+
+
+def test_instructions():
+    program = parse('r10 = 2 + r11;')
+
+    actual = compiler.generate(program)
+    statement_start = actual.index(asm.Instruction('mov', ('r13', '0'))) + 1
+    assert [str(instruction) for instruction in actual[statement_start:statement_start + 8]] == \
+           ['mov rax, r11', 'push rax', 'mov rax, 2', 'pop rbx', 'add rax, rbx', 'mov r10, rax', 'call print_rax',
+            'mov rax, 60']
+    assert x86.run(actual) == [2]
+
+
+def test_comments_are_optional(monkeypatch):
+    program = parse('r10 = 2 * 3 + r11; loop 2 r11 = r11 + 1;')
+
+    with_comments = compiler.generate(program, comments=True)
+    assert any(isinstance(instruction, asm.Comment) for instruction in with_comments)
+
+    def fail(node):
+        raise AssertionError(f'{type(node).__name__}.__str__ called without comments')
+
+    for node_type in (arith_ast.Num, arith_ast.Var, arith_ast.ArithExpr, arith_ast.Assignment,
+                      arith_ast.LoopAssignment):
+        monkeypatch.setattr(node_type, '__str__', fail)
+    without_comments = compiler.generate(program)
+    assert not any(isinstance(instruction, asm.Comment) for instruction in without_comments)
+    with_comments = [instruction for instruction in with_comments if not isinstance(instruction, asm.Comment)]
+    assert asm.serialize(with_comments) == asm.serialize(without_comments)
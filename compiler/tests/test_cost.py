@@ -0,0 +1,87 @@
+import random
+
+import compiler.ast as arith_ast
+import compiler.compiler as compiler
+import compiler.cost as cost
+import compiler.peephole as peephole
+from compiler.tests import x86
+from compiler.tests.reference import REGISTERS, parse, random_expr
+
+# The first loop runs for longer than partial evaluation would evaluate, and the last for as long as r10 says
+_CODE = '''r11 = 5000;
+loop r11
+  r10 = r10 * 3 + 1;
+r12 = r10 * 3 + r11;
+loop r10 r11 = r11 + 1;
+'''
+
+
+def test_cost_arithmetic():
+    assert cost.Cost(1, 2, 3) + cost.Cost(4, 5, 6) == cost.Cost(5, 7, 9)
+    assert cost.Cost(1, 2, 3) * 4 == cost.Cost(4, 8, 12)
+    assert sum((cost.Cost(1, 1, 0) for _ in range(3)), cost.Cost()) == cost.Cost(3, 3, 0)
+
+
+def test_estimate():
+    program = compiler.optimize(parse(_CODE))
+    assignment, constant_loop, stacked, runtime_loop = cost.estimate(program, [1, 2, 4, 5])
+
+    assert (assignment.line, assignment.executed.instructions, assignment.iterations) == (1, 2, 0)
+    assert assignment.per_iteration is None
+
+    # Unrolled by 4, the body runs in 1250 trips ending with `dec` and `jnz`, after a `mov` of the trips
+    assert constant_loop.iterations == 5000
+    assert constant_loop.executed == constant_loop.per_iteration * 5000 + cost.Cost(2 * 1250 + 1, 2 * 1250 + 1, 0)
+    assert constant_loop.size.instructions < constant_loop.executed.instructions
+
+    assert stacked.executed.stack_pairs == 1
+
+    assert runtime_loop.iterations is None
+    assert runtime_loop.executed is None
+    assert runtime_loop.per_iteration is not None
+
+
+def test_division_is_expensive():
+    divided, added = cost.estimate(parse('r10 = r11 / r12; r10 = r11 + r12;'), [1, 1])
+    assert divided.executed.cycles > 10 * added.executed.cycles
+
+
+def test_report():
+    lines = compiler.compile_report(_CODE).splitlines()
+    assert lines[0] == '# line instructions executed cycles stack_pairs iterations cycles_per_iteration'
+    assert [line.split()[0] for line in lines[1:-1]] == ['1', '2', '4', '5']
+    assert lines[4].split()[2:6] == ['?', '?', '?', '?']
+    assert lines[-1].startswith('# total') and lines[-1].endswith('? ? ?')
+
+    known = compiler.compile_report('r10 = 1;\nr11 = r10 + 2;').splitlines()
+    assert known[1:] == ['1 2 2 2 0 0 0', '2 4 4 4 0 0 0', '# total 6 6 6 0']
+
+
+def test_report_counts_the_iterations_of_the_source():
+    # Partial evaluation would fold the loop into a single assignment of its final value
+    lines = compiler.compile_report('r10 = 1;\nloop 32 r10 = r10 * 2;').splitlines()
+    iterations, cycles_per_iteration = lines[2].split()[5:]
+    assert iterations == '32'
+    assert int(cycles_per_iteration) > 0
+
+
+def test_executed_matches_running():
+    # Every executed instruction is accounted for by a statement, except for main's prologue and exit, and the calls
+    # printing the values of statements
+    empty = x86.Machine(peephole.optimize(compiler.generate(arith_ast.Program([]))))
+    empty.run()
+
+    rng = random.Random(45)
+    for _ in range(100):
+        statements = [f'{rng.choice(REGISTERS)} = {random_expr(rng, 3)};' for _ in range(rng.randint(1, 6))]
+        for _ in range(rng.randint(1, 2)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {random_expr(rng, 2)}' for _ in range(rng.randint(0, 3)))
+            statements.insert(rng.randint(0, len(statements)), f'loop {rng.randint(0, 40)} {body};')
+        program = compiler.optimize(parse('\n'.join(statements)), partial_evaluation=rng.random() < 0.5)
+
+        machine = x86.Machine(peephole.optimize(compiler.generate(program)))
+        machine.run()
+        costs = cost.estimate(program, range(len(program.statements)))
+        assert all(statement_cost.executed is not None for statement_cost in costs)
+        assert sum(statement_cost.executed.instructions for statement_cost in costs) == \
+            machine.executed - empty.executed - len(costs)
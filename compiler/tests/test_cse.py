@@ -0,0 +1,85 @@
+import functools
+import random
+
+import compiler.cse as cse
+import compiler.ast as arith_ast
+from compiler.tests.reference import REGISTERS, evaluate, parse, random_expr
+
+
+def _count_nodes(expr, node_type):
+    if isinstance(expr, arith_ast.TempExpr):
+        return _count_nodes(expr.expr, node_type)
+    if not isinstance(expr, arith_ast.ArithExpr):
+        return 0
+    own = 1 if expr.type == node_type else 0
+    return own + _count_nodes(expr.left_operand, node_type) + _count_nodes(expr.right_operand, node_type)
+
+
+def test_structural_equality():
+    first = parse('r10 = r10 * r11 + 2;').statements[0].expr
+    second = parse('r12 = r10*r11+2;').statements[0].expr
+    other = parse('r12 = r10*r11+3;').statements[0].expr
+
+    assert first == second
+    assert hash(first) == hash(second)
+    assert first != other
+
+
+def test_hash_cons():
+    table = {}
+    first = cse.hash_cons(parse('r10 = r10 * r11 + 2;').statements[0].expr, table)
+    second = cse.hash_cons(parse('r12 = r10 * r11 - 2;').statements[0].expr, table)
+
+    assert first.left_operand is second.left_operand
+
+
+def test_within_assignment():
+    program = parse('r10 = 3; r11 = 4; r13 = r10*r11 + r10*r11;')
+
+    actual = cse.eliminate_common_subexpressions(program)
+    assert _count_nodes(actual.statements[2].expr, arith_ast.NodeType.MulExpr) == 1
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_across_assignments():
+    program = parse('r10 = 3; r11 = 4; r12 = r10*r11 - 1; r13 = r10*r11 + 1;')
+
+    actual = cse.eliminate_common_subexpressions(program)
+    assert isinstance(actual.statements[2].expr.left_operand, arith_ast.TempExpr)
+    assert actual.statements[3].expr.left_operand == arith_ast.Var(actual.statements[2].expr.left_operand.temp)
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_reassigned_source_invalidates():
+    program = parse('r10 = 3; r12 = r10*r10; r10 = 5; r13 = r10*r10;')
+
+    actual = cse.eliminate_common_subexpressions(program)
+    assert _count_nodes(actual.statements[3].expr, arith_ast.NodeType.MulExpr) == 1
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_loop_body():
+    program = parse('r10 = 2; r11 = 5; loop 3 r12 = r10*r11 + r12 r13 = r10*r11 - r13 r10 = r10 + 1;')
+
+    actual = cse.eliminate_common_subexpressions(program)
+    loop = actual.statements[2]
+    assert isinstance(loop.assignments[1].expr.left_operand, arith_ast.Var)
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_random_programs():
+    rng = random.Random(27)
+    expression = functools.partial(random_expr, rng, constants=((1, 9),), operators='+-*')
+
+    for _ in range(100):
+        statements = []
+        for _ in range(rng.randint(1, 8)):
+            if rng.random() < 0.2:
+                body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(3)}' for _ in range(rng.randint(1, 3)))
+                statements.append(f'loop {rng.randint(1, 4)} {body};')
+            else:
+                statements.append(f'{rng.choice(REGISTERS)} = {expression(3)};')
+        program = parse('\n'.join(statements))
+
+        actual = cse.eliminate_common_subexpressions(program, registers=('r8', 'r9'))
+        assert evaluate(actual) == evaluate(program)
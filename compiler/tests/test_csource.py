@@ -0,0 +1,81 @@
+import random
+import shutil
+import signal
+import subprocess
+
+import pytest
+
+import compiler.compiler as compiler
+import compiler.csource as csource
+from compiler.tests.reference import REGISTERS, evaluate, parse, random_expr
+
+pytestmark = pytest.mark.skipif(shutil.which('gcc') is None, reason='compiles the generated C with gcc')
+
+
+def _run(source, tmp_path, check=True):
+    (tmp_path / 'program.c').write_text(source)
+    subprocess.run(['gcc', '-O2', '-std=c99', '-pedantic-errors', str(tmp_path / 'program.c'), '-o',
+                    str(tmp_path / 'program')], check=True, timeout=60)
+    output = subprocess.run([str(tmp_path / 'program')], capture_output=True, text=True, check=check, timeout=10)
+    return [int(line) for line in output.stdout.splitlines()] if check else output
+
+
+def test_generate_c():
+    source = compiler.generate_c(parse('r10 = r11 - 3; loop r10 r11 = r11 + r10 / 2;'))
+
+    assert source.startswith(csource._PRELUDE)
+    assert source[len(csource._PRELUDE):] == '''
+int main(void) {
+    uint64_t r10 = 0, r11 = 0;
+    const uint64_t t0 = r11 - UINT64_C(3);
+    r10 = t0;
+    print(r10);
+    const uint64_t t1 = r10;
+    for (uint64_t i0 = t1; i0 != 0; i0--) {
+        const uint64_t t2 = r10 / UINT64_C(2);
+        const uint64_t t3 = r11 + t2;
+        r11 = t3;
+    }
+    const uint64_t t4 = t1 != 0 ? r11 : t1;
+    print(t4);
+    return 0;
+}
+'''
+
+
+def test_literals_wrap_around():
+    assert csource.literal(5) == 'UINT64_C(5)'
+    assert csource.literal(-1) == 'UINT64_C(18446744073709551615)'
+
+
+@pytest.mark.parametrize('code', ['r10 = 7; loop 0 r10 = 1;', 'r11 = 5; loop r12 r11 = 9;', 'loop 3 ;'])
+def test_loops(code, tmp_path):
+    program = parse(code)
+    assert _run(compiler.generate_c(program), tmp_path) == evaluate(program)
+
+
+def test_large_values(tmp_path):
+    program = parse('r10 = 0 - 9223372036854775807 - 1; r11 = r10 - 1; r12 = 9223372036854775807 * 3;'
+                     'r13 = r12 / 2; r10 = 0 - r11;')
+    assert _run(compiler.generate_c(program), tmp_path) == evaluate(program)
+
+
+def test_division_by_zero_faults(tmp_path):
+    output = _run(compiler.compile_c_code('r10 = 1; r11 = r10 / r12; r12 = 2;'), tmp_path, check=False)
+    assert output.returncode == -signal.SIGFPE
+    assert output.stdout == '1\n'
+
+
+def test_random_programs(tmp_path):
+    rng = random.Random(44)
+    for _ in range(25):
+        statements = [f'{rng.choice(REGISTERS)} = {random_expr(rng, 3)};' for _ in range(rng.randint(1, 6))]
+        for _ in range(rng.randint(1, 2)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {random_expr(rng, 2)}' for _ in range(rng.randint(0, 3)))
+            statements.insert(rng.randint(0, len(statements)), f'loop {rng.randint(0, 40)} {body};')
+        program = parse('\n'.join(statements))
+
+        # Without partial evaluation, the loops and the temporaries of CSE remain
+        assert _run(compiler.generate_c(program), tmp_path) == evaluate(program)
+        assert _run(compiler.generate_c(compiler.optimize(program, partial_evaluation=False)), tmp_path) == \
+            evaluate(program)
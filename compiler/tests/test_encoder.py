@@ -0,0 +1,184 @@
+import functools
+import platform
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import compiler.asm as asm
+import compiler.compiler as compiler
+import compiler.encoder as encoder
+import compiler.parser as parser
+import compiler.peephole as peephole
+import compiler.runtime as runtime
+from compiler.tests.reference import REGISTERS, evaluate, random_expr
+
+_REGISTERS = ['rax', 'rcx', 'rdx', 'rbx', 'rsp', 'rbp', 'rsi', 'rdi',
+              'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14', 'r15']
+
+_runs_executables = pytest.mark.skipif(sys.platform != 'linux' or platform.machine() != 'x86_64',
+                                       reason='runs x86_64 Linux executables')
+
+
+def _encode(code):
+    return encoder.encode(asm.parse(code)).text.hex()
+
+
+@pytest.mark.parametrize('code, expected', [
+    ('mov rax, rbx', '4889d8'),
+    ('mov r10, rax', '4989c2'),
+    ('mov rax, 0', 'b800000000'),
+    ('mov r13, 0', '41bd00000000'),
+    ('mov rax, -1', '48c7c0ffffffff'),
+    ('mov rdx, 12297829382473034411', '48baabaaaaaaaaaaaaaa'),
+    ('add rax, rbx', '4801d8'),
+    ('sub rax, 1', '4883e801'),
+    ('add rax, 1000', '4805e8030000'),
+    ('add r10, 1000', '4981c2e8030000'),
+    ('imul rax, rbx', '480fafc3'),
+    ('imul rax, rax, 100', '486bc064'),
+    ('lea rax, [rax+rax*4]', '488d0480'),
+    ('lea rdx, [rsp+32]', '488d542420'),
+    ('shl rax, 1', '48d1e0'),
+    ('shr rax, 3', '48c1e803'),
+    ('mul rdx', '48f7e2'),
+    ('div r12', '49f7f4'),
+    ('neg rax', '48f7d8'),
+    ('dec rcx', '48ffc9'),
+    ('push r10', '4152'),
+    ('pop rax', '58'),
+    ('mov byte [rsi], dl', '8816'),
+    ('mov al, byte [rsi]', '8a06'),
+    ('mov byte [rsi], 45', 'c6062d'),
+    ('mov rcx, qword [rdi]', '488b0f'),
+    ('mov qword [rdi], 0', '48c70700000000'),
+    ('mov qword [r13], rcx', '49894d00'),
+    ('add qword [rdx+16], rax', '48014210'),
+    ('add qword [rdi+8], 10', '488347080a'),
+    ('sub qword [r13], 1000', '49816d00e8030000'),
+    ('syscall', '0f05'),
+    ('ret', 'c3'),
+])
+def test_encode(code, expected):
+    assert _encode(code) == expected
+
+
+def test_jumps():
+    assert _encode('start:\nloop start') == 'e2fe'
+    assert _encode('jmp end\nend:') == 'e900000000'
+    assert _encode('start:\nnop\njnz start') == '900f85f9ffffff'
+    assert _encode('call routine\nret\nroutine:\nret') == 'e801000000c3c3'
+
+    far_loop = encoder.encode(asm.parse('start:\n' + 'nop\n' * 200 + 'loop start'))
+    assert far_loop.text[200:].hex() == 'e202eb05e9' + (-209).to_bytes(4, 'little', signed=True).hex()
+
+
+def test_symbols():
+    code = encoder.encode(asm.parse('''mov rdi, buffer
+    start:
+    mov rsi, start
+    section .bss
+    length: resq 1
+    buffer: resb 10'''))
+
+    assert code.bss_labels == {'length': 0, 'buffer': 8}
+    assert code.bss_size == 18
+    linked = code.link(0x1000, 0x2000)
+    assert linked[2:10] == (0x2008).to_bytes(8, 'little')
+    assert linked[12:20] == (0x100a).to_bytes(8, 'little')
+
+
+@pytest.mark.parametrize('code', ['mov rax, [rbx*2]', 'add rax, 4294967295', 'call printf\nextern printf',
+                                  'jmp nowhere', 'section .data\nformat: db "%lld", 10', 'start:\nstart:',
+                                  'cpuid'])
+def test_unsupported(code):
+    with pytest.raises(encoder.EncodingError):
+        encoder.encode(asm.parse(code))
+
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('objcopy') is None, reason='requires GNU binutils')
+def test_matches_gnu_as(tmp_path):
+    lines = []
+    for register in _REGISTERS:
+        for other in _REGISTERS:
+            lines += [f'{opcode} {register}, {other}' for opcode in ('mov', 'add', 'sub', 'and', 'or', 'xor', 'cmp',
+                                                                     'test', 'imul')]
+            lines += [f'imul {register}, {other}, {multiplier}' for multiplier in (3, -5, 1000)]
+            lines += [f'lea {register}, [{other}{displacement}]' for displacement in ('', '+8', '-8', '+200')]
+            lines += [f'mov {register}, qword [{other}+16]', f'mov qword [{other}], {register}',
+                      f'add qword [{other}+16], {register}']
+            if other != 'rsp':
+                lines += [f'lea {register}, [{register}+{other}*{scale}]' for scale in (1, 2, 4, 8)]
+        # GNU as doesn't pick the shortest encoding of small immediates, these are the ones both pick the same way
+        lines += [f'mov {register}, {value}' for value in (-1, -2 ** 31, 2 ** 32, 2 ** 64 - 2, 2 ** 63)]
+        lines += [f'{opcode} {register}, {value}' for opcode in ('add', 'sub', 'and', 'or', 'xor', 'cmp')
+                  for value in (1, -1, 127, 128, -129, 2 ** 31 - 1, -2 ** 31)]
+        lines += [f'{opcode} {register}' for opcode in ('neg', 'not', 'mul', 'div', 'inc', 'dec', 'push', 'pop')]
+        lines += [f'{opcode} {register}, {count}' for opcode in ('shl', 'shr', 'sar') for count in (1, 5, 63)]
+        lines += [f'mov {byte_register}, byte [{register}]' for byte_register in asm.BYTE_REGISTERS]
+        lines += [f'mov byte [{register}+1], {byte_register}' for byte_register in asm.BYTE_REGISTERS]
+        lines += [f'mov byte [{register}], 200', f'mov qword [{register}+16], -1', f'add qword [{register}], 1',
+                  f'sub qword [{register}+8], 1000']
+    lines += ['syscall', 'ret', 'rdtsc', 'nop']
+
+    source = '\n'.join(lines)
+    gnu_source = source.replace('qword [', 'qword ptr [').replace('byte [', 'byte ptr [')
+    (tmp_path / 'code.s').write_text(f'.intel_syntax noprefix\n{gnu_source}\n')
+    subprocess.run(['as', '-o', tmp_path / 'code.o', tmp_path / 'code.s'], check=True)
+    subprocess.run(['objcopy', '-O', 'binary', '-j', '.text', tmp_path / 'code.o', tmp_path / 'code.bin'], check=True)
+
+    assert encoder.encode(asm.parse(source)).text == (tmp_path / 'code.bin').read_bytes()
+
+
+def _run_executable(code, tmp_path):
+    path = tmp_path / 'program'
+    compiler.compile(code, str(path), executable=True)
+    output = subprocess.run([str(path)], capture_output=True, text=True, check=True, timeout=10)
+    return [int(line) for line in output.stdout.splitlines()]
+
+
+@_runs_executables
+def test_executable(tmp_path):
+    code = '''r11 = 32;
+    r10 = 0 - r11 / r11;
+    loop r11 r10 = r10 * 2;
+    r12 = 0 - 9223372036854775807 - 1;
+    r13 = r10 * 3 / 7 + r12;'''
+    expected = evaluate(parser.nt_statements(code).match)
+
+    assert _run_executable(code, tmp_path) == expected
+
+
+@_runs_executables
+def test_executable_flushes_large_outputs(tmp_path):
+    # Prints more than fits in the output buffer
+    code = 'loop 1000 r10 = r10 + 1;' + 'r10 = r10 * 1000003;' * 400
+
+    actual = _run_executable(code, tmp_path)
+    assert actual == evaluate(parser.nt_statements(code).match)
+    assert len(actual) * 20 > runtime.OUTPUT_BUFFER_SIZE
+
+
+@_runs_executables
+def test_random_executables(tmp_path):
+    rng = random.Random(38)
+    expression = functools.partial(random_expr, rng, constants=((-9, 2 ** 40), (1, 9)))
+
+    for _ in range(20):
+        statements = [f'{rng.choice(REGISTERS)} = {expression(3)};' for _ in range(rng.randint(1, 8))]
+        for _ in range(rng.randint(1, 2)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(1, 3)))
+            statements.insert(rng.randint(0, len(statements)), f'loop {rng.randint(0, 40)} {body};')
+        code = '\n'.join(statements)
+        program = parser.nt_statements(code).match
+
+        assert _run_executable(code, tmp_path) == evaluate(program)
+
+
+def test_static_runtime_survives_peephole():
+    assembly = asm.Assembly(runtime=runtime.STATIC)
+    runtime.STATIC.emit_routines(assembly)
+
+    assert asm.serialize(peephole.optimize(assembly.instructions)) == asm.serialize(assembly.instructions)
@@ -0,0 +1,80 @@
+import functools
+import platform
+import random
+import sys
+
+import pytest
+
+if sys.platform != 'linux' or platform.machine() != 'x86_64':
+    pytest.skip('runs x86_64 machine code', allow_module_level=True)
+
+import compiler.jit as jit
+from compiler.tests.reference import REGISTERS, evaluate, parse, random_expr
+
+
+def test_run():
+    code = '''r11 = 32;
+    r10 = 0 - r11 / r11;
+    loop r11 r10 = r10 * 2;
+    r12 = 0 - 9223372036854775807 - 1;
+    r13 = r10 * 3 / 7 + r12;'''
+
+    assert jit.run(code) == evaluate(parse(code))
+
+
+def test_run_again():
+    with jit.compile_code('r10 = r10 + 5; r11 = r10 * r10;') as program:
+        # Registers start from 0 on every run
+        assert program.run() == [5, 25]
+        assert program.run() == [5, 25]
+
+    with pytest.raises(ValueError):
+        program.run()
+
+
+def test_division_by_zero():
+    with pytest.raises(ZeroDivisionError):
+        jit.run('r10 = r11 / r12;')
+
+    # The stack and the callee-saved registers are restored however deep the fault is (here, in the 4999th iteration,
+    # with values pushed), so the program and the interpreter can go on running
+    code = 'r13 = 5000; loop r13 r10 = r10 + 1 r12 = r10 - 4999 r11 = r12 * 3 - r11 * 7 + r13 / r12;'
+    with jit.compile_code(code) as program:
+        for _ in range(3):
+            with pytest.raises(ZeroDivisionError):
+                program.run()
+    assert jit.run('r10 = 7; r11 = r10 / 2;') == [7, 3]
+
+
+def test_many_values():
+    code = 'loop 3 r10 = r10 + 1;' + 'r10 = r10 + 1;' * (jit.INITIAL_CAPACITY * 3)
+    assert jit.run(code) == list(range(3, jit.INITIAL_CAPACITY * 3 + 4))
+
+
+def test_random_programs():
+    rng = random.Random(39)
+    expression = functools.partial(random_expr, rng, constants=((-9, 2 ** 40), (1, 9)))
+
+    for _ in range(200):
+        statements = [f'{rng.choice(REGISTERS)} = {expression(3)};' for _ in range(rng.randint(1, 8))]
+        for _ in range(rng.randint(1, 2)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(0, 3)))
+            statements.insert(rng.randint(0, len(statements)), f'loop {rng.randint(0, 40)} {body};')
+        # Loops counted by a register, set to a small count right before them
+        counter = rng.choice(REGISTERS)
+        body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(0, 2)))
+        statements.insert(rng.randint(0, len(statements)), f'{counter} = {rng.randint(0, 40)}; loop {counter} {body};')
+        program = parse('\n'.join(statements))
+
+        # Without partial evaluation, which would leave nothing but constants to run
+        with jit.compile_program(program, partial_evaluation=False) as compiled:
+            assert compiled.run() == evaluate(program)
+
+
+def test_stores_before_an_empty_loop():
+    for code in ('loop 5000 r13 = r13 + 1 r10 = 7 r11 = r13; loop 3 ; r12 = r10;',
+                 'loop 2 r10 = 5 r11 = 1; loop 3 ; r12 = r10;'):
+        program = parse(code)
+        assert jit.run(code) == evaluate(program)
+        with jit.compile_program(program, partial_evaluation=False) as compiled:
+            assert compiled.run() == evaluate(program)
@@ -0,0 +1,94 @@
+import compiler.liveness as liveness
+import compiler.ast as arith_ast
+from compiler.tests.reference import evaluate, parse
+
+
+def _loop_targets(program, statement_index):
+    return [assignment.var.name for assignment in program.statements[statement_index].assignments]
+
+
+def test_dead_store_in_loop_body():
+    program = parse('''r11 = 3;
+    loop r11 r12 = r10 * 7 r12 = r11 + 1 r10 = r10 + r12;
+    r13 = r12;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 1) == ['r12', 'r10']
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_store_read_through_back_edge_is_kept():
+    program = parse('''r10 = 1;
+    loop 5 r11 = r10 + r12 r12 = r11 * 2 r10 = r10 + r12;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 1) == ['r11', 'r12', 'r10']
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_store_read_after_loop_is_kept():
+    program = parse('''loop 4 r11 = r10 + 1 r10 = r10 + 2;
+    r12 = r11;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 0) == ['r11', 'r10']
+
+
+def test_last_loop_assignment_is_kept():
+    program = parse('loop 4 r10 = r10 + 1 r11 = 5;')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 0) == ['r11']
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_invariant_loop_runs_once():
+    program = parse('''r12 = 3;
+    loop 1000 r10 = r12 * 2 r11 = r10 + 1;
+    r13 = r10 + r11;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert actual.statements[1].counter.value == 1
+    assert evaluate(actual) == evaluate(program)
+
+    program = parse('loop r12 r10 = r12 * 2;')
+    actual = liveness.eliminate_dead_stores(program)
+    assert isinstance(actual.statements[0].counter, arith_ast.Var)
+
+
+def test_unused_self_update_is_dropped():
+    program = parse('''loop 5 r11 = r11 + 1 r12 = r12 * 3 r10 = r12 + 2;
+    r13 = r10;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 0) == ['r12', 'r10']
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_divisions_that_may_fault_are_kept():
+    program = parse('loop 3 r10 = r11 / 0 r13 = r13 / r12 r11 = r10 / 5 r12 = 1; r13 = 7;')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 0) == ['r10', 'r13', 'r11', 'r12']
+    assert liveness.may_fault(parse('r10 = 1 + r11 / r12;').statements[0].expr)
+    assert not liveness.may_fault(parse('r10 = r11 / 3 - r12;').statements[0].expr)
+
+
+def test_store_before_an_empty_loop_is_kept():
+    program = parse('''loop 2 r10 = 5 r11 = 1;
+    loop 3 ;
+    r12 = r10;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert _loop_targets(actual, 0) == ['r10', 'r11']
+    assert evaluate(actual) == evaluate(program) == [1, 3, 5]
+
+
+def test_store_before_a_loop_that_may_not_run_is_kept():
+    program = parse('''r10 = 5;
+    loop r11 r10 = 7;
+    r12 = r10;''')
+
+    actual = liveness.eliminate_dead_stores(program)
+    assert actual.statements[0].var.name == 'r10'
+    assert evaluate(actual) == evaluate(program) == [5, 0, 5]
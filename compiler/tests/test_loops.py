@@ -0,0 +1,93 @@
+import functools
+import random
+
+import pytest
+
+import compiler.asm as asm
+import compiler.compiler as compiler
+from compiler.tests import x86
+from compiler.tests.reference import IterationLimitExceeded, REGISTERS, evaluate, parse, random_expr
+
+
+def _opcodes(instructions):
+    return [instruction.opcode for instruction in instructions if isinstance(instruction, asm.Instruction)]
+
+
+def test_labels_are_unique():
+    program = parse('loop r10 r11 = r11 + 1; loop r11 r12 = r12 + 2; loop 100 r13 = r13 + r12;')
+
+    actual = compiler.generate(program)
+    labels = [instruction.name for instruction in actual if isinstance(instruction, asm.Label)]
+    assert len(labels) == len(set(labels))
+    assert 'loop' not in _opcodes(actual)
+    assert x86.run(actual) == evaluate(program)
+
+
+@pytest.mark.parametrize('code', ['loop 0 r10 = 5;', 'loop r11 r10 = 5;', 'r11 = 0 - 1; r11 = r11 + 1; loop r11 r10 = 5;'])
+def test_zero_count_skips_the_body(code):
+    program = parse(code)
+
+    assert x86.run(compiler.generate(program))[-1] == 0
+    assert evaluate(program)[-1] == 0
+
+
+def test_small_constant_counts_are_unrolled():
+    actual = compiler.generate(parse('loop 3 r10 = r10 + 1 r11 = r11 + r10;'))
+
+    assert not any(opcode.startswith('j') for opcode in _opcodes(actual))
+    assert x86.run(actual) == [6]
+
+
+@pytest.mark.parametrize('count', [17, 1000, 2 ** 64 - 1])
+def test_large_constant_counts(count):
+    program = parse(f'loop {count} r10 = r10 + 1;')
+
+    actual = compiler.generate(program)
+    assert 'dec' in _opcodes(actual)
+    if count < 10 ** 4:
+        assert x86.run(actual) == evaluate(program)
+
+
+@pytest.mark.parametrize('factor', [1, 2, 4, 8])
+def test_unroll_factors(factor):
+    for count in range(10):
+        for code in (f'loop {count}', f'r11 = {count}; loop r11'):
+            program = parse(f'{code} r10 = r10 * 3 + 1 r12 = r12 + r10;')
+
+            actual = compiler.generate(program, unroll_factor=factor)
+            assert x86.run(actual) == evaluate(program)
+
+
+def test_unroll_factor_must_be_a_power_of_2():
+    with pytest.raises(ValueError):
+        compiler.generate(parse('loop r11 r10 = r10 + 1;'), unroll_factor=3)
+
+
+def test_large_bodies_are_unrolled_less():
+    body = ' '.join(f'r10 = r10 + {value}' for value in range(20))
+    program = parse(f'r11 = 7; loop r11 {body};')
+
+    actual = compiler.generate(program, unroll_factor=8)
+    assert _opcodes(actual).count('add') < 20 * 4
+    assert x86.run(actual) == evaluate(program)
+
+
+def test_random_programs():
+    rng = random.Random(40)
+    expression = functools.partial(random_expr, rng, constants=((0, 9),), operators='+-*')
+
+    for _ in range(200):
+        statements = [f'{rng.choice(REGISTERS)} = {expression(2)};' for _ in range(rng.randint(0, 4))]
+        for _ in range(rng.randint(1, 3)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(0, 3)))
+            counter = rng.choice([str(rng.randint(0, 40)), rng.choice(REGISTERS)])
+            statements.insert(rng.randint(0, len(statements)), f'loop {counter} {body};')
+        program = parse('\n'.join(statements))
+        try:
+            expected = evaluate(program)
+        except IterationLimitExceeded:
+            # Register counters can be huge
+            continue
+
+        optimized = compiler.optimize(program, partial_evaluation=False)
+        assert x86.run(compiler.generate(optimized, unroll_factor=rng.choice([1, 2, 4]))) == expected
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+import compiler.parallel as parallel
+import compiler.parser as parser
+import compiler.compiler as compiler
+
+
+def _random_code(count, seed):
+    rng = random.Random(seed)
+    statements = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            statements.append(f'loop {i % 5 + 1}\n  r10 = r10 + {i}  # no ; here\n  r11 = r11 * 2;\n')
+        else:
+            statements.append(f'r1{i % 4} = r10 * {i} - r12 / 3;  # ; in a comment\n\n')
+    return ''.join(statements)
+
+
+def test_statement_ends():
+    code = 'r10 = 1;  # a; b\n r11 = 2 ;r12 = 3;'
+    assert parallel.statement_ends(code) == [code.index('r11'), code.index('r12'), len(code)]
+
+
+def test_split_points():
+    code = _random_code(50, 0)
+    points = parallel.split_points(code, 8)
+
+    assert points[0] == 0 and points[-1] == len(code)
+    assert points == sorted(set(points))
+    ends = set(parallel.statement_ends(code))
+    assert all(point in ends for point in points[1:-1])
+    assert parallel.split_points('', 4) == [0, 0]
+    assert parallel.split_points('r10 = 1;', 4) == [0, 8]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_parse_matches_serial(seed):
+    code = _random_code(40, seed)
+    expected = parser.nt_statements(code)
+    actual = parallel.parse(code, jobs=2, chunks_per_job=5)
+
+    assert actual.next_token_index == expected.next_token_index == len(code)
+    assert repr(actual.match) == repr(expected.match)
+
+
+@pytest.mark.parametrize('error', ['r10 = ;', 'r14 = 1;', 'loop ;'])
+def test_parse_error_position(error):
+    code = _random_code(20, 0)
+    code = code[:parallel.statement_ends(code)[12]] + error + code[parallel.statement_ends(code)[12]:]
+    expected = parser.nt_statements(code)
+    actual = parallel.parse(code, jobs=2, chunks_per_job=5)
+
+    assert actual.next_token_index == expected.next_token_index < len(code)
+    assert repr(actual.match) == repr(expected.match)
+
+
+def test_compile_large_input():
+    code = _random_code(1500, 1)
+    assert len(code) >= parallel.PARALLEL_THRESHOLD
+
+    assert compiler.compile_code(code, jobs=2) == compiler.compile_code(code, jobs=1)
@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 import compiler.parser as parser
 import compiler.ast as arith_ast
 
@@ -60,3 +64,30 @@ def test_loop():
 
     actual = subject(input).match
     assert actual.type == arith_ast.NodeType.LoopAssignment
+
+
+def _run_python(*args):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return subprocess.run([sys.executable, *args], cwd=root, capture_output=True, text=True, check=True)
+
+
+def test_grammar_built_lazily():
+    output = _run_python('-c', 'import compiler.parser as parser; print(parser._grammar is None); '
+                               'parser.nt_statements; print(parser._grammar is None)')
+    assert output.stdout.split() == ['True', 'False']
+
+
+def test_grammar_cached():
+    assert parser.nt_statements is parser.nt_statements
+    assert parser.grammar() is parser.grammar()
+
+
+def test_startup_budget():
+    # `python -X importtime` reports the cumulative import time of every module, in microseconds
+    output = _run_python('-X', 'importtime', '-c', 'import compiler.compiler')
+    cumulative = {}
+    for line in output.stderr.splitlines():
+        _, cumulative_us, name = line.split('|')
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+    assert cumulative['compiler.compiler'] < 200_000
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+import compiler.parser as parser
+import compiler.parsergen as parsergen
+import compiler.generated_parser as generated_parser
+
+
+def test_generated_parser_is_up_to_date():
+    with open(parsergen.GRAMMAR_PATH, 'rt') as grammar_file:
+        expected = parsergen.generate(grammar_file.read())
+    with open(parsergen.OUTPUT_PATH, 'rt') as generated_file:
+        actual = generated_file.read()
+
+    assert actual == expected
+
+
+def test_parse_bnf():
+    actual = parsergen.parse_bnf('''A ::= B ('x' | C)* 'y'?
+    B ::= 'b'+
+    C ::= 'c' ''')
+
+    assert actual['A'] == ('seq', [('ref', 'B'), ('star', ('alt', [('lit', 'x'), ('ref', 'C')])),
+                                   ('opt', ('lit', 'y'))])
+    assert actual['B'] == ('plus', ('lit', 'b'))
+    assert actual['C'] == ('lit', 'c')
+
+    with pytest.raises(parsergen.GrammarError):
+        parsergen.parse_bnf('A ::= (B')
+
+
+def _random_source(rng):
+    # Mostly valid statements, mixed with the kinds of mistakes both parsers have to stop at in the same place
+    pieces = ['r10', 'r11', 'r12', 'r13', 'r14', 'r1', 'loop', '=', ';', '+', '-', '*', '/', '0', '7', '42',
+              '007', ' ', '\n', '\t', '# comment ; r10 = 1\n', '#', 'x']
+
+    def expr():
+        operands = [rng.choice(['r10', 'r11', 'r12', 'r13', '5', '-3', '+ 8', '12345678901234567890'])
+                    for _ in range(rng.randint(1, 5))]
+        spaces = [rng.choice(['', ' ', '\n', ' # c\n']) for _ in range(len(operands))]
+        code = operands[0]
+        for operand, space in zip(operands[1:], spaces):
+            code += f'{space}{rng.choice("+-*/")}{space}{operand}'
+        return code
+
+    statements = []
+    for _ in range(rng.randint(0, 6)):
+        if rng.random() < 0.2:
+            assignments = ' '.join(f'{rng.choice(["r10", "r11"])} = {expr()}' for _ in range(rng.randint(0, 3)))
+            statements.append(f'loop {rng.choice(["r12", "3", "-1"])} {assignments};')
+        else:
+            statements.append(f'{rng.choice(["r10", "r11", "r12", "r13"])}={expr()};')
+        if rng.random() < 0.1:
+            statements.append(''.join(rng.choice(pieces) for _ in range(rng.randint(1, 4))))
+
+    return rng.choice(['', ' ', '# header\n']).join(statements)
+
+
+def test_agrees_with_combinators():
+    rng = random.Random(31)
+    for _ in range(500):
+        source = _random_source(rng)
+
+        expected = parser.nt_statements(source)
+        actual = generated_parser.parse_statements(source)
+        assert actual.next_token_index == expected.next_token_index, source
+        assert repr(actual.match) == repr(expected.match), source
@@ -0,0 +1,101 @@
+import functools
+import random
+
+import compiler.asm as asm
+import compiler.ast as arith_ast
+import compiler.compiler as compiler
+import compiler.partial as partial
+from compiler.tests import x86
+from compiler.tests.reference import IterationLimitExceeded, REGISTERS, evaluate, parse, random_expr
+
+
+def _opcodes(program):
+    return [instruction.opcode for instruction in compiler.generate(compiler.optimize(program))
+            if isinstance(instruction, asm.Instruction)]
+
+
+def test_known_program_prints_constants():
+    program = parse('''r11 = 32;
+    r10 = 0 - r11 / r11;
+    loop r11 r10 = r10 * 2;
+    r12 = r10 * 3 / 7 + r11;''')
+
+    actual = partial.partially_evaluate(program)
+    assert [str(statement) for statement in actual.statements] == \
+           ['r11 <- 32', 'r10 <- -1', 'loop 1', 'r12 <- 2635249151546378564']
+    assert evaluate(actual) == evaluate(program)
+    opcodes = _opcodes(program)
+    assert not {'add', 'sub', 'mul', 'div', 'imul', 'shl', 'dec'} & set(opcodes)
+    assert not any(opcode.startswith('j') for opcode in opcodes)
+
+
+def test_loop_over_budget_is_left_to_run():
+    program = parse('''r12 = 7;
+    loop 5000 r10 = r10 * 3 + r12;
+    r11 = r12 * 2;
+    r13 = r10 + r11;''')
+
+    actual = partial.partially_evaluate(program)
+    loop = actual.statements[1]
+    assert isinstance(loop.counter, arith_ast.Num) and loop.counter.value == 5000
+    # The body only reads r12 as it was before the loop
+    assert str(loop.assignments[0].expr) == 'r10 * 3 + 7'
+    assert str(actual.statements[2].expr) == '14'
+    assert str(actual.statements[3].expr) == 'r10 + 14'
+    assert evaluate(actual) == evaluate(program)
+
+
+def test_iteration_budget():
+    program = parse('loop 10 r10 = r10 + 1;')
+
+    assert partial.partially_evaluate(program, iteration_budget=10).statements[0].counter.value == 1
+    assert partial.partially_evaluate(program, iteration_budget=9).statements[0].counter.value == 10
+
+
+def test_loop_reaching_a_fixpoint_is_evaluated():
+    program = parse('loop 1000000000 r11 = r10 + 5 r10 = r11 * 0; r12 = r11;')
+
+    actual = partial.partially_evaluate(program)
+    assert str(actual.statements[0]) == 'loop 1'
+    assert [str(assignment) for assignment in actual.statements[0].assignments] == ['r11 <- 5', 'r10 <- 0']
+    assert str(actual.statements[1].expr) == '5'
+
+
+def test_zero_count_loop():
+    program = parse('r10 = 3; loop r11 r10 = 7; r12 = r10;')
+
+    actual = partial.partially_evaluate(program)
+    assert actual.statements[1].assignments == []
+    assert str(actual.statements[2].expr) == '3'
+    assert evaluate(actual) == evaluate(program) == [3, 0, 3]
+
+
+def test_division_by_zero_is_left_to_run():
+    program = parse('r11 = 5 / r10; r12 = 2 + 3;')
+
+    actual = partial.partially_evaluate(program)
+    assert str(actual.statements[0].expr) == '5 / 0'
+    assert str(actual.statements[1].expr) == '5'
+
+
+def test_random_programs():
+    rng = random.Random(42)
+    expression = functools.partial(random_expr, rng, constants=((0, 9), (1, 2 ** 40)))
+
+    for _ in range(200):
+        statements = [f'{rng.choice(REGISTERS)} = {expression(3)};' for _ in range(rng.randint(0, 5))]
+        for _ in range(rng.randint(1, 3)):
+            body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(0, 3)))
+            counter = rng.choice([str(rng.randint(0, 12)), rng.choice(REGISTERS)])
+            statements.insert(rng.randint(0, len(statements)), f'loop {counter} {body};')
+        program = parse('\n'.join(statements))
+        try:
+            expected = evaluate(program)
+        except IterationLimitExceeded:
+            continue
+
+        # A small budget leaves some loops (and what depends on them) to run
+        evaluated = partial.partially_evaluate(program, iteration_budget=rng.randint(0, 8))
+        assert evaluate(evaluated) == expected
+        optimized = compiler.optimize(evaluated, partial_evaluation=False)
+        assert x86.run(compiler.generate(optimized)) == expected
@@ -0,0 +1,121 @@
+import functools
+import random
+
+import compiler.asm as asm
+import compiler.compiler as compiler
+import compiler.peephole as peephole
+from compiler.tests import x86
+from compiler.tests.reference import REGISTERS, evaluate, parse, random_expr
+
+
+def _optimize(code):
+    return [str(instruction) for instruction in peephole.optimize(asm.parse(code))]
+
+
+def _instruction_count(code):
+    return len([instruction for instruction in code if isinstance(instruction, asm.Instruction)])
+
+
+def test_parse_and_serialize():
+    code = asm.parse('''global main
+main:
+; comment
+mov rax, 5 ; inline
+format: db "%lld, %lld", 10
+pop rbx''')
+
+    assert isinstance(code[0], asm.Directive)
+    assert isinstance(code[1], asm.Label)
+    assert isinstance(code[2], asm.Comment)
+    assert code[3] == asm.Instruction('mov', ('rax', '5'))
+    assert code[3].comment == 'inline'
+    assert isinstance(code[4], asm.Directive)
+    assert asm.serialize(code).splitlines()[3] == 'mov rax, 5 ; inline'
+
+
+def test_push_load_pop():
+    actual = _optimize('''push rax
+; comment
+mov rax, r10
+pop rbx
+add rax, rbx
+mov rbx, 0''')
+
+    assert actual == ['mov rbx, rax', 'mov rax, r10', '; comment', 'add rax, rbx', 'mov rbx, 0']
+
+
+def test_leaf_operands_fold():
+    actual = _optimize('''mov rax, 7
+push rax
+mov rax, r10
+pop rbx
+add rax, rbx
+mov r12, rax
+mov rax, r12
+pop rbx''')
+
+    assert actual == ['mov rax, r10', 'add rax, 7', 'mov r12, rax', 'pop rbx']
+
+
+def test_live_operand_is_not_folded():
+    actual = _optimize('''mov rbx, r11
+add rax, rbx
+mov r10, rbx''')
+
+    assert actual == ['mov rbx, r11', 'add rax, rbx', 'mov r10, rbx']
+
+
+def test_labels_are_barriers():
+    actual = _optimize('''push rax
+loop_0:
+pop rax''')
+
+    assert actual == ['push rax', 'loop_0:', 'pop rax']
+
+
+def test_custom_rules():
+    def drop_nops(window, code, index):
+        return [] if window[0].opcode == 'nop' else None
+
+    actual = peephole.optimize(asm.parse('nop\nmov rax, 1\nnop'), rules=[(1, drop_nops)])
+    assert [str(instruction) for instruction in actual] == ['mov rax, 1']
+
+
+def test_programs_are_unaffected():
+    rng = random.Random(28)
+    expression = functools.partial(random_expr, rng, constants=((1, 9),), operators='+-*')
+
+    original_count = 0
+    optimized_count = 0
+    for _ in range(50):
+        statements = []
+        # Every loop is currently labeled loop_0, so a program can only have a single loop
+        has_loop = False
+        for _ in range(rng.randint(1, 8)):
+            if not has_loop and rng.random() < 0.2:
+                has_loop = True
+                body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(3)}' for _ in range(rng.randint(1, 3)))
+                statements.append(f'loop {rng.randint(1, 4)} {body};')
+            else:
+                statements.append(f'{rng.choice(REGISTERS)} = {expression(3)};')
+        program = parse('\n'.join(statements))
+
+        code = compiler.generate(program, comments=True)
+        optimized = peephole.optimize(code)
+        assert x86.run(optimized) == x86.run(code) == evaluate(program)
+        original_count += _instruction_count(code)
+        optimized_count += _instruction_count(optimized)
+
+    assert optimized_count < original_count * 0.9
+
+
+def test_call_arguments_are_live():
+    # dprintf reads its arguments, while print_rax only reads rax
+    code = [asm.Instruction('mov', ('rsi', 'profile_format')), asm.Instruction('call', ('dprintf',))]
+    assert not peephole._is_dead_after('rsi', code, 0)
+    assert {'rdi', 'rsi', 'rdx', 'rcx', 'r8', 'r9'} <= code[1].reads()
+    assert {'r10', 'r11'} <= code[1].writes()
+
+    code = [asm.Instruction('mov', ('rsi', 'rax')), asm.Instruction('call', ('print_rax',))]
+    assert peephole._is_dead_after('rsi', code, 0)
+    assert not {'r10', 'r11', 'r12', 'r13'} & code[1].writes()
@@ -0,0 +1,98 @@
+import platform
+import random
+import subprocess
+import sys
+
+import pytest
+
+import compiler.asm as asm
+import compiler.compiler as compiler
+import compiler.parser as parser
+import compiler.profile as profiling
+from compiler.tests.reference import REGISTERS, evaluate, random_expr
+
+_runs_machine_code = pytest.mark.skipif(sys.platform != 'linux' or platform.machine() != 'x86_64',
+                                        reason='runs x86_64 machine code')
+
+# The first loop runs for longer than partial evaluation would evaluate, leaving the rest to run as well
+_CODE = '''r11 = 5000;  # line 1
+loop r11
+  r10 = r10 * 3 + 1;
+# line 4
+loop 10 r12 = r12 + r10; r13 = r12 / 7;
+'''
+
+
+def test_statement_lines():
+    assert profiling.statement_lines(_CODE) == [1, 2, 5, 5]
+    assert profiling.statement_lines('  # comment;\n\n r10 = 1;') == [3]
+    assert profiling.statement_lines('') == []
+
+
+def test_profile_is_optional():
+    opcodes = {instruction.opcode for instruction in compiler.compile_instructions(_CODE)
+               if isinstance(instruction, asm.Instruction)}
+    assert 'rdtsc' not in opcodes
+
+    profiled = asm.serialize(compiler.compile_instructions(_CODE, profile=True))
+    assert profiled.count('rdtsc') == 8
+    assert 'call dprintf' in profiled
+
+
+@_runs_machine_code
+def test_jit_profile():
+    import compiler.jit as jit
+
+    with jit.compile_code(_CODE, profile=True) as program:
+        assert program.run() == evaluate(parser.nt_statements(_CODE).match)
+        first = program.profile()
+        assert [(line, iterations) for line, _, iterations in first] == [(1, 0), (2, 5000), (5, 10), (5, 0)]
+        assert all(cycles > 0 for _, cycles, _ in first)
+
+        # Counters add up over runs
+        program.run()
+        assert [iterations for _, _, iterations in program.profile()] == [0, 10000, 20, 0]
+
+    with jit.compile_code(_CODE) as program:
+        with pytest.raises(ValueError):
+            program.profile()
+
+
+@_runs_machine_code
+def test_executable_profile(tmp_path):
+    path = tmp_path / 'program'
+    compiler.compile(_CODE, str(path), executable=True, profile=True)
+    output = subprocess.run([str(path)], capture_output=True, text=True, check=True, timeout=10)
+
+    assert [int(line) for line in output.stdout.splitlines()] == evaluate(parser.nt_statements(_CODE).match)
+    profile = [[int(value) for value in line.split()] for line in output.stderr.splitlines()]
+    assert [(line, iterations) for line, _, iterations in profile] == [(1, 0), (2, 5000), (5, 10), (5, 0)]
+
+
+@_runs_machine_code
+def test_profiled_programs_print_the_same():
+    import compiler.jit as jit
+
+    rng = random.Random(41)
+    for _ in range(50):
+        statements = [f'{rng.choice(REGISTERS)} = {random_expr(rng, 3)};' for _ in range(rng.randint(1, 6))]
+        body = ' '.join(f'{rng.choice(REGISTERS)} = {random_expr(rng, 2)}' for _ in range(rng.randint(0, 3)))
+        count = rng.randint(0, 40)
+        statements.insert(rng.randint(0, len(statements)), f'loop {count} {body};')
+        code = '\n'.join(statements)
+
+        with jit.compile_code(code, profile=True) as program:
+            assert program.run() == evaluate(parser.nt_statements(code).match)
+            # Loops whose body doesn't depend on earlier iterations run once
+            assert max(iterations for _, _, iterations in program.profile()) in (0, 1, count)
+
+
+@_runs_machine_code
+def test_profiled_loops_run_as_written():
+    import compiler.jit as jit
+
+    # Partial evaluation would fold the loop into its final value
+    code = 'r10 = 1;\nloop 32 r10 = r10 * 2;'
+    with jit.compile_code(code, profile=True) as program:
+        assert program.run() == [1, 2 ** 32]
+        assert [(line, iterations) for line, _, iterations in program.profile()] == [(1, 0), (2, 32)]
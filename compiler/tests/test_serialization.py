@@ -0,0 +1,98 @@
+import functools
+import random
+
+import pytest
+
+import compiler.ast as arith_ast
+import compiler.compiler as compiler
+import compiler.serialization as serialization
+from compiler.tests.reference import REGISTERS, evaluate, parse, random_expr
+
+
+def _round_trip(program):
+    data = serialization.encode(program)
+    decoded = serialization.decode(data)
+    assert [repr(statement) for statement in decoded.statements] == \
+           [repr(statement) for statement in program.statements]
+    assert serialization.encode(decoded) == data
+    return decoded
+
+
+@pytest.mark.parametrize('code', ['', 'r10 = 1;', 'loop r10;', 'loop 0 r10 = 1 r11 = r10 - 2;',
+                                  'r10 = 18446744073709551615 - -5 + 99999999999999999999999 / -99999999999999999999;'])
+def test_round_trip(code):
+    _round_trip(parse(code))
+
+
+def test_round_trip_random_programs():
+    rng = random.Random(43)
+    expression = functools.partial(random_expr, rng, constants=((-9, 2 ** 64 - 2),))
+
+    for _ in range(100):
+        statements = [f'{rng.choice(REGISTERS)} = {expression(4)};' for _ in range(rng.randint(0, 10))]
+        body = ' '.join(f'{rng.choice(REGISTERS)} = {expression(2)}' for _ in range(rng.randint(0, 3)))
+        statements.insert(rng.randint(0, len(statements)), f'loop {rng.randint(0, 5)} {body};')
+        program = parse('\n'.join(statements))
+
+        assert evaluate(_round_trip(program)) == evaluate(program)
+        # Optimized programs hold temporaries as well
+        _round_trip(compiler.optimize(program, partial_evaluation=False))
+
+
+def test_deep_expressions():
+    expr = arith_ast.Var('r10')
+    for value in range(100000):
+        expr = arith_ast.ArithExpr(arith_ast.NodeType.AddExpr, expr, arith_ast.Num(value))
+    program = arith_ast.Program([arith_ast.Assignment(arith_ast.Var('r11'), expr)])
+
+    # Comparing nodes recurses, encoding doesn't
+    data = serialization.encode(program)
+    assert serialization.encode(serialization.decode(data)) == data
+
+
+def test_compact():
+    code = ' '.join(f'r1{i % 4} = r1{(i + 1) % 4} * {i} + {i * 7} / r12;' for i in range(1000))
+    assert len(serialization.encode(parse(code))) < len(code) / 1.5
+
+
+def test_dump_load(tmp_path):
+    program = parse('r10 = 5; loop 3 r11 = r11 + r10;')
+    serialization.dump(program, tmp_path / 'program.bin')
+    assert evaluate(serialization.load(tmp_path / 'program.bin')) == [5, 15]
+
+
+def test_malformed():
+    data = serialization.encode(parse('r10 = 5 + r11; loop 3 r11 = r11 + r10;'))
+
+    for malformed in [b'', b'not a program', data[:-1], data + b'\0', b'XXXX' + data[4:]]:
+        with pytest.raises(serialization.SerializationError):
+            serialization.decode(malformed)
+
+
+def _stream(opcodes, numbers, operands, strings):
+    # Serialized data of the given opcodes, which don't need to make up a valid program
+    numbers_width, numbers_data = serialization._pack(numbers)
+    operands_width, operands_data = serialization._pack(operands)
+    strings_data = '\0'.join(strings).encode()
+    header = serialization._HEADER.pack(serialization.MAGIC, serialization.VERSION, len(opcodes), len(numbers),
+                                        numbers_width, len(operands), operands_width, len(strings_data))
+    return header + bytes(opcodes) + numbers_data + operands_data + strings_data
+
+
+def test_malformed_expressions():
+    num, var, add, assign, loop, temp = (serialization._NUM, serialization._VAR, serialization._ADD,
+                                         serialization._ASSIGN, serialization._LOOP, serialization._TEMP)
+    assert evaluate(serialization.decode(_stream([num, num, add, assign], [2, 3], [0], ['r10']))) == [5]
+
+    for opcodes, numbers, operands in [
+            # An assignment as an operand, as the value of an assignment, of a temporary and as a loop's count
+            ([num, assign, num, add, assign], [2, 3], [0, 0]),
+            ([num, assign, assign], [2], [0, 0]),
+            ([num, assign, temp, assign], [2], [0, 1, 0]),
+            ([num, assign, num, assign, loop], [2, 3], [0, 0, 1]),
+            # A loop in the body of a loop
+            ([num, num, num, assign, loop, loop], [1, 2, 3], [0, 1, 1]),
+            # An expression left as a statement
+            ([num, var, add], [2], [0])]:
+        with pytest.raises(ValueError):
+            serialization.decode(_stream(opcodes, numbers, operands, ['r10', 't0']))
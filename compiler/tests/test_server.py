@@ -0,0 +1,166 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+import compiler.client as client
+import compiler.compiler as compiler
+import compiler.server as server
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_CODE = '''r11 = 32;
+r10 = 0 - r11 / r11;
+loop r11 r10 = r10*2;
+r13 = r10 - r11 / 5;
+'''
+
+
+@pytest.fixture(scope='module')
+def socket_path():
+    # Unix socket paths are limited to ~100 chars, which pytest's tmp_path may exceed
+    with tempfile.TemporaryDirectory(dir='/tmp') as directory:
+        path = os.path.join(directory, 'compiler.sock')
+        process = subprocess.Popen([sys.executable, '-m', 'compiler.server', '--socket', path, '--workers', '2'],
+                                   cwd=_ROOT)
+        try:
+            deadline = time.monotonic() + 30
+            while not client.is_running(path):
+                assert process.poll() is None and time.monotonic() < deadline
+                time.sleep(0.05)
+            yield path
+        finally:
+            process.terminate()
+            process.wait(10)
+        assert not os.path.exists(path)
+
+
+def test_compile_request():
+    assert server.compile_request({'code': _CODE}) == {'assembly': compiler.compile_code(_CODE)}
+    assert server.compile_request({'code': _CODE, 'comments': True}) == \
+        {'assembly': compiler.compile_code(_CODE, True)}
+    assert server.compile_request({'code': _CODE, 'profile': True}) == \
+        {'assembly': compiler.compile_code(_CODE, profile=True)}
+    assert server.compile_request({'code': _CODE, 'c_source': True}) == {'c_source': compiler.compile_c_code(_CODE)}
+    assert server.compile_request({'code': _CODE, 'report': True}) == {'report': compiler.compile_report(_CODE)}
+    assert server.compile_request({'code': 'r10 = ;'}) == {'error': 'Failed to parse code at 0'}
+    assert 'error' in server.compile_request({'path': '/nonexistent/input.in'})
+
+
+def test_compile_code(socket_path):
+    assert client.compile_code(_CODE, path=socket_path) == compiler.compile_code(_CODE)
+    assert client.compile_code(_CODE, comments=True, path=socket_path) == compiler.compile_code(_CODE, True)
+
+    with pytest.raises(Exception, match='Failed to parse code at 0'):
+        client.compile_code('r10 = ;', path=socket_path)
+
+
+def test_compile_file(socket_path, tmp_path):
+    input_path = tmp_path / 'input.in'
+    input_path.write_text(_CODE)
+    client.compile_file(str(input_path), str(tmp_path / 'output.s'), path=socket_path)
+
+    assert (tmp_path / 'output.s').read_text() == compiler.compile_code(_CODE)
+
+
+def test_malformed_request(socket_path):
+    assert 'error' in client.request('not a request', socket_path)
+
+
+def test_concurrent_clients(socket_path):
+    codes = [f'r10 = {i}; r11 = r10 * {i + 3};' for i in range(16)]
+    results = [None] * len(codes)
+
+    def compile_one(i):
+        results[i] = client.compile_code(codes[i], path=socket_path)
+
+    threads = [threading.Thread(target=compile_one, args=(i,)) for i in range(len(codes))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [compiler.compile_code(code) for code in codes]
+
+
+def test_second_server_refused(socket_path):
+    with pytest.raises(RuntimeError):
+        server.CompileServer(socket_path)._remove_stale_socket()
+
+
+def test_default_socket_path(monkeypatch):
+    monkeypatch.delenv(client.SOCKET_ENV, raising=False)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', '/run/user/1000')
+    assert client.default_socket_path() == '/run/user/1000/arith-compiler.sock'
+
+    monkeypatch.delenv('XDG_RUNTIME_DIR')
+    assert os.path.dirname(client.default_socket_path()) == client.private_socket_directory()
+    assert client.private_socket_directory().endswith(f'-{os.getuid()}')
+
+
+def test_server_of_another_user_is_untrusted(socket_path, monkeypatch):
+    monkeypatch.setattr(os, 'getuid', lambda: os.geteuid() + 1)
+    with pytest.raises(client.UntrustedServer):
+        client.compile_code(_CODE, path=socket_path)
+
+
+def test_private_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    directory = tmp_path / f'arith-compiler-{os.getuid()}'
+    server.CompileServer(os.path.join(directory, 'compiler.sock'))._prepare_directory()
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    os.chmod(directory, 0o777)
+    with pytest.raises(RuntimeError, match='only the current user'):
+        server.CompileServer(os.path.join(directory, 'compiler.sock'))._prepare_directory()
+
+    os.chmod(directory, 0o700)
+    server.CompileServer(os.path.join(directory, 'compiler.sock'))._prepare_directory()
+
+
+def test_socket_is_private(socket_path):
+    assert os.stat(socket_path).st_mode & 0o077 == 0
+
+
+def test_no_server():
+    with tempfile.TemporaryDirectory(dir='/tmp') as directory:
+        path = os.path.join(directory, 'compiler.sock')
+        assert not client.is_running(path)
+        with pytest.raises(client.ServerUnavailable):
+            client.compile_code(_CODE, path=path)
+
+
+def test_unresponsive_server():
+    # The server accepts the connection but never responds
+    with tempfile.TemporaryDirectory(dir='/tmp') as directory:
+        path = os.path.join(directory, 'compiler.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(path)
+            listener.listen()
+            with pytest.raises(client.ServerUnavailable):
+                client.request({'code': _CODE}, path, timeout=0.1)
+
+
+def test_main_falls_back_to_in_process(tmp_path):
+    input_path = tmp_path / 'input.in'
+    input_path.write_text(_CODE)
+    env = dict(os.environ, **{client.SOCKET_ENV: str(tmp_path / 'missing.sock')})
+    subprocess.run([sys.executable, 'main.py', str(input_path), str(tmp_path / 'output.s')],
+                   cwd=_ROOT, env=env, check=True)
+
+    assert (tmp_path / 'output.s').read_text() == compiler.compile_code(_CODE)
+
+
+def test_main_uses_server(socket_path, tmp_path):
+    input_path = tmp_path / 'input.in'
+    input_path.write_text(_CODE)
+    env = dict(os.environ, **{client.SOCKET_ENV: socket_path})
+    subprocess.run([sys.executable, 'main.py', str(input_path), str(tmp_path / 'output.s')],
+                   cwd=_ROOT, env=env, check=True)
+
+    assert (tmp_path / 'output.s').read_text() == compiler.compile_code(_CODE)
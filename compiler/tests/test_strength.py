@@ -0,0 +1,103 @@
+import functools
+import random
+
+import pytest
+
+import compiler.asm as asm
+import compiler.compiler as compiler
+import compiler.parser as parser
+import compiler.peephole as peephole
+import compiler.strength as strength
+from compiler.tests import x86
+from compiler.tests.reference import REGISTERS, evaluate, random_expr
+
+_WORD = 2 ** 64
+
+_EDGE_CONSTANTS = [2 ** 31 - 1, 2 ** 31, 2 ** 31 + 1, 2 ** 32 - 1, 2 ** 32 + 1, 10 ** 9 + 7, 641, 6700417,
+                   2 ** 63 - 1, 2 ** 63, 2 ** 63 + 1, 2 ** 64 - 2, 3 * 2 ** 61, 7 * 2 ** 40, 0xdeadbeefcafe,
+                   -1, -2, -3, -5, -7, -9, -10, -641, -(2 ** 31), -(2 ** 31) - 1, -(2 ** 63)]
+
+_EDGE_DIVIDENDS = [0, 1, 2, 3, 7, 641, 2 ** 31, 2 ** 32 - 1, 2 ** 32, 2 ** 63 - 1, 2 ** 63, 2 ** 63 + 1,
+                   2 ** 64 - 2, 2 ** 64 - 1, 0x8000000080000000, 0xffffffff00000000]
+
+
+def _run_lowered(emit, constant, operand):
+    assembly = asm.Assembly()
+    assembly.label('main')
+    assembly.emit('mov', 'rax', f'{operand}')
+    emit(assembly, constant)
+    assembly.emit('call', 'print_rax')
+    assembly.emit('syscall')
+    return x86.run(assembly.instructions)[0] % _WORD
+
+
+def _operands(rng, constant):
+    operands = _EDGE_DIVIDENDS + [rng.randrange(_WORD) for _ in range(8)]
+    # Dividends right around multiples of the divisor are where an imprecise magic number fails first
+    for multiple in (1, 2, 3, (_WORD - 1) // constant):
+        product = multiple * constant
+        operands += [product - 1, product, product + 1]
+    return [operand % _WORD for operand in operands]
+
+
+@pytest.mark.parametrize('bits', [6, 8])
+def test_magic_all_divisors_all_dividends(bits):
+    for divisor in range(3, 2 ** bits):
+        if divisor & (divisor - 1) == 0:
+            continue
+        magic = strength.unsigned_magic(divisor, bits)
+        assert magic.multiplier < 2 ** bits
+        for dividend in range(2 ** bits):
+            assert strength.divide(dividend, magic, bits) == dividend // divisor, (divisor, dividend, magic)
+
+
+def test_div_by_constant():
+    rng = random.Random(30)
+    constants = list(range(1, 300)) + [constant % _WORD for constant in _EDGE_CONSTANTS]
+    constants += [rng.randrange(1, _WORD) for _ in range(50)]
+    for constant in constants:
+        for operand in _operands(rng, constant):
+            actual = _run_lowered(strength.emit_div, constant, operand)
+            assert actual == operand // constant, (constant, operand)
+
+
+def test_mul_by_constant():
+    rng = random.Random(30)
+    constants = list(range(0, 300)) + _EDGE_CONSTANTS + [rng.randrange(_WORD) for _ in range(50)]
+    for constant in constants:
+        for operand in _EDGE_DIVIDENDS + [rng.randrange(_WORD) for _ in range(4)]:
+            actual = _run_lowered(strength.emit_mul, constant, operand)
+            assert actual == operand * constant % _WORD, (constant, operand)
+
+
+def test_no_mul_or_div_for_cheap_constants():
+    for constant in [2, 3, 5, 9, 10, 12, 17, 31, 64, -1, -4]:
+        assembly = asm.Assembly()
+        strength.emit_mul(assembly, constant)
+        assert {instruction.opcode for instruction in assembly.instructions} <= {'lea', 'shl', 'mov', 'add', 'sub',
+                                                                                    'neg'}
+
+    for constant in [7, 10, 641, 2 ** 63 + 1]:
+        assembly = asm.Assembly()
+        strength.emit_div(assembly, constant)
+        assert 'div' not in {instruction.opcode for instruction in assembly.instructions}
+
+
+def test_programs():
+    rng = random.Random(30)
+    constants = [0, 1, 2, 3, 7, 10, 12, 641, 4294967296, 18446744073709551615 - 1]
+
+    expression = functools.partial(random_expr, rng, constants=((1, 99),), right_constants=constants)
+
+    checked = 0
+    while checked < 100:
+        code = '\n'.join(f'{rng.choice(REGISTERS)} = {expression(3)};' for _ in range(rng.randint(1, 8)))
+        program = parser.nt_statements(code).match
+        try:
+            expected = evaluate(program)
+        except ZeroDivisionError:
+            continue
+
+        assert x86.run(compiler.generate(program)) == expected
+        assert x86.run(peephole.optimize(compiler.generate(compiler.optimize(program)))) == expected
+        checked += 1
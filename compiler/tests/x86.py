@@ -0,0 +1,150 @@
+import compiler.asm as asm
+from compiler.tests.reference import to_signed
+
+_WORD = 2 ** 64
+_MASK = _WORD - 1
+
+
+class ExecutionLimitExceeded(Exception):
+    pass
+
+
+class Machine:
+    # Executes the subset of x86-64 emitted by the compiler, starting at `main` and stopping at the exit syscall.
+    # Calls to print_rax are not executed but record the printed value
+
+    def __init__(self, code, max_steps=10 ** 6):
+        self._code = [instruction for instruction in code if not isinstance(instruction, asm.Comment)]
+        self._labels = {instruction.name: index for index, instruction in enumerate(self._code)
+                        if isinstance(instruction, asm.Label)}
+        self._max_steps = max_steps
+        self.registers = {register: 0 for register in asm.REGISTERS}
+        self.stack = []
+        self.zero_flag = False
+        self.carry_flag = False
+        self.printed = []
+        # Instructions executed so far, including the ones of main's prologue and exit
+        self.executed = 0
+
+    def _value(self, operand):
+        if asm.is_register(operand):
+            return self.registers[operand]
+        if '[' in operand:
+            address = operand[operand.index('[') + 1:operand.index(']')]
+            return self._address(address)
+        return int(operand) & _MASK
+
+    def _address(self, address):
+        total = 0
+        for term in address.replace('-', '+-').split('+'):
+            term = term.strip()
+            sign = 1
+            if term.startswith('-'):
+                sign = -1
+                term = term[1:].strip()
+            factors = [self._value(factor.strip()) for factor in term.split('*')]
+            product = 1
+            for factor in factors:
+                product *= factor
+            total += sign * product
+        return total & _MASK
+
+    def _set(self, register, value):
+        value &= _MASK
+        self.registers[register] = value
+        self.zero_flag = value == 0
+
+    def _step(self, instruction, index):
+        opcode = instruction.opcode
+        operands = instruction.operands
+        registers = self.registers
+        if opcode == 'mov':
+            registers[operands[0]] = self._value(operands[1])
+        elif opcode == 'lea':
+            registers[operands[0]] = self._value(operands[1])
+        elif opcode in ('add', 'sub', 'and', 'or', 'xor', 'imul', 'shl', 'shr'):
+            if opcode == 'imul' and len(operands) == 3:
+                left, right = self._value(operands[1]), self._value(operands[2])
+            else:
+                left, right = registers[operands[0]], self._value(operands[1])
+            result = {'add': lambda: left + right,
+                      'sub': lambda: left - right,
+                      'and': lambda: left & right,
+                      'or': lambda: left | right,
+                      'xor': lambda: left ^ right,
+                      'imul': lambda: left * right,
+                      'shl': lambda: left << (right & 63),
+                      'shr': lambda: left >> (right & 63)}[opcode]()
+            if opcode == 'add':
+                self.carry_flag = result >= _WORD
+            elif opcode == 'sub':
+                self.carry_flag = result < 0
+            self._set(operands[0], result)
+        elif opcode in ('neg', 'dec', 'inc'):
+            value = registers[operands[0]]
+            self._set(operands[0], {'neg': -value, 'dec': value - 1, 'inc': value + 1}[opcode])
+        elif opcode in ('test', 'cmp'):
+            left, right = self._value(operands[0]), self._value(operands[1])
+            if opcode == 'test':
+                self.zero_flag = (left & right) == 0
+                self.carry_flag = False
+            else:
+                self.zero_flag = left == right
+                self.carry_flag = left < right
+        elif opcode == 'mul':
+            product = registers['rax'] * self._value(operands[0])
+            registers['rax'] = product & _MASK
+            registers['rdx'] = product >> 64
+        elif opcode == 'div':
+            divisor = self._value(operands[0])
+            dividend = (registers['rdx'] << 64) | registers['rax']
+            if divisor == 0 or dividend // divisor >= _WORD:
+                raise ZeroDivisionError(f'Division fault at {instruction}')
+            registers['rax'] = dividend // divisor
+            registers['rdx'] = dividend % divisor
+        elif opcode == 'push':
+            self.stack.append(self._value(operands[0]))
+        elif opcode == 'pop':
+            registers[operands[0]] = self.stack.pop()
+        elif opcode == 'call':
+            assert operands[0] == 'print_rax'
+            self.printed.append(to_signed(registers['rax']))
+            # print_rax preserves every register it uses, except for the ones clobbered by printf
+            for register in ('rdx', 'rsi', 'rdi'):
+                registers[register] = 0xdeadbeef
+        elif opcode == 'loop':
+            registers['rcx'] = (registers['rcx'] - 1) & _MASK
+            if registers['rcx'] != 0:
+                return self._labels[operands[0]]
+        elif opcode == 'jmp':
+            return self._labels[operands[0]]
+        elif opcode in ('jz', 'je', 'jnz', 'jne', 'jb', 'jae'):
+            taken = {'jz': self.zero_flag, 'je': self.zero_flag,
+                     'jnz': not self.zero_flag, 'jne': not self.zero_flag,
+                     'jb': self.carry_flag, 'jae': not self.carry_flag}[opcode]
+            if taken:
+                return self._labels[operands[0]]
+        else:
+            raise NotImplementedError(f'Cannot execute {instruction}')
+
+        return index + 1
+
+    def run(self):
+        index = self._labels['main']
+        for _ in range(self._max_steps):
+            instruction = self._code[index]
+            if isinstance(instruction, asm.Instruction):
+                self.executed += 1
+                if instruction.opcode == 'syscall':
+                    return self.printed
+                index = self._step(instruction, index)
+            else:
+                index += 1
+
+        raise ExecutionLimitExceeded(self._max_steps)
+
+
+def run(code, max_steps=10 ** 6):
+    if isinstance(code, str):
+        code = asm.parse(code)
+    return Machine(code, max_steps).run()
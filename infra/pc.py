@@ -1,7 +1,15 @@
+import re
+
+
 class NoMatchException(Exception):
     def __init__(self, tokens, index):
-        msg = f'No match at index {index} for token list: {tokens}'
-        super().__init__(self, msg)
+        # The message is only formatted when needed, since failed matches are routine while parsing
+        super().__init__()
+        self.tokens = tokens
+        self.index = index
+
+    def __str__(self):
+        return f'No match at index {self.index} for token list: {self.tokens}'
 
 
 class ParserOutput:
@@ -25,8 +33,13 @@ class ParserOutput:
 
 
 class Parser:
-    def __init__(self, parse_func):
+    # `first` is the set of tokens a match can start with (None when unknown, i.e. any token) and `nullable` tells
+    # whether the parser can match without consuming any token. Combinators compute both from their parsers, which lets
+    # disj skip alternatives that can't match the next token
+    def __init__(self, parse_func, first=None, nullable=True):
         self._parse = parse_func
+        self.first = first
+        self.nullable = nullable
 
     def parse(self, tokens, index):
         return self._parse(tokens, index)
@@ -34,31 +47,77 @@ class Parser:
     def __call__(self, tokens, index=0):
         return self.parse(tokens, index)
 
-    def _search(self, tokens, index):
+    def _first_pattern(self):
+        # A regex matching any token of the FIRST set, to jump between candidates in a string with a single search
+        pattern = getattr(self, '_first_regex', None)
+        if pattern is None:
+            chars = ''.join(sorted(self.first))
+            self._first_regex = pattern = re.compile(f'[{re.escape(chars)}]')
+        return pattern
+
+    def _prefilter(self, tokens):
+        # Candidates are found with a regex search when the tokens are a string and every token of the FIRST set is a
+        # char, and by testing every token otherwise
+        if self.nullable or self.first is None:
+            return None
+        if isinstance(tokens, str) and all(isinstance(token, str) and len(token) == 1 for token in self.first):
+            return self._first_pattern()
+        first = self.first
+        return lambda token: _can_start_with_token(first, token)
+
+    @staticmethod
+    def _next_candidate(tokens, index, prefilter):
+        if prefilter is None:
+            return index
+        if isinstance(prefilter, re.Pattern):
+            found = prefilter.search(tokens, index)
+            return found.start() if found is not None else None
         for i in range(index, len(tokens)):
+            if prefilter(tokens[i]):
+                return i
+        return None
+
+    def finditer(self, tokens, index=0, prefilter=None):
+        # Lazily yields (start, end, match) for every non-overlapping match, scanning left to right like re.finditer.
+        # Only indices accepted by `prefilter` (a compiled regex searched in a string, or a predicate over tokens) are
+        # tried, which defaults to the parser's FIRST set when known
+        if prefilter is None:
+            prefilter = self._prefilter(tokens)
+        while index <= len(tokens):
+            start = self._next_candidate(tokens, index, prefilter)
+            if start is None:
+                return
             try:
-                parser_output = self(tokens, i)
-                return parser_output
+                parser_output = self(tokens, start)
             except NoMatchException:
+                index = start + 1
                 continue
+            end = parser_output.next_token_index
+            yield start, end, parser_output.match
+            # An empty match would be found again at the same index
+            index = end if end > start else start + 1
+
+    def _search(self, tokens, index, prefilter=None):
+        for start, end, match in self.finditer(tokens, index, prefilter):
+            return ParserOutput(match, end)
 
         raise NoMatchException(tokens, -1)
 
-    def search(self, tokens):
-        return self._search(tokens, 0).match
+    def search(self, tokens, prefilter=None):
+        return self._search(tokens, 0, prefilter).match
 
-    def search_all(self, tokens):
-        i = 0
-        outputs = []
-        while i < len(tokens):
-            parser_output = self._search(tokens, i)
-            i = parser_output.next_token_index
-            outputs.append(parser_output.match)
+    def search_all(self, tokens, prefilter=None):
+        return [match for _, _, match in self.finditer(tokens, 0, prefilter)]
 
-        return outputs
 
+def _can_start_with_token(first, token):
+    try:
+        return token in first
+    except TypeError:
+        return True
 
-def make_const(pred):
+
+def make_const(pred, first=None):
     def parse(tokens, index):
         if index >= len(tokens):
             raise NoMatchException(tokens, index)
@@ -68,20 +127,24 @@ def make_const(pred):
         else:
             raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    if first is not None:
+        first = frozenset(first)
+    return Parser(parse, first, nullable=False)
 
 
 def make_char(c):
     def pred(token):
         return token == c
 
-    return make_const(pred)
+    return make_const(pred, first=[c])
 
 
 def make_char_ci(c):
     def pred(token):
         return token.lower() == c.lower()
 
+    # Tokens other than c.lower() and c.upper() lowercase to c.lower() too (e.g. the Kelvin sign to 'k'), so the
+    # tokens a match can start with aren't listed
     return make_const(pred)
 
 
@@ -104,7 +167,7 @@ def make_char_range(start, end):
         token = ord(token)
         return start <= token <= end
 
-    return make_const(pred)
+    return make_const(pred, first=[chr(c) for c in range(start, end + 1)])
 
 
 def make_char_range_ci(start, end):
@@ -112,9 +175,11 @@ def make_char_range_ci(start, end):
     end = ord(end.lower())
 
     def pred(token):
-        token = ord(token.lower())
-        return start <= token <= end
+        # Some tokens lowercase to more than one character (e.g. 'İ'), which no range contains
+        token = token.lower()
+        return len(token) == 1 and start <= ord(token) <= end
 
+    # Like make_char_ci's, the tokens a match can start with aren't listed
     return make_const(pred)
 
 
@@ -122,7 +187,7 @@ def _make_empty():
     def parse(tokens, index):
         raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    return Parser(parse, frozenset(), nullable=False)
 
 
 def _make_end_of_input():
@@ -132,12 +197,12 @@ def _make_end_of_input():
         else:
             return ParserOutput.empty_output(index)
 
-    return Parser(parse)
+    return Parser(parse, frozenset(), nullable=True)
 
 
 EPSILON = ()
 
-epsilon_parser = Parser(lambda tokens, index: ParserOutput(EPSILON, index))
+epsilon_parser = Parser(lambda tokens, index: ParserOutput(EPSILON, index), frozenset(), nullable=True)
 empty_parser = _make_empty()
 end_of_input_parser = _make_end_of_input()
 any_parser = make_const(lambda *_: True)
@@ -156,7 +221,10 @@ def caten(parser1, parser2):
         next_token_index = parser2_output.next_token_index
         return ParserOutput(match, next_token_index)
 
-    return Parser(parse)
+    first = parser1.first
+    if parser1.nullable:
+        first = _first_union(first, parser2.first)
+    return Parser(parse, first, parser1.nullable and parser2.nullable)
 
 
 def caten_list(parsers):
@@ -184,27 +252,75 @@ def pack(parser, transformation):
         next_token_index = parser_output.next_token_index
         return ParserOutput(match, next_token_index)
 
-    return Parser(parse)
+    return Parser(parse, parser.first, parser.nullable)
 
 
-def disj(parser1, parser2):
+def _first_union(first1, first2):
+    if first1 is None or first2 is None:
+        return None
+    return first1 | first2
+
+
+def _can_start_with(parser, token):
+    return parser.nullable or parser.first is None or token in parser.first
+
+
+def _make_disjunction(parsers):
+    # Alternatives are tried in order, but only the ones that can start with the next token. The viable alternatives
+    # for every token in a FIRST set are computed once, so the parser jumps straight to them
+    parsers = tuple(parsers)
+    first = frozenset()
+    for parser in parsers:
+        first = _first_union(first, parser.first)
+    nullable = any(parser.nullable for parser in parsers)
+
+    dispatch = {}
+    for parser in parsers:
+        for token in parser.first or ():
+            if token not in dispatch:
+                dispatch[token] = tuple(p for p in parsers if _can_start_with(p, token))
+    # Tokens outside every known FIRST set, and the end of input, can only start nullable or unknown alternatives
+    default = tuple(parser for parser in parsers if parser.nullable or parser.first is None)
+
     def parse(tokens, index):
-        try:
-            parser_output = parser1(tokens, index)
-        except NoMatchException:
-            parser_output = parser2(tokens, index)
+        if index < len(tokens):
+            try:
+                alternatives = dispatch.get(tokens[index], default)
+            except TypeError:
+                alternatives = parsers
+        else:
+            alternatives = default
 
-        return parser_output
+        for parser in alternatives[:-1]:
+            try:
+                return parser(tokens, index)
+            except NoMatchException:
+                continue
+        if alternatives:
+            return alternatives[-1](tokens, index)
+        raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    disjunction = Parser(parse, first, nullable)
+    disjunction.alternatives = parsers
+    return disjunction
+
+
+def _alternatives(parser):
+    # Disjunctions are associative, so nested ones are flattened into a single dispatch
+    return getattr(parser, 'alternatives', (parser,))
+
+
+def disj(parser1, parser2):
+    return _make_disjunction(_alternatives(parser1) + _alternatives(parser2))
 
 
 def disj_list(parsers):
-    disjunction = empty_parser
+    # Like disj(parsers[-1], disj(..., disj(parsers[0], empty_parser))), the last parser is tried first
+    alternatives = ()
     for parser in parsers:
-        disjunction = disj(parser, disjunction)
+        alternatives = _alternatives(parser) + alternatives
 
-    return disjunction
+    return _make_disjunction(alternatives)
 
 
 def star(parser):
@@ -220,7 +336,7 @@ def star(parser):
 
         return parser_output
 
-    return Parser(parse)
+    return Parser(parse, parser.first, nullable=True)
 
 
 def plus(parser):
@@ -235,6 +351,54 @@ def plus(parser):
     return pack(caten(head, tail), flatten)
 
 
+LEFT = 'left'
+RIGHT = 'right'
+
+
+def operator_precedence(operand, table, combine):
+    # Parses `operand (operator operand)*` in a single loop (precedence climbing), where `table` lists
+    # (operator_parser, associativity) pairs from the lowest precedence to the highest, and `combine(operator_match,
+    # left, right)` builds the value of every operation. Like a star over (operator operand), an operator that isn't
+    # followed by an operand isn't consumed, and ends the expression
+    levels = [pack(operator, lambda match, precedence=precedence, associativity=associativity:
+                   (match, precedence, associativity))
+              for precedence, (operator, associativity) in enumerate(table)]
+    nt_operator = disj_list(levels)
+
+    def parse_operations(tokens, index, min_precedence):
+        # Returns the value of the expression, the index following it and whether the whole expression ended
+        operand_output = operand(tokens, index)
+        left = operand_output.match
+        index = operand_output.next_token_index
+        while True:
+            try:
+                operator_output = nt_operator(tokens, index)
+            except NoMatchException:
+                return left, index, True
+
+            operator_match, precedence, associativity = operator_output.match
+            if precedence < min_precedence:
+                return left, index, False
+
+            next_min_precedence = precedence + 1 if associativity == LEFT else precedence
+            try:
+                right, next_index, ended = parse_operations(tokens, operator_output.next_token_index,
+                                                            next_min_precedence)
+            except NoMatchException:
+                return left, index, True
+
+            left = combine(operator_match, left, right)
+            index = next_index
+            if ended:
+                return left, index, True
+
+    def parse(tokens, index):
+        match, next_token_index, _ = parse_operations(tokens, index, 0)
+        return ParserOutput(match, next_token_index)
+
+    return Parser(parse, operand.first, operand.nullable)
+
+
 def delayed(make_parser):
     def parse(tokens, index):
         parser = make_parser()
@@ -251,7 +415,7 @@ def guard(parser, predicate):
         else:
             raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    return Parser(parse, parser.first, parser.nullable)
 
 
 def diff(parser1, parser2):
@@ -264,7 +428,7 @@ def diff(parser1, parser2):
 
         raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    return Parser(parse, parser1.first, parser1.nullable)
 
 
 def followed_by(parser1, parser2):
@@ -276,7 +440,7 @@ def followed_by(parser1, parser2):
 
         return parser1_output
 
-    return Parser(parse)
+    return Parser(parse, parser1.first if not parser1.nullable else None, parser1.nullable)
 
 
 def not_followed_by(parser1, parser2):
@@ -291,7 +455,7 @@ def not_followed_by(parser1, parser2):
 
         raise NoMatchException(tokens, index)
 
-    return Parser(parse)
+    return Parser(parse, parser1.first, parser1.nullable)
 
 
 def trace_parser(parser, name):
@@ -307,4 +471,4 @@ def trace_parser(parser, name):
             print(f'{name}: Failed to match from {index} against tokens: {tokens}')
             raise
 
-    return Parser(parse)
+    return Parser(parse, parser.first, parser.nullable)
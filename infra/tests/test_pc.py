@@ -1,3 +1,5 @@
+import re
+
 import pytest
 import infra.pc as pc
 
@@ -249,6 +251,29 @@ def test_disj_list():
         subject([10])
 
 
+def test_disj_list_tries_the_last_parser_first():
+    subject = pc.disj_list([pc.make_word('a'), pc.make_word('ab')])
+    actual = subject('ab')
+    assert actual.match == ('a', 'b')
+    assert actual.next_token_index == 2
+
+    actual = pc.disj_list([pc.make_word('ab'), pc.make_word('a')])('ab')
+    assert actual.match == ('a',)
+    assert actual.next_token_index == 1
+
+
+def test_case_insensitive_matches_every_case_folding():
+    # The Kelvin sign lowercases to 'k', and the dotted capital I to two characters
+    kelvin = '\u212a'
+    assert pc.make_char_ci('k')(kelvin).match == kelvin
+    assert pc.disj(pc.make_char_ci('k'), pc.make_char('x'))(kelvin).match == kelvin
+    assert pc.make_char_range_ci('a', 'z')(kelvin).match == kelvin
+    assert pc.disj(pc.make_char_range_ci('j', 'l'), pc.make_char('x'))(kelvin).match == kelvin
+    assert pc.make_char_ci('k').search_all(f'x{kelvin}k') == [kelvin, 'k']
+    with pytest.raises(pc.NoMatchException):
+        pc.make_char_range_ci('a', 'z')('\u0130')
+
+
 def test_star():
     parser = pc.make_char_range_ci('a', 'z')
 
@@ -377,3 +402,119 @@ def test_search_all():
 
     with pytest.raises(pc.NoMatchException):
         subject.search("1")
+
+
+def test_finditer():
+    subject = pc.pack(pc.plus(pc.make_char('a')), ''.join)
+
+    actual = subject.finditer('xaaybza')
+    assert not isinstance(actual, list)
+    assert list(actual) == [(1, 3, 'aa'), (6, 7, 'a')]
+    assert list(subject.finditer('xaaybza', 2)) == [(2, 3, 'a'), (6, 7, 'a')]
+    assert list(subject.finditer('xyz')) == []
+
+
+def test_finditer_tokens():
+    subject = pc.pack(pc.plus(pc.make_const(lambda x: x == 1, first=[1])), sum)
+    assert list(subject.finditer([2, 1, 1, [1], 2, 1])) == [(1, 3, 2), (5, 6, 1)]
+
+
+def test_finditer_nullable():
+    subject = pc.pack(pc.star(pc.make_char('a')), ''.join)
+    assert list(subject.finditer('ba')) == [(0, 0, ''), (1, 2, 'a'), (2, 2, '')]
+
+
+def test_finditer_prefilter():
+    # The prefilter only narrows down the indices tried, matches are still up to the parser
+    subject = pc.pack(pc.caten(pc.make_const(str.isalpha), pc.make_char('1')), ''.join)
+
+    assert list(subject.finditer('a1 b2 c1', prefilter=re.compile('[a-z]'))) == [(0, 2, 'a1'), (6, 8, 'c1')]
+    assert list(subject.finditer('a1 b2 c1', prefilter=lambda token: token == 'c')) == [(6, 8, 'c1')]
+
+
+def test_search_all_skips_unmatched_tokens():
+    subject = pc.pack(pc.plus(pc.make_const(lambda x: x == 1)), sum)
+    assert subject.search_all([2, 1, 1, 2, 1, 2, 2]) == [2, 1]
+
+
+def test_first_sets():
+    word = pc.make_word('ab')
+    assert word.first == {'a'}
+    assert not word.nullable
+
+    optional_sign = pc.disj(pc.make_oneof('+-'), pc.epsilon_parser)
+    assert optional_sign.first == {'+', '-'}
+    assert optional_sign.nullable
+
+    signed_digits = pc.caten(optional_sign, pc.plus(pc.make_char_range('0', '2')))
+    assert signed_digits.first == {'+', '-', '0', '1', '2'}
+    assert not signed_digits.nullable
+
+    assert pc.star(word).nullable
+    assert pc.make_char_ci('a').first is None
+    assert pc.caten(pc.make_const(lambda t: True), word).first is None
+    assert pc.caten(pc.star(pc.make_const(lambda t: True)), word).first is None
+
+
+def test_disj_dispatch():
+    attempts = []
+
+    def counted(parser, name):
+        def parse(tokens, index):
+            attempts.append(name)
+            return parser(tokens, index)
+
+        return pc.Parser(parse, parser.first, parser.nullable)
+
+    subject = pc.disj_list([counted(pc.make_word(word), word) for word in ['ab', 'cd', 'ce', 'f']])
+
+    actual = subject('cd')
+    assert actual.match == ('c', 'd')
+    assert attempts == ['ce', 'cd']
+
+    attempts.clear()
+    with pytest.raises(pc.NoMatchException):
+        subject('x')
+    with pytest.raises(pc.NoMatchException):
+        subject('')
+    assert attempts == []
+
+    attempts.clear()
+    subject = pc.disj(counted(pc.make_char('a'), 'a'), counted(pc.epsilon_parser, 'epsilon'))
+    assert subject('b').match == pc.EPSILON
+    assert subject('').match == pc.EPSILON
+    assert attempts == ['epsilon', 'epsilon']
+
+
+def test_disj_unhashable_tokens():
+    subject = pc.disj(pc.make_const(lambda t: t == [1]), pc.make_const(lambda t: t == [2]))
+
+    actual = subject([[2]])
+    assert actual.match == [2]
+
+
+def test_operator_precedence():
+    digit = pc.pack(pc.make_char_range('0', '9'), int)
+    table = [(pc.make_oneof('+-'), pc.LEFT),
+             (pc.make_oneof('*'), pc.LEFT),
+             (pc.make_char('^'), pc.RIGHT)]
+    subject = pc.operator_precedence(digit, table, lambda op, left, right: f'({left}{op}{right})')
+
+    actual = subject('1+2*3^4^5-6*7')
+    assert actual.match == '((1+(2*(3^(4^5))))-(6*7))'
+    assert actual.next_token_index == 13
+
+    actual = subject('1*2+')
+    assert actual.match == '(1*2)'
+    assert actual.next_token_index == 3
+
+    actual = subject('1*2^x')
+    assert actual.match == '(1*2)'
+    assert actual.next_token_index == 3
+
+    actual = subject('7')
+    assert actual.match == 7
+
+    with pytest.raises(pc.NoMatchException):
+        subject('+1')
+    assert subject.first == digit.first
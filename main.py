@@ -1,15 +1,49 @@
 #! /bin/python
 
-import compiler.compiler as compiler
+import argparse
 import sys
 
+import compiler.client as client
+
 if __name__ == '__main__':
-    args = sys.argv
-    if len(args) < 3:
-        print(f'Usage: {sys.argv[0]} <input_file> <output_file>\n'
-              f'Reads <input_file>, compiles it down to x86_64 assembly and writes it to <output_file> '
-              f'(overriding <output_file>)')
-
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    compiler.compile_file(input_file, output_file)
+    arg_parser = argparse.ArgumentParser(description='Reads <input_file>, compiles it down to x86_64 assembly and '
+                                                     'writes it to <output_file> (overriding <output_file>)')
+    arg_parser.add_argument('input_file')
+    arg_parser.add_argument('output_file')
+    arg_parser.add_argument('--comments', action='store_true',
+                            help='annotate the generated assembly with the AST node each instruction belongs to')
+    # What is written to <output_file>, assembly unless one of them says otherwise
+    output_format = arg_parser.add_mutually_exclusive_group()
+    output_format.add_argument('--executable', action='store_true',
+                               help='write a static x86_64 Linux executable to <output_file> instead of assembly')
+    output_format.add_argument('--c', action='store_true', dest='c_source',
+                               help='write portable C source to <output_file> instead of assembly')
+    output_format.add_argument('--report', action='store_true',
+                               help='write what each top-level statement is estimated to cost (instructions, cycles, '
+                                    'push/pop pairs and loop iterations) to <output_file> instead of assembly, without '
+                                    'running anything')
+    arg_parser.add_argument('--jobs', type=int, default=None,
+                            help='number of processes parsing a large input (defaults to the number of CPUs)')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='make the program print the cycles each top-level statement ran for (and the '
+                                 'iterations of loops) to stderr at exit, as `<line> <cycles> <iterations>` lines')
+    arg_parser.add_argument('--no-server', action='store_true',
+                            help='compile in-process even when a compile server (python -m compiler.server) is running')
+    args = arg_parser.parse_args()
+
+    compiled = False
+    if not args.no_server:
+        try:
+            client.compile_file(args.input_file, args.output_file, args.comments, args.jobs, args.executable,
+                                profile=args.profile, c_source=args.c_source, report=args.report)
+            compiled = True
+        except client.UntrustedServer as e:
+            print(f'Compiling in-process: {e}', file=sys.stderr)
+        except client.ServerUnavailable:
+            pass
+
+    if not compiled:
+        # The compiler is only imported when there's no server to do it
+        import compiler.compiler as compiler
+        compiler.compile_file(args.input_file, args.output_file, args.comments, args.jobs, args.executable,
+                              args.profile, args.c_source, args.report)